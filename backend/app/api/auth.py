@@ -2,7 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import create_access_token, get_current_user
+from app.core.security import (
+    create_access_token,
+    get_current_user,
+    get_password_hash_stats,
+    get_user_cache_stats,
+    require_admin,
+)
 from app.models.user import User
 from app.schemas.auth import LoginRequest, LoginResponse, UserResponse
 from app.services.auth import authenticate
@@ -22,3 +28,13 @@ async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)):
 @router.get("/me", response_model=UserResponse)
 async def me(current_user: User = Depends(get_current_user)):
     return UserResponse.model_validate(current_user)
+
+
+@router.get("/cache-stats")
+async def user_cache_stats(current_user: User = Depends(require_admin)):
+    return get_user_cache_stats()
+
+
+@router.get("/hash-stats")
+async def password_hash_stats(current_user: User = Depends(require_admin)):
+    return get_password_hash_stats()
@@ -1,8 +1,11 @@
 from decimal import Decimal
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.currency import calculate_prices, get_rates
+from app.core.database import get_db
+from app.schemas.currency import PriceBatchRequest, PriceBatchResponse
+from app.services.currency import calculate_prices, get_rates, price_batch
 
 router = APIRouter(prefix="/currency", tags=["Currency"])
 
@@ -22,3 +25,8 @@ async def rates(preview_cost_krw: Decimal | None = Query(None)):
             "selling_price_uzs": float(prices["selling_price_uzs"]),
         }
     return result
+
+
+@router.post("/prices/batch", response_model=PriceBatchResponse)
+async def batch_prices(data: PriceBatchRequest, db: AsyncSession = Depends(get_db)):
+    return await price_batch(db, data.costs_krw, data.markups, data.include_prices)
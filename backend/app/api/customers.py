@@ -1,27 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Literal
 
-from app.core.database import get_db
-from app.schemas.customer import CustomerCreate, CustomerResponse, CustomerUpdate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.database import get_db, get_read_db, read_session_factory
+from app.schemas.customer import (
+    BudgetEntryCreate,
+    BudgetEntryResponse,
+    CustomerCreate,
+    CustomerListResponse,
+    CustomerResponse,
+    CustomerUpdate,
+)
 from app.schemas.pagination import PaginatedResponse
 from app.services import customer as customer_service
+from app.services import customer_budget
 
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
 
-@router.get("", response_model=PaginatedResponse[CustomerResponse])
+@router.get("", response_model=CustomerListResponse)
 async def list_customers(
     is_active: bool | None = None,
+    q: str | None = Query(None, max_length=100),
+    include_stats: bool = False,
+    sort_by: Literal[customer_service.SORT_KEYS] | None = None,
+    sort_dir: Literal["asc", "desc"] = "asc",
+    cursor: str | None = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    items, total = await customer_service.get_customers(db, is_active=is_active, page=page, page_size=page_size)
-    return PaginatedResponse(data=items, total=total, page=page, page_size=page_size)
+    try:
+        items, total, next_cursor = await customer_service.get_customers(
+            db, is_active=is_active, q=q, include_stats=include_stats,
+            sort_by=sort_by, sort_dir=sort_dir, cursor=cursor,
+            page=page, page_size=page_size,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return CustomerListResponse(
+        data=items, total=total, page=page, page_size=page_size, next_cursor=next_cursor,
+    )
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def _statement_rows(
+    sessions: async_sessionmaker, customer_id: int, date_from: datetime | None, date_to: datetime | None,
+) -> AsyncIterator[dict]:
+    # Own session: the response body is produced after the request's session is released
+    async with sessions() as db:
+        async for row in customer_service.stream_statement(db, customer_id, date_from, date_to):
+            yield row
+
+
+async def _statement_json(sessions, customer, date_from, date_to) -> AsyncIterator[str]:
+    header = {
+        "customer_id": customer.customer_id,
+        "customer_name": customer.customer_name,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    yield json.dumps(header, default=_json_default)[:-1] + ', "rows": ['
+    first = last = None
+    async for row in _statement_rows(sessions, customer.customer_id, date_from, date_to):
+        yield ("" if first is None else ",") + json.dumps(row, default=_json_default)
+        if first is None:
+            first = row
+        last = row
+    opening = first["balance_uzs"] - first["debit_uzs"] + first["credit_uzs"] if first else None
+    closing = last["balance_uzs"] if last else None
+    yield "], " + json.dumps(
+        {"opening_balance_uzs": opening, "closing_balance_uzs": closing}, default=_json_default,
+    )[1:]
+
+
+async def _statement_csv(sessions, customer, date_from, date_to) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=customer_service.STATEMENT_COLUMNS)
+    writer.writeheader()
+    async for row in _statement_rows(sessions, customer.customer_id, date_from, date_to):
+        writer.writerow(row)
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@router.get("/{customer_id}/statement")
+async def get_statement(
+    request: Request,
+    customer_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    format: Literal["json", "csv"] = "json",
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Order charges and payments with a running balance, streamed as JSON or CSV."""
+    customer = await customer_service.get_customer(db, customer_id)
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    if format == "csv":
+        return StreamingResponse(
+            _statement_csv(read_session_factory(request), customer, date_from, date_to),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="statement-{customer_id}.csv"'},
+        )
+    return StreamingResponse(
+        _statement_json(read_session_factory(request), customer, date_from, date_to), media_type="application/json",
+    )
 
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
-async def get_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
+async def get_customer(customer_id: int, db: AsyncSession = Depends(get_read_db)):
     customer = await customer_service.get_customer(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -46,3 +147,28 @@ async def delete_customer(customer_id: int, db: AsyncSession = Depends(get_db)):
     deleted = await customer_service.delete_customer(db, customer_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Customer not found")
+
+
+@router.get("/{customer_id}/budget/ledger", response_model=PaginatedResponse[BudgetEntryResponse])
+async def get_budget_ledger(
+    customer_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if not await customer_service.get_customer(db, customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    items, total = await customer_budget.get_ledger(db, customer_id, page=page, page_size=page_size)
+    return PaginatedResponse(data=items, total=total, page=page, page_size=page_size)
+
+
+@router.post("/{customer_id}/budget", response_model=BudgetEntryResponse, status_code=201)
+async def post_budget_entry(customer_id: int, data: BudgetEntryCreate, db: AsyncSession = Depends(get_db)):
+    if data.entry_type == "top_up" and data.amount_uzs <= 0:
+        raise HTTPException(status_code=400, detail="Top-up amount must be positive")
+    if not data.amount_uzs:
+        raise HTTPException(status_code=400, detail="Amount must not be zero")
+    entry = await customer_budget.add_manual_entry(db, customer_id, data.amount_uzs, data.entry_type, data.note)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return entry
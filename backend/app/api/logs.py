@@ -1,71 +1,59 @@
-from datetime import datetime, timezone
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import datetime
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.security import require_admin
-from app.models.activity_log import ActivityLog
-from app.models.app_settings import AppSettings
+from app.core.database import async_session, get_db, get_read_db
+from app.core.security import get_user_from_token, require_admin
 from app.models.user import User
+from app.schemas.activity_log import ActivityLogResponse
+from app.schemas.pagination import CursorPaginatedResponse
+from app.services import activity_log as activity_log_service
+from app.services import log_stream
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
 
-async def _get_or_create_settings(db: AsyncSession) -> AppSettings:
-    result = await db.execute(select(AppSettings).where(AppSettings.id == 1))
-    settings = result.scalar_one_or_none()
-    if not settings:
-        settings = AppSettings(id=1, logs_last_seen_at=None)
-        db.add(settings)
-        await db.commit()
-        await db.refresh(settings)
-    return settings
+@router.get("", response_model=CursorPaginatedResponse[ActivityLogResponse])
+async def get_logs(
+    order_id: int | None = None,
+    user_id: int | None = None,
+    action: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    cursor: str | None = None,
+    page_size: int = Query(30, ge=1, le=200),
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        logs, next_cursor = await activity_log_service.get_logs(
+            db, order_id=order_id, user_id=user_id, action=action,
+            date_from=date_from, date_to=date_to, cursor=cursor, page_size=page_size,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return CursorPaginatedResponse(data=logs, next_cursor=next_cursor, page_size=page_size)
 
 
-@router.get("")
-async def get_logs(
+@router.get("/orders/{order_id}", response_model=list[ActivityLogResponse])
+async def get_order_timeline(
+    order_id: int,
     current_user: User = Depends(require_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
-        select(ActivityLog).order_by(ActivityLog.created_at.desc()).limit(30)
-    )
-    logs = result.scalars().all()
-    return [
-        {
-            "log_id": log.log_id,
-            "user_name": log.user_name,
-            "user_role": log.user_role,
-            "order_id": log.order_id,
-            "order_number": log.order_number,
-            "action": log.action,
-            "field": log.field,
-            "old_value": log.old_value,
-            "new_value": log.new_value,
-            "created_at": log.created_at,
-        }
-        for log in logs
-    ]
+    return await activity_log_service.get_order_timeline(db, order_id)
 
 
 @router.get("/unread-count")
 async def get_unread_count(
     current_user: User = Depends(require_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    settings = await _get_or_create_settings(db)
-    if settings.logs_last_seen_at is None:
-        result = await db.execute(select(func.count()).select_from(ActivityLog))
-    else:
-        result = await db.execute(
-            select(func.count())
-            .select_from(ActivityLog)
-            .where(ActivityLog.created_at > settings.logs_last_seen_at)
-        )
-    count = result.scalar_one()
-    return {"count": count}
+    return {"count": await activity_log_service.get_unread_count(db, current_user.user_id)}
 
 
 @router.post("/mark-seen")
@@ -73,7 +61,35 @@ async def mark_seen(
     current_user: User = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    settings = await _get_or_create_settings(db)
-    settings.logs_last_seen_at = datetime.now(timezone.utc)
-    await db.commit()
+    await activity_log_service.mark_seen(db, current_user.user_id)
     return {"ok": True}
+
+
+async def _log_events(request: Request, user_id: int, count: int) -> AsyncIterator[str]:
+    async with log_stream.subscribe(user_id) as queue:
+        yield log_stream.format_event("count", {"count": count})
+        while not await request.is_disconnected():
+            try:
+                yield await asyncio.wait_for(queue.get(), log_stream.HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+
+
+@router.get("/stream")
+async def stream_logs(request: Request, token: str):
+    """Server-sent events: ``log`` for each new entry, ``count`` for the badge.
+
+    EventSource cannot send headers, so the bearer token comes in the query
+    string. The session is released before streaming starts; events are fed
+    by the worker's LISTEN connection.
+    """
+    async with async_session() as db:
+        user = await get_user_from_token(token, db)
+        if user.role != "admin":
+            raise HTTPException(status_code=403, detail="Admin access required")
+        count = await activity_log_service.get_unread_count(db, user.user_id)
+    return StreamingResponse(
+        _log_events(request, user.user_id, count),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,30 +4,19 @@ from decimal import Decimal, ROUND_HALF_UP
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import get_current_user
-from app.models.activity_log import ActivityLog
 from app.models.order import Order
 from app.models.user import User
-from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, ShoppingOverride
-from app.schemas.pagination import PaginatedResponse
+from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, ShoppingOverride, UnshippedOrderResponse
+from app.schemas.pagination import CursorPaginatedResponse, PaginatedResponse
 from app.services import order as order_service
+from app.services.attribute_snapshot import format_attributes
 from app.services.currency import get_rates
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
-def _format_item_attributes(item) -> str | None:
-    if not item.attribute_values:
-        return None
-    parts = [
-        f"{av.attribute.attribute_name}: {av.value}"
-        for av in item.attribute_values
-        if av.attribute
-    ]
-    return ", ".join(parts) if parts else None
-
-
 def _order_to_response(order, usd_to_uzs: Decimal = Decimal(0)) -> dict:
     items = [
         {
@@ -38,11 +27,8 @@ def _order_to_response(order, usd_to_uzs: Decimal = Decimal(0)) -> dict:
             "selling_price_uzs": item.selling_price_uzs,
             "cost_price": item.cost_price,
             "product_name": item.product.product_name if item.product else None,
-            "product_attributes": _format_item_attributes(item),
-            "attribute_values": [
-                {"attribute_id": av.attribute_id, "attribute_name": av.attribute.attribute_name if av.attribute else None, "value": av.value}
-                for av in item.attribute_values
-            ],
+            "product_attributes": format_attributes(item.attribute_snapshot),
+            "attribute_values": item.attribute_snapshot or [],
             "packaged_weight_grams": item.product.packaged_weight_grams if item.product else None,
             "brand": item.product.brand if item.product else None,
             "category_name": item.product.category.category_name if item.product and item.product.category else None,
@@ -147,52 +133,6 @@ def _order_to_response(order, usd_to_uzs: Decimal = Decimal(0)) -> dict:
     }
 
 
-async def _write_order_logs(
-    db: AsyncSession,
-    user: User,
-    order: Order,
-    old_status: str,
-    old_payment_status: str,
-    old_paid_card: Decimal,
-    old_paid_cash: Decimal,
-) -> None:
-    logs = []
-
-    def _log(action: str, field: str, old_val: str, new_val: str):
-        logs.append(ActivityLog(
-            user_id=user.user_id,
-            user_name=user.name,
-            user_role=user.role,
-            order_id=order.order_id,
-            order_number=order.order_number,
-            action=action,
-            field=field,
-            old_value=old_val,
-            new_value=new_val,
-        ))
-
-    if order.status != old_status:
-        _log("status_changed", "status", old_status, order.status)
-
-    if order.payment_status != old_payment_status:
-        _log("payment_status_changed", "payment_status", old_payment_status, order.payment_status)
-
-    new_paid_card = order.paid_card or Decimal(0)
-    new_paid_cash = order.paid_cash or Decimal(0)
-    norm_old_card = old_paid_card or Decimal(0)
-    norm_old_cash = old_paid_cash or Decimal(0)
-
-    if new_paid_card != norm_old_card:
-        _log("payment_amount_changed", "paid_card", str(norm_old_card), str(new_paid_card))
-
-    if new_paid_cash != norm_old_cash:
-        _log("payment_amount_changed", "paid_cash", str(norm_old_cash), str(new_paid_cash))
-
-    if logs:
-        db.add_all(logs)
-        await db.commit()
-
-
 async def _usd_to_uzs_rate() -> Decimal:
     try:
         r = await get_rates()
@@ -213,7 +153,7 @@ async def list_orders(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     is_archived: bool = False,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     orders, total = await order_service.get_orders(
         db,
@@ -237,8 +177,32 @@ async def list_orders(
     )
 
 
+@router.get("/unshipped", response_model=CursorPaginatedResponse[UnshippedOrderResponse])
+async def list_unshipped_orders(
+    customer_id: int | None = None,
+    min_weight_kg: Decimal | None = Query(None, ge=0),
+    max_weight_kg: Decimal | None = Query(None, ge=0),
+    cursor: int | None = None,
+    page_size: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    orders, next_cursor = await order_service.get_unshipped_orders(
+        db,
+        customer_id=customer_id,
+        min_weight_kg=min_weight_kg,
+        max_weight_kg=max_weight_kg,
+        cursor=cursor,
+        page_size=page_size,
+    )
+    return CursorPaginatedResponse(
+        data=orders,
+        next_cursor=str(next_cursor) if next_cursor is not None else None,
+        page_size=page_size,
+    )
+
+
 @router.get("/shopping-list")
-async def get_shopping_list(db: AsyncSession = Depends(get_db)):
+async def get_shopping_list(db: AsyncSession = Depends(get_read_db)):
     return await order_service.get_shopping_list(db)
 
 
@@ -254,7 +218,7 @@ async def save_shopping_override(data: ShoppingOverride, db: AsyncSession = Depe
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
+async def get_order(order_id: int, db: AsyncSession = Depends(get_read_db)):
     order = await order_service.get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -263,8 +227,15 @@ async def get_order(order_id: int, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("", response_model=OrderResponse, status_code=201)
-async def create_order(data: OrderCreate, db: AsyncSession = Depends(get_db)):
-    order = await order_service.create_order(db, data)
+async def create_order(
+    data: OrderCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        order = await order_service.create_order(db, data, user=current_user)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     rate = await _usd_to_uzs_rate()
     return _order_to_response(order, rate)
 
@@ -284,23 +255,23 @@ async def update_order(
         if existing.status != "completed" or existing.payment_status not in ("paid_card", "paid_cash"):
             raise HTTPException(status_code=400, detail="Only completed and fully paid orders can be archived")
 
-    old_status = existing.status
-    old_payment_status = existing.payment_status
-    old_paid_card = existing.paid_card or Decimal(0)
-    old_paid_cash = existing.paid_cash or Decimal(0)
-
-    order = await order_service.update_order(db, order_id, data)
+    try:
+        order = await order_service.update_order(db, order_id, data, user=current_user)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    await _write_order_logs(db, current_user, order, old_status, old_payment_status, old_paid_card, old_paid_cash)
-
     rate = await _usd_to_uzs_rate()
     return _order_to_response(order, rate)
 
 
 @router.delete("/{order_id}", status_code=204)
-async def delete_order(order_id: int, db: AsyncSession = Depends(get_db)):
-    deleted = await order_service.delete_order(db, order_id)
+async def delete_order(
+    order_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    deleted = await order_service.delete_order(db, order_id, user=current_user)
     if not deleted:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.schemas.category_attribute import CategoryAttributeCreate, CategoryAttributeResponse, CategoryAttributeUpdate
 from app.schemas.pagination import PaginatedResponse
 from app.schemas.product_category import ProductCategoryCreate, ProductCategoryResponse, ProductCategoryUpdate
@@ -10,18 +10,37 @@ from app.services import product_category as category_service
 router = APIRouter(prefix="/categories", tags=["Product Categories"])
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 @router.get("", response_model=PaginatedResponse[ProductCategoryResponse])
 async def list_categories(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    items, total = await category_service.get_categories(db, page=page, page_size=page_size)
+    items, total, etag = await category_service.get_categories(db, page=page, page_size=page_size)
+    # The ETag covers the whole tree, so it is valid for every page;
+    # no-cache makes browsers revalidate instead of reusing a stale tree
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return PaginatedResponse(data=items, total=total, page=page, page_size=page_size)
 
 
 @router.get("/{category_id}", response_model=ProductCategoryResponse)
-async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_read_db)):
     category = await category_service.get_category(db, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -30,11 +49,17 @@ async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
 
 @router.post("", response_model=ProductCategoryResponse, status_code=201)
 async def create_category(data: ProductCategoryCreate, db: AsyncSession = Depends(get_db)):
+    if await category_service.find_category_id(db, data.category_name) is not None:
+        raise HTTPException(status_code=400, detail="Category name already exists")
     return await category_service.create_category(db, data)
 
 
 @router.put("/{category_id}", response_model=ProductCategoryResponse)
 async def update_category(category_id: int, data: ProductCategoryUpdate, db: AsyncSession = Depends(get_db)):
+    if data.category_name is not None:
+        existing_id = await category_service.find_category_id(db, data.category_name)
+        if existing_id not in (None, category_id):
+            raise HTTPException(status_code=400, detail="Category name already exists")
     category = await category_service.update_category(db, category_id, data)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -1,49 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import re
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.schemas.pagination import PaginatedResponse
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from app.core.database import get_db, get_read_db
+from app.core.security import require_admin
+from app.models.user import User
+from app.schemas.product import (
+    CatalogueMergeReport,
+    ProductCreate,
+    ProductImportResult,
+    ProductListResponse,
+    ProductResponse,
+    ProductSearchResult,
+    ProductUpdate,
+    RepriceJob,
+    RepricePreview,
+    RepriceRequest,
+)
+from app.services import catalogue_merge
 from app.services import product as product_service
+from app.services import product_import
+from app.services import repricing
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+ATTR_FILTER_PARAM = re.compile(r"^attr\[(\d+)\]$")
+
+
+def _attr_filters(request: Request) -> dict[int, list[str]]:
+    """Collect attr[<attribute_id>]=value query params; repeats mean any-of."""
+    filters: dict[int, list[str]] = {}
+    for key, value in request.query_params.multi_items():
+        match = ATTR_FILTER_PARAM.match(key)
+        if match and value:
+            filters.setdefault(int(match.group(1)), []).append(value)
+        elif key.startswith("attr"):
+            raise HTTPException(status_code=400, detail=f"Invalid attribute filter: {key}")
+    return filters
+
 
 @router.get("/low-stock", response_model=list[ProductResponse])
-async def low_stock_products(db: AsyncSession = Depends(get_db)):
+async def low_stock_products(db: AsyncSession = Depends(get_read_db)):
     return await product_service.get_low_stock_products(db)
 
 
 @router.get("/brands", response_model=list[str])
 async def list_brands(
     category_id: int | None = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     return await product_service.get_brands(db, category_id=category_id)
 
 
-@router.get("", response_model=PaginatedResponse[ProductResponse])
+@router.get("/search", response_model=list[ProductSearchResult])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    category_id: int | None = None,
+    brand: str | None = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await product_service.search_products(
+        db, q, category_id=category_id, brand=brand, limit=limit,
+    )
+
+
+@router.get("", response_model=ProductListResponse)
 async def list_products(
+    request: Request,
     category_id: int | None = None,
     brand: str | None = None,
     is_active: bool | None = None,
     stock_status: str | None = None,
+    min_times_ordered: int | None = Query(None, ge=0),
+    in_shipment: bool | None = None,
+    # Opt-in: the filter UI asks for facets; plain list pages stay one query
+    facets: bool = False,
     sort_by: str | None = None,
     sort_dir: str = "asc",
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    items, total = await product_service.get_products(
+    items, total, filtered = await product_service.get_products(
         db, category_id=category_id, brand=brand, is_active=is_active,
-        stock_status=stock_status, sort_by=sort_by, sort_dir=sort_dir,
+        stock_status=stock_status, min_times_ordered=min_times_ordered, in_shipment=in_shipment,
+        attr_filters=_attr_filters(request),
+        sort_by=sort_by, sort_dir=sort_dir,
         page=page, page_size=page_size,
     )
-    return PaginatedResponse(data=items, total=total, page=page, page_size=page_size)
+    attribute_facets = await product_service.get_attribute_facets(db, filtered) if facets and total else []
+    return ProductListResponse(
+        data=items, total=total, page=page, page_size=page_size, facets=attribute_facets,
+    )
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_read_db)):
     product = await product_service.get_product(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -55,6 +110,55 @@ async def create_product(data: ProductCreate, db: AsyncSession = Depends(get_db)
     return await product_service.create_product(db, data)
 
 
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Literal["csv", "ndjson"] | None = None,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a CSV (header row, ``attr:<attribute_id>`` columns) or NDJSON body."""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    return await product_import.import_products(db, request.stream(), fmt=format)
+
+
+@router.post("/reprice", response_model=RepricePreview | RepriceJob)
+async def reprice_products(
+    data: RepriceRequest,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Recompute selling prices from cost_price and the current rates.
+
+    With ``dry_run`` the affected prices are returned without writing;
+    otherwise a background job is started and its progress record returned.
+    """
+    options = data.model_dump(exclude={"dry_run"})
+    if data.dry_run:
+        return await repricing.preview_repricing(db, **options)
+    return await repricing.start_repricing(db, **options)
+
+
+@router.post("/merge-duplicates", response_model=CatalogueMergeReport)
+async def merge_duplicates(
+    dry_run: bool = True,
+    current_user: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Collapse duplicate categories and products; dry_run only reports them."""
+    return await catalogue_merge.merge_duplicates(db, dry_run=dry_run)
+
+
+@router.get("/reprice/{job_id}", response_model=RepriceJob)
+async def get_reprice_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await repricing.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Repricing job not found")
+    return job
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: int, data: ProductUpdate, db: AsyncSession = Depends(get_db)):
     product = await product_service.update_product(db, product_id, data)
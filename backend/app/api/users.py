@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.security import hash_password, require_admin
+from app.core.database import get_db, get_read_db
+from app.core.security import hash_password, invalidate_user_cache, require_admin
 from app.models.user import User
 from app.schemas.auth import UserCreate, UserResponse, UserUpdate
 
@@ -13,7 +13,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 @router.get("", response_model=list[UserResponse])
 async def list_users(
     current_user: User = Depends(require_admin),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await db.execute(select(User).order_by(User.created_at.asc()))
     return result.scalars().all()
@@ -32,7 +32,7 @@ async def create_user(
     user = User(
         name=data.name,
         user_name=data.user_name,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password(data.password),
         role=data.role,
     )
     db.add(user)
@@ -66,11 +66,12 @@ async def update_user(
             raise HTTPException(status_code=400, detail="Username already taken")
         user.user_name = data.user_name
     if data.password is not None and data.password.strip():
-        user.password_hash = hash_password(data.password)
+        user.password_hash = await hash_password(data.password)
     if data.is_active is not None:
         user.is_active = data.is_active
 
     await db.commit()
+    invalidate_user_cache(user_id)
     await db.refresh(user)
     return user
 
@@ -90,3 +91,4 @@ async def delete_user(
 
     await db.delete(user)
     await db.commit()
+    invalidate_user_cache(user_id)
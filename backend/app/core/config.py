@@ -3,16 +3,46 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Optional streaming replica for read-only routes (see core.database.get_read_db)
+    READ_DATABASE_URL: str | None = None
+    # How long a client reads from the primary after a write, covering replica lag
+    READ_PRIMARY_PIN_SECONDS: float = 5.0
     SECRET_KEY: str = "change-me-in-production"
+    # Connection pool and driver tuning (see core.database)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Connections opened during startup; None warms the whole pool_size
+    DB_POOL_WARMUP: int | None = None
+    # Per-statement server timeout in milliseconds (0 disables)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # asyncpg prepared statement cache per connection; 0 for pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # bcrypt calls allowed to run at once; the rest wait for a thread
+    PASSWORD_HASH_CONCURRENCY: int = 2
+    # Activity log months kept in the database; older ones are archived (0 keeps all)
+    LOG_RETENTION_MONTHS: int = 12
+    LOG_ARCHIVE_DIR: str = "log_archive"
+    # When set, /api/metrics requires "Authorization: Bearer <token>"
+    METRICS_TOKEN: str | None = None
 
     model_config = {"env_file": ".env"}
 
     @property
     def async_database_url(self) -> str:
-        url = self.DATABASE_URL
-        if url.startswith("postgresql://") and "+asyncpg" not in url:
-            url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
-        return url
+        return _asyncpg_url(self.DATABASE_URL)
+
+    @property
+    def async_read_database_url(self) -> str | None:
+        return _asyncpg_url(self.READ_DATABASE_URL) if self.READ_DATABASE_URL else None
+
+
+def _asyncpg_url(url: str) -> str:
+    if url.startswith("postgresql://") and "+asyncpg" not in url:
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
 
 
 settings = Settings()
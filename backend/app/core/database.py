@@ -1,16 +1,198 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+from sqlalchemy import exc, func, literal_column, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core import metrics
 from app.core.config import settings
 
-engine = create_async_engine(settings.async_database_url, echo=False)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each of its checkouts waited.
+
+    ``label`` names the pool in metrics; both it and ``wait_stats`` carry
+    over when the engine recreates the pool.
+    """
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.label = "primary"
+        self.wait_stats = {"checkouts": 0, "timeouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.label, pool.wait_stats = self.label, self.wait_stats
+        return pool
+
+    def _do_get(self):
+        stats = self.wait_stats
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats["timeouts"] += 1
+            metrics.db_pool_timeouts.inc(self.label)
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            stats["checkouts"] += 1
+            stats["wait_seconds_total"] += waited
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+            metrics.db_pool_wait_seconds.observe(waited, self.label)
+
+
+def _create_engine(url: str, read_only: bool = False) -> AsyncEngine:
+    url = make_url(url).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    )
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if read_only:
+        # A write slipping into a read route fails loudly, even when the
+        # "replica" is the primary itself
+        server_settings["default_transaction_read_only"] = "on"
+    db_engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        },
+    )
+    db_engine.pool.label = "replica" if read_only else "primary"
+    return db_engine
+
+
+engine = _create_engine(settings.async_database_url)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Replica for read-only routes; the primary itself when READ_DATABASE_URL is unset
+read_engine = (
+    _create_engine(settings.async_read_database_url, read_only=True) if settings.READ_DATABASE_URL else engine
+)
+read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Request header pinning reads to the primary, and the response header
+# telling a client that just wrote for how many seconds to send it
+READ_PRIMARY_HEADER = "X-Read-Primary"
+READ_PRIMARY_FOR_HEADER = "X-Read-Primary-For"
+
+
+def pool_status(db_engine: AsyncEngine = engine) -> dict:
+    pool = db_engine.pool
+    wait_stats = pool.wait_stats
+    checkouts = wait_stats["checkouts"]
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool counts overflow from -pool_size until the pool has filled
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout_seconds": settings.DB_POOL_TIMEOUT,
+        **wait_stats,
+        "wait_seconds_avg": wait_stats["wait_seconds_total"] / checkouts if checkouts else None,
+    }
+
+
+def _pool_metrics() -> list[str]:
+    statuses = {"primary": pool_status(engine)}
+    if read_engine is not engine:
+        statuses["replica"] = pool_status(read_engine)
+    lines = []
+    for key, name, documentation in (
+        ("size", "db_pool_size", "Configured pool size."),
+        ("checked_out", "db_pool_checked_out", "Connections currently in use."),
+        ("overflow", "db_pool_overflow", "Connections open beyond the pool size."),
+    ):
+        lines += metrics.gauge_lines(
+            name, documentation, [({"pool": pool}, status[key]) for pool, status in statuses.items()],
+        )
+    return lines
+
+
+metrics.instrument_engine(engine)
+metrics.instrument_engine(read_engine)
+metrics.register_collector(_pool_metrics)
+
+
+async def ping(db_engine: AsyncEngine = engine) -> float:
+    """Round trip of SELECT 1 in seconds, including the checkout."""
+    started = time.perf_counter()
+    async with db_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return time.perf_counter() - started
+
+
+async def warm_pool(db_engine: AsyncEngine = engine, count: int | None = None) -> None:
+    """Open ``count`` connections at once so the first requests find them ready."""
+    count = settings.DB_POOL_WARMUP if count is None else count
+    count = settings.DB_POOL_SIZE if count is None else min(count, settings.DB_POOL_SIZE)
+    if count > 0:
+        await asyncio.gather(*(ping(db_engine) for _ in range(count)))
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def normalize_name(name: str) -> str:
+    """Case- and whitespace-insensitive key for catalogue names."""
+    return " ".join(name.split()).lower()
+
+
+def normalized_name(column):
+    """SQL counterpart of normalize_name, usable in functional indexes.
+
+    The pattern arguments are inlined rather than bound so lookups render the
+    exact expression of the index and stay index-backed under generic plans.
+    """
+    return func.lower(func.btrim(func.regexp_replace(
+        column, literal_column(r"'\s+'"), literal_column("' '"), literal_column("'g'"),
+    )))
+
+
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """The replica's sessions, unless the request asks for the primary."""
+    if read_engine is engine or request.headers.get(READ_PRIMARY_HEADER):
+        return async_session
+    return read_session
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes; see read_session_factory."""
+    async with read_session_factory(request)() as session:
+        yield session
+
+
+@asynccontextmanager
+async def primary_session(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """``db`` unless it is on the replica, otherwise a short-lived primary session.
+
+    Process-wide caches load through this, so a lagging replica cannot
+    refill them with rows older than the write that just invalidated them.
+    Sessions bound elsewhere (a migration's connection) are used as is.
+    """
+    if read_engine is engine or db.bind is not read_engine:
+        yield db
+    else:
+        async with async_session() as session:
+            yield session
@@ -0,0 +1,214 @@
+"""In-process Prometheus metrics, exposed at /api/metrics.
+
+A deliberately small subset of the client library: counters and
+histograms with labels, plus collectors that read gauges from existing
+stats at scrape time. Everything is updated from the event loop thread,
+so no locking is needed. Values are per worker process; Prometheus sums
+them across targets.
+"""
+import contextvars
+import math
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_metrics: list = []
+_collectors: list[Callable[[], list[str]]] = []
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets) + (math.inf,)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: dict[tuple, list] = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._values.get(label_values)
+        if series is None:
+            series = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def gauge_lines(name: str, documentation: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """Exposition lines for a gauge computed at scrape time by a collector."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        names = tuple(labels)
+        lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+    return lines
+
+
+def register_collector(collector: Callable[[], list[str]]) -> None:
+    """Add a function returning exposition lines, called on every scrape."""
+    _collectors.append(collector)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"),
+)
+http_request_db_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("method", "route"), COUNT_BUCKETS,
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.", ("method", "route"),
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",),
+)
+db_pool_timeouts = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT.", ("pool",),
+)
+rate_cache_requests = Counter(
+    "rate_cache_requests_total", "Exchange rate lookups by cache result.", ("result",),
+)
+rate_fetch_seconds = Histogram(
+    "rate_fetch_duration_seconds", "Latency of exchange rate API calls.", ("outcome",),
+)
+
+# SQL work of the current request: [statement count, seconds]. Set by
+# MetricsMiddleware; async SQLAlchemy runs cursor events in a greenlet
+# that shares the calling task's context, so the hooks below see it.
+_request_db: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_db", default=None)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no per-request task or body wrapping."""
+
+    def __init__(self, app, prefix: str = ""):
+        self.app = app
+        # Routers are included under this prefix but report router-relative
+        # templates, so it is put back to make labels match the real URLs
+        self.prefix = prefix.rstrip("/")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        db_work = [0, 0.0]
+        token = _request_db.set(db_work)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+            # Templates, not raw paths, keep the label set bounded
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                route = "unmatched"
+            else:
+                if self.prefix and not route.startswith(self.prefix + "/"):
+                    route = self.prefix + route
+                route = scope.get("root_path", "").rstrip("/") + route
+            method = scope["method"]
+            http_request_seconds.observe(elapsed, method, route, status["code"])
+            http_request_db_statements.observe(db_work[0], method, route)
+            http_request_db_seconds.observe(db_work[1], method, route)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_started"].pop()
+    db_work = _request_db.get()
+    if db_work is not None:
+        db_work[0] += 1
+        db_work[1] += time.perf_counter() - started
+
+
+def _handle_error(exception_context) -> None:
+    if exception_context.connection is not None:
+        started = exception_context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def instrument_engine(db_engine: AsyncEngine) -> None:
+    """Count statements and their time against the request that ran them."""
+    sync_engine = db_engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
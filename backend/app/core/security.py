@@ -1,3 +1,7 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
@@ -15,13 +19,67 @@ security_scheme = HTTPBearer()
 
 ALGORITHM = "HS256"
 
+USER_CACHE_TTL = 60  # seconds
+USER_CACHE_SIZE = 1024
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+# Active users by user_id as (cached_at, column values), LRU-ordered.
+# api/users drops entries on writes; the TTL bounds staleness in other workers.
+_user_cache: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+_user_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+# bcrypt takes 100-300 ms per call; it runs on its own small pool so a burst
+# of logins queues there instead of blocking the event loop or starving the
+# default executor
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt",
+)
+_hash_stats = {
+    "calls": 0,
+    "in_flight": 0,
+    "queue_seconds_total": 0.0,
+    "queue_seconds_max": 0.0,
+    "hash_seconds_total": 0.0,
+}
+
+
+async def _run_bcrypt(fn, *args):
+    submitted = time.perf_counter()
+    _hash_stats["in_flight"] += 1
+
+    def job():
+        started = time.perf_counter()
+        return started, fn(*args), time.perf_counter()
+
+    try:
+        started, result, finished = await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+    finally:
+        _hash_stats["in_flight"] -= 1
+    queued = started - submitted
+    _hash_stats["calls"] += 1
+    _hash_stats["queue_seconds_total"] += queued
+    _hash_stats["queue_seconds_max"] = max(_hash_stats["queue_seconds_max"], queued)
+    _hash_stats["hash_seconds_total"] += finished - started
+    return result
+
+
+def get_password_hash_stats() -> dict:
+    calls = _hash_stats["calls"]
+    return {
+        **_hash_stats,
+        "concurrency": settings.PASSWORD_HASH_CONCURRENCY,
+        "queue_seconds_avg": _hash_stats["queue_seconds_total"] / calls if calls else None,
+        "hash_seconds_avg": _hash_stats["hash_seconds_total"] / calls if calls else None,
+    }
+
+
+async def hash_password(password: str) -> str:
+    hashed = await _run_bcrypt(bcrypt.hashpw, password.encode(), bcrypt.gensalt())
+    return hashed.decode()
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _run_bcrypt(bcrypt.checkpw, plain.encode(), hashed.encode())
 
 
 def create_access_token(user_id: int, role: str, remember: bool = False) -> str:
@@ -30,24 +88,64 @@ def create_access_token(user_id: int, role: str, remember: bool = False) -> str:
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    token = credentials.credentials
+def invalidate_user_cache(user_id: int | None = None) -> None:
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(user_id, None)
+
+
+def get_user_cache_stats() -> dict:
+    lookups = _user_cache_stats["hits"] + _user_cache_stats["misses"]
+    return {
+        **_user_cache_stats,
+        "size": len(_user_cache),
+        "max_size": USER_CACHE_SIZE,
+        "ttl_seconds": USER_CACHE_TTL,
+        "hit_rate": _user_cache_stats["hits"] / lookups if lookups else None,
+    }
+
+
+def _user_columns(user: User) -> dict:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+async def get_user_from_token(token: str, db: AsyncSession) -> User:
+    """The active user a bearer token belongs to; raises 401 otherwise."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         user_id = int(payload["sub"])
     except (jwt.InvalidTokenError, KeyError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+    cached = _user_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < USER_CACHE_TTL:
+        _user_cache_stats["hits"] += 1
+        _user_cache.move_to_end(user_id)
+        # A fresh transient instance per request, so handlers cannot share state
+        return User(**cached[1])
+    _user_cache_stats["misses"] += 1
+
     result = await db.execute(select(User).where(User.user_id == user_id, User.is_active == True))
     user = result.scalar_one_or_none()
     if not user:
+        _user_cache.pop(user_id, None)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    _user_cache[user_id] = (time.monotonic(), _user_columns(user))
+    _user_cache.move_to_end(user_id)
+    while len(_user_cache) > USER_CACHE_SIZE:
+        _user_cache.popitem(last=False)
+        _user_cache_stats["evictions"] += 1
     return user
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    return await get_user_from_token(credentials.credentials, db)
+
+
 async def require_admin(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
@@ -1,13 +1,17 @@
 from app.models.activity_log import ActivityLog
 from app.models.app_settings import AppSettings
+from app.models.brand import Brand
 from app.models.category_attribute import CategoryAttribute
 from app.models.customer import Customer
+from app.models.customer_budget_entry import CustomerBudgetEntry
+from app.models.log_read_state import LogReadState
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.order_item_attribute_value import OrderItemAttributeValue
 from app.models.product import Product
 from app.models.product_attribute_value import ProductAttributeValue
 from app.models.product_category import ProductCategory
+from app.models.reprice_job import RepriceJob
 from app.models.shipment import Shipment, ShipmentOrder, ShipmentStockItem
 from app.models.shopping_list_override import ShoppingListOverride
 from app.models.user import User
@@ -15,14 +19,18 @@ from app.models.user import User
 __all__ = [
     "ActivityLog",
     "AppSettings",
+    "Brand",
     "CategoryAttribute",
     "Customer",
+    "CustomerBudgetEntry",
+    "LogReadState",
     "Order",
     "OrderItem",
     "OrderItemAttributeValue",
     "Product",
     "ProductAttributeValue",
     "ProductCategory",
+    "RepriceJob",
     "Shipment",
     "ShipmentOrder",
     "ShipmentStockItem",
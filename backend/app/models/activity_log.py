@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -8,6 +8,15 @@ from app.core.database import Base
 
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Keyset paging on (created_at, log_id), overall and per filter
+        Index("ix_activity_logs_created_log", "created_at", "log_id"),
+        Index("ix_activity_logs_order_created_log", "order_id", "created_at", "log_id"),
+        Index("ix_activity_logs_user_created_log", "user_id", "created_at", "log_id"),
+        Index("ix_activity_logs_action_created_log", "action", "created_at", "log_id"),
+        # Monthly partitions, managed by services.log_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     log_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int | None] = mapped_column(
@@ -19,11 +28,14 @@ class ActivityLog(Base):
         Integer, ForeignKey("orders.order_id", ondelete="SET NULL"), nullable=True
     )
     order_number: Mapped[str | None] = mapped_column(String, nullable=True)
+    shipment_number: Mapped[str | None] = mapped_column(String, nullable=True)
     action: Mapped[str] = mapped_column(String, nullable=False)
     field: Mapped[str] = mapped_column(String, nullable=False)
     old_value: Mapped[str | None] = mapped_column(String, nullable=True)
     new_value: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Part of the key because it is the partition key
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         default=lambda: datetime.now(timezone.utc),
     )
@@ -1,6 +1,6 @@
 from decimal import Decimal
 
-from sqlalchemy import Boolean, Numeric, String
+from sqlalchemy import Boolean, Index, Numeric, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -8,6 +8,13 @@ from app.core.database import Base
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        # Substring search on the customer list (requires pg_trgm)
+        Index(
+            "ix_customers_customer_name_trgm", "customer_name",
+            postgresql_using="gin", postgresql_ops={"customer_name": "gin_trgm_ops"},
+        ),
+    )
 
     customer_id: Mapped[int] = mapped_column(primary_key=True)
     customer_name: Mapped[str] = mapped_column(String(255))
@@ -16,6 +23,7 @@ class Customer(Base):
     address: Mapped[str | None] = mapped_column(String(255))
     city: Mapped[str | None] = mapped_column(String(100))
     is_active: Mapped[bool] = mapped_column(Boolean, server_default="true")
+    # Balance snapshot; only changed through services.customer_budget.post_entry
     budget: Mapped[Decimal] = mapped_column(Numeric(15, 2), server_default="0")
 
     orders: Mapped[list["Order"]] = relationship(back_populates="customer")
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import DateTime, ForeignKey, Index, Numeric, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class CustomerBudgetEntry(Base):
+    """Append-only ledger of customer budget movements.
+
+    customers.budget is the running balance; every change to it is written
+    here in the same transaction with the balance it produced.
+    """
+    __tablename__ = "customer_budget_ledger"
+    __table_args__ = (
+        Index("ix_customer_budget_ledger_customer_entry", "customer_id", "entry_id"),
+    )
+
+    entry_id: Mapped[int] = mapped_column(primary_key=True)
+    customer_id: Mapped[int] = mapped_column(ForeignKey("customers.customer_id", ondelete="CASCADE"))
+    order_id: Mapped[int | None] = mapped_column(
+        ForeignKey("orders.order_id", ondelete="SET NULL"), index=True, nullable=True
+    )
+    # top_up, adjustment, application (negative) or refund (positive)
+    entry_type: Mapped[str] = mapped_column(String(20))
+    amount_uzs: Mapped[Decimal] = mapped_column(Numeric(15, 2))
+    balance_after_uzs: Mapped[Decimal] = mapped_column(Numeric(15, 2))
+    note: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+    )
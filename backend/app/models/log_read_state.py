@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class LogReadState(Base):
+    """When each admin last opened the activity log.
+
+    Unread counts are derived from it through the created_at index, so
+    writing logs never touches these rows.
+    """
+    __tablename__ = "log_read_states"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    last_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
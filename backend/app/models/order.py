@@ -1,7 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Numeric, String, Text, func
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Numeric, String, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -9,10 +9,40 @@ from app.core.database import Base
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status_shipping_number", "status", "shipping_number"),
+        # Candidate set for the shipment builder: pending, non-archived orders
+        Index(
+            "ix_orders_pending_open",
+            "order_id",
+            postgresql_where=text("status = 'pending' AND is_archived = false"),
+        ),
+        # Order list: archive tab first, then the optional status / payment
+        # filter, then the date range and default sort
+        Index("ix_orders_archived_date", "is_archived", "order_date"),
+        Index("ix_orders_archived_status_date", "is_archived", "status", "order_date"),
+        Index("ix_orders_archived_payment_date", "is_archived", "payment_status", "order_date"),
+        # Dashboard revenue and sales figures
+        Index(
+            "ix_orders_completed_date",
+            "order_date",
+            postgresql_include=["total_amount"],
+            postgresql_where=text("status = 'completed' AND is_family_discount = false"),
+        ),
+        # Dashboard unpaid orders
+        Index(
+            "ix_orders_received_unpaid_date",
+            "order_date",
+            postgresql_where=text(
+                "status = 'received' AND is_family_discount = false "
+                "AND payment_status NOT IN ('paid_card', 'paid_cash')"
+            ),
+        ),
+    )
 
     order_id: Mapped[int] = mapped_column(primary_key=True)
     order_number: Mapped[str] = mapped_column(String(50), unique=True)
-    customer_id: Mapped[int | None] = mapped_column(ForeignKey("customers.customer_id"))
+    customer_id: Mapped[int | None] = mapped_column(ForeignKey("customers.customer_id"), index=True)
     order_date: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     total_amount: Mapped[Decimal | None] = mapped_column(Numeric(12, 2))
     status: Mapped[str] = mapped_column(String(20), server_default="pending")
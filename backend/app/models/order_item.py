@@ -1,6 +1,7 @@
 from decimal import Decimal
 
-from sqlalchemy import Boolean, ForeignKey, Integer, Numeric
+from sqlalchemy import Boolean, ForeignKey, Integer, Numeric, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -10,13 +11,16 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     item_id: Mapped[int] = mapped_column(primary_key=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.order_id", ondelete="CASCADE"))
-    product_id: Mapped[int | None] = mapped_column(ForeignKey("products.product_id"))
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.order_id", ondelete="CASCADE"), index=True)
+    product_id: Mapped[int | None] = mapped_column(ForeignKey("products.product_id"), index=True)
     quantity: Mapped[int] = mapped_column(Integer, server_default="1")
     selling_price: Mapped[Decimal | None] = mapped_column(Numeric(12, 2))
     selling_price_uzs: Mapped[Decimal | None] = mapped_column(Numeric(12, 2))
     cost_price: Mapped[Decimal | None] = mapped_column(Numeric(12, 2))
     from_stock: Mapped[bool] = mapped_column(Boolean, server_default="false")
+    # Denormalized [{attribute_id, attribute_name, value}] kept in sync by
+    # services.attribute_snapshot; the *_attribute_values tables stay canonical
+    attribute_snapshot: Mapped[list[dict]] = mapped_column(JSONB, server_default=text("'[]'::jsonb"))
 
     order: Mapped["Order"] = relationship(back_populates="items")
     product: Mapped["Product | None"] = relationship(back_populates="order_items")
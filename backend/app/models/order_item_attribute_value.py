@@ -8,7 +8,7 @@ class OrderItemAttributeValue(Base):
     __tablename__ = "order_item_attribute_values"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    item_id: Mapped[int] = mapped_column(ForeignKey("order_items.item_id", ondelete="CASCADE"))
+    item_id: Mapped[int] = mapped_column(ForeignKey("order_items.item_id", ondelete="CASCADE"), index=True)
     attribute_id: Mapped[int] = mapped_column(ForeignKey("category_attributes.attribute_id", ondelete="CASCADE"))
     value: Mapped[str] = mapped_column(String(255))
 
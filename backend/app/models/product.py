@@ -1,6 +1,7 @@
 from decimal import Decimal
 
-from sqlalchemy import Boolean, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Boolean, ForeignKey, Index, Integer, Numeric, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -8,10 +9,23 @@ from app.core.database import Base
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Trigram indexes backing the typeahead search (requires pg_trgm)
+        Index(
+            "ix_products_product_name_trgm", "product_name",
+            postgresql_using="gin", postgresql_ops={"product_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_products_brand_trgm", "brand",
+            postgresql_using="gin", postgresql_ops={"brand": "gin_trgm_ops"},
+        ),
+    )
 
     product_id: Mapped[int] = mapped_column(primary_key=True)
     product_name: Mapped[str] = mapped_column(String(255))
+    # Canonical brand name, kept in sync with brands.brand_name
     brand: Mapped[str | None] = mapped_column(String(255))
+    brand_id: Mapped[int | None] = mapped_column(ForeignKey("brands.brand_id"), index=True)
     category_id: Mapped[int | None] = mapped_column(ForeignKey("product_categories.category_id"))
     description: Mapped[str | None] = mapped_column(Text)
     cost_price: Mapped[Decimal] = mapped_column(Numeric(12, 2), server_default="0")
@@ -23,7 +37,19 @@ class Product(Base):
     reorder_level: Mapped[int] = mapped_column(Integer, server_default="0")
     stock_status: Mapped[str] = mapped_column(String(20), server_default="purchased")
     is_active: Mapped[bool] = mapped_column(Boolean, server_default="true")
+    # Maintained by services.product_stats.refresh_product_counters
+    times_ordered: Mapped[int] = mapped_column(Integer, server_default="0", index=True)
+    in_shipment_qty: Mapped[int] = mapped_column(Integer, server_default="0", index=True)
+    # Hash of normalized name + brand + category + attribute values
+    # (product.product_match_key); NULL when another product already holds the key
+    match_key: Mapped[str | None] = mapped_column(String(40), unique=True)
+    # Entered as a duplicate on purpose; the merge tool leaves it alone
+    keep_separate: Mapped[bool] = mapped_column(Boolean, server_default="false")
+    # Denormalized [{attribute_id, attribute_name, value}] kept in sync by
+    # services.attribute_snapshot; the *_attribute_values tables stay canonical
+    attribute_snapshot: Mapped[list[dict]] = mapped_column(JSONB, server_default=text("'[]'::jsonb"))
 
+    brand_ref: Mapped["Brand | None"] = relationship(back_populates="products")
     category: Mapped["ProductCategory | None"] = relationship(back_populates="products")
     order_items: Mapped[list["OrderItem"]] = relationship(back_populates="product")
     attribute_values: Mapped[list["ProductAttributeValue"]] = relationship(back_populates="product", cascade="all, delete-orphan")
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, String, UniqueConstraint
+from sqlalchemy import ForeignKey, Index, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -8,6 +8,12 @@ class ProductAttributeValue(Base):
     __tablename__ = "product_attribute_values"
     __table_args__ = (
         UniqueConstraint("product_id", "attribute_id", name="uq_product_attribute"),
+        # Covers attr[<id>]=value filters and facet counts as index-only scans
+        Index("ix_product_attribute_values_attr_value_product", "attribute_id", "value", "product_id"),
+        Index(
+            "ix_product_attribute_values_value_trgm", "value",
+            postgresql_using="gin", postgresql_ops={"value": "gin_trgm_ops"},
+        ),
     )
 
     value_id: Mapped[int] = mapped_column(primary_key=True)
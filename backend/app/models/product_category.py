@@ -1,7 +1,9 @@
-from sqlalchemy import String, Text
+from decimal import Decimal
+
+from sqlalchemy import Index, Numeric, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.core.database import Base
+from app.core.database import Base, normalized_name
 
 
 class ProductCategory(Base):
@@ -10,6 +12,16 @@ class ProductCategory(Base):
     category_id: Mapped[int] = mapped_column(primary_key=True)
     category_name: Mapped[str] = mapped_column(String(255))
     description: Mapped[str | None] = mapped_column(Text)
+    # Selling-price markup for this category; None falls back to currency.MARKUP
+    markup: Mapped[Decimal | None] = mapped_column(Numeric(6, 3))
 
     products: Mapped[list["Product"]] = relationship(back_populates="category")
     attributes: Mapped[list["CategoryAttribute"]] = relationship(back_populates="category", cascade="all, delete-orphan", order_by="CategoryAttribute.sort_order")
+
+
+# One category per normalized name; inline order items resolve to it
+Index(
+    "ux_product_categories_normalized_name",
+    normalized_name(ProductCategory.category_name),
+    unique=True,
+)
@@ -1,6 +1,7 @@
 from datetime import datetime
+from decimal import Decimal
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -15,6 +16,13 @@ class Shipment(Base):
     notes: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
+    # Stored totals, refreshed by services.shipment.refresh_shipment_totals
+    order_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    customer_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    total_weight_kg: Mapped[Decimal] = mapped_column(Numeric(12, 3), server_default="0")
+    total_selling_usd: Mapped[Decimal] = mapped_column(Numeric(14, 2), server_default="0")
+    total_service_fee_usd: Mapped[Decimal] = mapped_column(Numeric(12, 2), server_default="0")
+
     shipment_orders: Mapped[list["ShipmentOrder"]] = relationship(
         back_populates="shipment", cascade="all, delete-orphan"
     )
@@ -32,9 +40,17 @@ class ShipmentOrder(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     shipment_id: Mapped[int] = mapped_column(
-        ForeignKey("shipments.shipment_id", ondelete="CASCADE")
+        ForeignKey("shipments.shipment_id", ondelete="CASCADE"), index=True
+    )
+    order_id: Mapped[int] = mapped_column(
+        ForeignKey("orders.order_id", ondelete="CASCADE"), index=True
     )
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.order_id", ondelete="CASCADE"))
+
+    # Snapshot of the order's items at the last refresh
+    weight_kg: Mapped[Decimal] = mapped_column(Numeric(12, 3), server_default="0")
+    selling_usd: Mapped[Decimal] = mapped_column(Numeric(14, 2), server_default="0")
+    service_fee_usd: Mapped[Decimal] = mapped_column(Numeric(12, 2), server_default="3.00")
+    items_summary: Mapped[str | None] = mapped_column(Text)
 
     shipment: Mapped["Shipment"] = relationship(back_populates="shipment_orders")
     order: Mapped["Order"] = relationship()
@@ -45,7 +61,7 @@ class ShipmentHistory(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     shipment_id: Mapped[int] = mapped_column(
-        ForeignKey("shipments.shipment_id", ondelete="CASCADE")
+        ForeignKey("shipments.shipment_id", ondelete="CASCADE"), index=True
     )
     action: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
@@ -58,10 +74,10 @@ class ShipmentStockItem(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     shipment_id: Mapped[int] = mapped_column(
-        ForeignKey("shipments.shipment_id", ondelete="CASCADE")
+        ForeignKey("shipments.shipment_id", ondelete="CASCADE"), index=True
     )
     product_id: Mapped[int] = mapped_column(
-        ForeignKey("products.product_id", ondelete="CASCADE")
+        ForeignKey("products.product_id", ondelete="CASCADE"), index=True
     )
     quantity: Mapped[int] = mapped_column(Integer, server_default="1")
 
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ActivityLogResponse(BaseModel):
+    log_id: int
+    user_id: int | None = None
+    user_name: str
+    user_role: str
+    order_id: int | None = None
+    order_number: str | None = None
+    shipment_number: str | None = None
+    action: str
+    field: str
+    old_value: str | None = None
+    new_value: str | None = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,35 @@
+from decimal import Decimal
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+MAX_BATCH_COSTS = 100_000
+
+
+class PriceBatchRequest(BaseModel):
+    # Omit costs_krw to simulate over every active product's cost_price
+    costs_krw: list[Annotated[Decimal, Field(ge=0)]] | None = Field(None, min_length=1, max_length=MAX_BATCH_COSTS)
+    markups: list[Annotated[Decimal, Field(gt=0)]] = Field(default_factory=list, max_length=20)
+    include_prices: bool = True
+
+
+class PricePair(BaseModel):
+    selling_price: Decimal
+    selling_price_uzs: Decimal
+
+
+class MarkupScenario(BaseModel):
+    markup: Decimal
+    prices: list[PricePair] | None = None
+    total_cost_usd: Decimal
+    total_selling_usd: Decimal
+    total_selling_uzs: Decimal
+    total_margin_usd: Decimal
+    margin_pct: Decimal | None = None
+
+
+class PriceBatchResponse(BaseModel):
+    krw_to_usd: Decimal
+    usd_to_uzs: Decimal
+    count: int
+    scenarios: list[MarkupScenario]
@@ -1,6 +1,10 @@
+from datetime import datetime
 from decimal import Decimal
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.schemas.pagination import PaginatedResponse
 
 
 class CustomerBase(BaseModel):
@@ -27,7 +31,38 @@ class CustomerUpdate(BaseModel):
     budget: Decimal | None = None
 
 
+class CustomerStats(BaseModel):
+    order_count: int
+    revenue_usd: Decimal
+    outstanding_uzs: Decimal
+    last_order_date: datetime | None = None
+
+
 class CustomerResponse(CustomerBase):
     customer_id: int
+    stats: CustomerStats | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CustomerListResponse(PaginatedResponse[CustomerResponse]):
+    next_cursor: str | None = None
+
+
+class BudgetEntryCreate(BaseModel):
+    amount_uzs: Decimal = Field(..., description="Positive to add to the balance, negative to deduct")
+    entry_type: Literal["top_up", "adjustment"] = "top_up"
+    note: str | None = None
+
+
+class BudgetEntryResponse(BaseModel):
+    entry_id: int
+    customer_id: int
+    order_id: int | None = None
+    entry_type: str
+    amount_uzs: Decimal
+    balance_after_uzs: Decimal
+    note: str | None = None
+    created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -132,3 +132,15 @@ class OrderResponse(OrderBase):
     items: list[OrderItemResponse] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UnshippedOrderResponse(BaseModel):
+    order_id: int
+    order_number: str
+    customer_id: int | None = None
+    customer_name: str | None = None
+    order_date: datetime | None = None
+    total_amount: Decimal | None = None
+    service_fee: Decimal = Decimal("3.00")
+    item_count: int = 0
+    total_weight_kg: Decimal = Decimal("0")
@@ -1,3 +1,5 @@
+import base64
+import json
 from typing import Generic, TypeVar
 
 from pydantic import BaseModel
@@ -10,3 +12,24 @@ class PaginatedResponse(BaseModel, Generic[T]):
     total: int
     page: int
     page_size: int
+
+
+class CursorPaginatedResponse(BaseModel, Generic[T]):
+    data: list[T]
+    next_cursor: str | None = None
+    page_size: int
+
+
+def encode_cursor(value, row_id: int) -> str:
+    """Opaque keyset cursor for a (sort value, id) position."""
+    raw = json.dumps([None if value is None else str(value), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str | None, int]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(row_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -1,11 +1,13 @@
+from datetime import datetime
 from decimal import Decimal
-from typing import Literal
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 
 StockStatus = Literal["in_stock", "out_of_stock", "pre_order", "purchased"]
 
 from app.schemas.category_attribute import ProductAttributeValueCreate, ProductAttributeValueResponse
+from app.schemas.pagination import PaginatedResponse
 
 
 class ProductBase(BaseModel):
@@ -47,10 +49,14 @@ class ProductUpdate(BaseModel):
 
 class ProductResponse(ProductBase):
     product_id: int
+    brand_id: int | None = None
     times_ordered: int = 0
     in_shipment_qty: int = 0
     sent_qty: int = 0
-    attribute_values: list[ProductAttributeValueResponse] = []
+    # Read from the stored snapshot so list/detail reads skip the EAV joins
+    attribute_values: list[ProductAttributeValueResponse] = Field(
+        [], validation_alias=AliasChoices("attribute_snapshot", "attribute_values"),
+    )
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -68,3 +74,101 @@ class ProductResponse(ProductBase):
             else:
                 result.append(item)
         return result
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class AttributeFacet(BaseModel):
+    attribute_id: int
+    attribute_name: str
+    values: list[FacetValue]
+
+
+class ProductListResponse(PaginatedResponse[ProductResponse]):
+    facets: list[AttributeFacet] = []
+
+
+class ProductSearchResult(BaseModel):
+    product_id: int
+    product_name: str
+    brand: str | None = None
+    category_id: int | None = None
+    cost_price: Decimal = Decimal("0")
+    selling_price: Decimal | None = None
+    selling_price_uzs: Decimal | None = None
+    packaged_weight_grams: int | None = None
+    stock_status: str
+    stock_quantity: int = 0
+    attribute_values: list[ProductAttributeValueResponse] = []
+
+
+class ProductImportError(BaseModel):
+    row: int
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ProductImportError] = []
+    elapsed_seconds: float
+    rows_per_second: float | None = None
+
+
+class RepriceRequest(BaseModel):
+    dry_run: bool = False
+    markup: Decimal | None = Field(None, gt=0)
+    category_markups: dict[int, Annotated[Decimal, Field(gt=0)]] = {}
+    category_id: int | None = None
+    brand: str | None = None
+    is_active: bool | None = None
+
+
+class RepriceChange(BaseModel):
+    product_id: int
+    product_name: str
+    category_id: int | None = None
+    cost_price: Decimal
+    selling_price: Decimal | None = None
+    selling_price_uzs: Decimal | None = None
+    new_selling_price: Decimal
+    new_selling_price_uzs: Decimal
+
+
+class RepricePreview(BaseModel):
+    krw_to_usd: Decimal
+    usd_to_uzs: Decimal
+    total_products: int
+    changed_products: int
+    selling_price_delta_usd: Decimal
+    changes: list[RepriceChange] = []
+
+
+class RepriceJob(BaseModel):
+    job_id: str
+    status: str
+    total: int | None = None
+    processed: int = 0
+    updated: int = 0
+    krw_to_usd: Decimal | None = None
+    usd_to_uzs: Decimal | None = None
+    started_at: datetime
+    finished_at: datetime | None = None
+    error: str | None = None
+
+
+class MergeGroup(BaseModel):
+    kept_id: int
+    name: str
+    merged_ids: list[int]
+
+
+class CatalogueMergeReport(BaseModel):
+    dry_run: bool
+    categories: list[MergeGroup]
+    products: list[MergeGroup]
+    # Duplicates kept apart on purpose (keep_separate); listed, never merged
+    separate_products: list[MergeGroup] = []
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from decimal import Decimal
+
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.schemas.category_attribute import CategoryAttributeResponse
 
@@ -6,6 +8,7 @@ from app.schemas.category_attribute import CategoryAttributeResponse
 class ProductCategoryBase(BaseModel):
     category_name: str
     description: str | None = None
+    markup: Decimal | None = Field(None, gt=0)
 
 
 class ProductCategoryCreate(ProductCategoryBase):
@@ -15,6 +18,7 @@ class ProductCategoryCreate(ProductCategoryBase):
 class ProductCategoryUpdate(BaseModel):
     category_name: str | None = None
     description: str | None = None
+    markup: Decimal | None = Field(None, gt=0)
 
 
 class ProductCategoryResponse(ProductCategoryBase):
@@ -0,0 +1,204 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import event, func, insert, literal, select, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.activity_log import ActivityLog
+from app.models.app_settings import AppSettings
+from app.models.log_read_state import LogReadState
+from app.models.order import Order
+from app.models.user import User
+from app.schemas.pagination import decode_cursor, encode_cursor
+
+MAX_TIMELINE_ROWS = 1000
+# Unread counts stop here; the badge shows 99+ beyond it
+UNREAD_COUNT_CAP = 100
+
+# Postgres NOTIFY channel announcing new logs and read-state changes;
+# delivered on commit to every worker's services.log_stream listener
+LOG_CHANNEL = "activity_logs"
+
+# Session.info key holding the rows queued by record_activity
+_PENDING = "pending_activity_logs"
+
+
+def record_activity(
+    db: AsyncSession,
+    user: User | None,
+    action: str,
+    field: str,
+    old_value: str | None = None,
+    new_value: str | None = None,
+    order_id: int | None = None,
+    order_number: str | None = None,
+    shipment_number: str | None = None,
+) -> None:
+    """Queue an activity log row on the session.
+
+    Queued rows are written with one multi-row INSERT just before the
+    session commits, so they land in the same transaction as the change
+    they describe and are discarded with it on rollback. Changes made
+    without a user (scripts, background jobs) are not logged.
+    """
+    if user is None:
+        return
+    db.info.setdefault(_PENDING, []).append({
+        "user_id": user.user_id,
+        "user_name": user.name,
+        "user_role": user.role,
+        "order_id": order_id,
+        "order_number": order_number,
+        "shipment_number": shipment_number,
+        "action": action,
+        "field": field,
+        "old_value": old_value,
+        "new_value": new_value,
+        "created_at": datetime.now(timezone.utc),
+    })
+
+
+def record_order_changes(db: AsyncSession, user: User | None, order: Order, before: dict) -> None:
+    """Log status, payment status and payment amount changes against ``before``."""
+    def log(action: str, field: str, old_value, new_value) -> None:
+        record_activity(
+            db, user, action, field, old_value, new_value,
+            order_id=order.order_id, order_number=order.order_number,
+        )
+
+    if order.status != before["status"]:
+        log("status_changed", "status", before["status"], order.status)
+    if order.payment_status != before["payment_status"]:
+        log("payment_status_changed", "payment_status", before["payment_status"], order.payment_status)
+    for field in ("paid_card", "paid_cash"):
+        old_amount = before[field] or Decimal(0)
+        new_amount = getattr(order, field) or Decimal(0)
+        if new_amount != old_amount:
+            log("payment_amount_changed", field, str(old_amount), str(new_amount))
+
+
+def order_log_state(order: Order) -> dict:
+    """The fields record_order_changes compares, captured before an update."""
+    return {
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "paid_card": order.paid_card,
+        "paid_cash": order.paid_cash,
+    }
+
+
+async def get_logs(
+    db: AsyncSession,
+    order_id: int | None = None,
+    user_id: int | None = None,
+    action: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    cursor: str | None = None,
+    page_size: int = 30,
+) -> tuple[list[ActivityLog], str | None]:
+    """Newest logs first, keyset-paged on (created_at, log_id).
+
+    Every filter has a matching (column, created_at, log_id) index, so a
+    page is one index range scan however deep it is. Raises ValueError for
+    malformed cursors.
+    """
+    query = select(ActivityLog)
+    if order_id is not None:
+        query = query.where(ActivityLog.order_id == order_id)
+    if user_id is not None:
+        query = query.where(ActivityLog.user_id == user_id)
+    if action:
+        query = query.where(ActivityLog.action == action)
+    if date_from:
+        query = query.where(ActivityLog.created_at >= date_from)
+    if date_to:
+        query = query.where(ActivityLog.created_at <= date_to)
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+        query = query.where(tuple_(ActivityLog.created_at, ActivityLog.log_id) < tuple_(created_at, log_id))
+
+    result = await db.execute(
+        query.order_by(ActivityLog.created_at.desc(), ActivityLog.log_id.desc()).limit(page_size + 1)
+    )
+    logs = list(result.scalars().all())
+    next_cursor = None
+    if len(logs) > page_size:
+        logs = logs[:page_size]
+        next_cursor = encode_cursor(logs[-1].created_at.isoformat(), logs[-1].log_id)
+    return logs, next_cursor
+
+
+async def get_order_timeline(db: AsyncSession, order_id: int) -> list[ActivityLog]:
+    """An order's history, oldest first."""
+    result = await db.execute(
+        select(ActivityLog)
+        .where(ActivityLog.order_id == order_id)
+        .order_by(ActivityLog.created_at, ActivityLog.log_id)
+        .limit(MAX_TIMELINE_ROWS)
+    )
+    return list(result.scalars().all())
+
+
+async def get_unread_counts(db: AsyncSession, user_ids: list[int]) -> dict[int, int]:
+    """Logs each admin has not seen yet, capped at UNREAD_COUNT_CAP.
+
+    An admin who never opened the log falls back to the old shared
+    last-seen mark (or counts from the beginning). One query for any number
+    of admins: each count is a bounded range scan of the created_at index.
+    """
+    if not user_ids:
+        return {}
+    shared_mark = select(AppSettings.logs_last_seen_at).where(AppSettings.id == 1).scalar_subquery()
+    since = func.coalesce(LogReadState.last_seen_at, shared_mark, literal(datetime(1970, 1, 1, tzinfo=timezone.utc)))
+    newer = (
+        select(ActivityLog.log_id)
+        .where(ActivityLog.created_at > since)
+        .limit(UNREAD_COUNT_CAP)
+        .lateral()
+    )
+    result = await db.execute(
+        select(User.user_id, func.count(newer.c.log_id))
+        .outerjoin(LogReadState, LogReadState.user_id == User.user_id)
+        .outerjoin(newer, true())
+        .where(User.user_id.in_(user_ids))
+        .group_by(User.user_id)
+    )
+    return dict(result.all())
+
+
+async def get_unread_count(db: AsyncSession, user_id: int) -> int:
+    return (await get_unread_counts(db, [user_id])).get(user_id, 0)
+
+
+async def mark_seen(db: AsyncSession, user_id: int) -> None:
+    await db.execute(
+        pg_insert(LogReadState)
+        .values(user_id=user_id, last_seen_at=func.now())
+        .on_conflict_do_update(index_elements=[LogReadState.user_id], set_={"last_seen_at": func.now()})
+    )
+    # The admin's other tabs clear their badge too
+    await db.execute(select(func.pg_notify(LOG_CHANNEL, json.dumps({"seen_by": user_id}))))
+    await db.commit()
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(session: Session) -> None:
+    rows = session.info.pop(_PENDING, None)
+    if not rows:
+        return
+    log_ids = session.scalars(insert(ActivityLog).returning(ActivityLog.log_id), rows).all()
+    session.execute(select(func.pg_notify(LOG_CHANNEL, json.dumps({"log_ids": log_ids}))))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session: Session, previous_transaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING, None)
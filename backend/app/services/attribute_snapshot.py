@@ -0,0 +1,78 @@
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.category_attribute import CategoryAttribute
+from app.models.order_item import OrderItem
+from app.models.order_item_attribute_value import OrderItemAttributeValue
+from app.models.product import Product
+from app.models.product_attribute_value import ProductAttributeValue
+
+
+def _snapshot_expr(value_model, owner_fk, owner_pk):
+    """Correlated subquery building the [{attribute_id, attribute_name, value}] array."""
+    entry = func.jsonb_build_object(
+        "attribute_id", value_model.attribute_id,
+        "attribute_name", CategoryAttribute.attribute_name,
+        "value", value_model.value,
+    )
+    return (
+        select(func.coalesce(
+            func.jsonb_agg(aggregate_order_by(entry, CategoryAttribute.sort_order, value_model.attribute_id)),
+            literal_column("'[]'::jsonb"),
+        ))
+        .select_from(value_model)
+        .join(CategoryAttribute, value_model.attribute_id == CategoryAttribute.attribute_id)
+        .where(owner_fk == owner_pk)
+        .scalar_subquery()
+    )
+
+
+async def refresh_product_snapshots(db: AsyncSession, product_ids=None) -> None:
+    """Rebuild products.attribute_snapshot from product_attribute_values.
+
+    Passing ``None`` refreshes the whole catalogue (used for backfills).
+    """
+    if product_ids is not None:
+        product_ids = {pid for pid in product_ids if pid}
+        if not product_ids:
+            return
+    await db.flush()
+    stmt = update(Product).values(
+        attribute_snapshot=_snapshot_expr(ProductAttributeValue, ProductAttributeValue.product_id, Product.product_id)
+    )
+    if product_ids is not None:
+        stmt = stmt.where(Product.product_id.in_(product_ids))
+    await db.execute(stmt)
+
+
+async def refresh_item_snapshots(db: AsyncSession, item_ids=None) -> None:
+    """Rebuild order_items.attribute_snapshot from order_item_attribute_values."""
+    if item_ids is not None:
+        item_ids = {iid for iid in item_ids if iid}
+        if not item_ids:
+            return
+    await db.flush()
+    stmt = update(OrderItem).values(
+        attribute_snapshot=_snapshot_expr(OrderItemAttributeValue, OrderItemAttributeValue.item_id, OrderItem.item_id)
+    )
+    if item_ids is not None:
+        stmt = stmt.where(OrderItem.item_id.in_(item_ids))
+    await db.execute(stmt)
+
+
+async def get_attribute_owners(db: AsyncSession, attribute_id: int) -> tuple[list[int], list[int]]:
+    """Product ids and order item ids whose snapshots mention an attribute."""
+    products = await db.execute(
+        select(ProductAttributeValue.product_id).where(ProductAttributeValue.attribute_id == attribute_id)
+    )
+    items = await db.execute(
+        select(OrderItemAttributeValue.item_id).where(OrderItemAttributeValue.attribute_id == attribute_id)
+    )
+    return list(products.scalars().all()), list(items.scalars().all())
+
+
+def format_attributes(snapshot: list[dict] | None) -> str | None:
+    """Render a snapshot as "Name: value, Name: value"."""
+    parts = [f"{av['attribute_name']}: {av['value']}" for av in snapshot or [] if av.get("attribute_name")]
+    return ", ".join(parts) if parts else None
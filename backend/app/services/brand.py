@@ -0,0 +1,168 @@
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import event, false, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import primary_session
+from app.models.brand import Brand
+from app.models.product import Product
+
+BRAND_CACHE_TTL = 60  # seconds
+
+# In-memory copy of the brands table, invalidated on brand writes in this
+# worker; the TTL bounds staleness in other workers. The version guards
+# against storing a table that was loaded while a write landed.
+_cache: dict = {}
+_cache_version = 0
+
+# Session.info flag: this transaction inserted brands that are not committed yet
+_PENDING_BRANDS = "brands_pending"
+
+
+def normalize_brand_name(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+
+def invalidate_brand_cache() -> None:
+    global _cache_version
+    _cache_version += 1
+    _cache.clear()
+
+
+def _transaction_end(session, transaction) -> None:
+    # Savepoints end inside the transaction; only the outermost one settles the inserts
+    if transaction.parent is None and session.info.pop(_PENDING_BRANDS, False):
+        invalidate_brand_cache()
+
+
+def _invalidate_after_commit(db: AsyncSession) -> None:
+    """Drop the cache once the caller's transaction ends.
+
+    Until then the session's own loads are not cached: they would include
+    brands that the transaction may still roll back.
+    """
+    db.info[_PENDING_BRANDS] = True
+    if not event.contains(db.sync_session, "after_transaction_end", _transaction_end):
+        event.listen(db.sync_session, "after_transaction_end", _transaction_end)
+
+
+async def _load_brands(db: AsyncSession, refresh: bool = False) -> dict:
+    if _cache and not refresh and time.monotonic() - _cache["loaded_at"] < BRAND_CACHE_TTL:
+        return _cache
+    version = _cache_version
+    loaded_at = time.monotonic()
+    async with primary_session(db) as source:
+        result = await source.execute(select(Brand.brand_id, Brand.brand_name, Brand.normalized_name))
+        rows = result.all()
+    by_id = {row.brand_id: row.brand_name for row in rows}
+    brands = {
+        "by_id": by_id,
+        "by_normalized": {row.normalized_name: row.brand_id for row in rows},
+        "sorted": sorted(by_id.items(), key=lambda item: item[1].lower()),
+        "loaded_at": loaded_at,
+    }
+    if version == _cache_version and not db.info.get(_PENDING_BRANDS):
+        _cache.clear()
+        _cache.update(brands)
+    return brands
+
+
+async def get_brand_names(db: AsyncSession) -> dict[int, str]:
+    return (await _load_brands(db))["by_id"]
+
+
+async def list_brands(db: AsyncSession) -> list[tuple[int, str]]:
+    """All brands as (brand_id, brand_name), sorted by name."""
+    return (await _load_brands(db))["sorted"]
+
+
+async def _find_brand(db: AsyncSession, name: str) -> tuple[int, str] | None:
+    normalized = normalize_brand_name(name)
+    brands = await _load_brands(db)
+    if normalized not in brands["by_normalized"]:
+        # Possibly created in another worker since the cache was loaded
+        brands = await _load_brands(db, refresh=True)
+    brand_id = brands["by_normalized"].get(normalized)
+    return (brand_id, brands["by_id"][brand_id]) if brand_id is not None else None
+
+
+async def find_brand_id(db: AsyncSession, name: str | None) -> int | None:
+    if not name or not name.strip():
+        return None
+    found = await _find_brand(db, name)
+    return found[0] if found else None
+
+
+async def brand_condition(db: AsyncSession, name: str):
+    """WHERE clause matching products of the named brand (matches nothing if unknown)."""
+    brand_id = await find_brand_id(db, name)
+    return Product.brand_id == brand_id if brand_id is not None else false()
+
+
+async def resolve_brand(db: AsyncSession, name: str | None) -> tuple[int | None, str | None]:
+    """Return (brand_id, canonical name) for a free-text brand, creating it if new.
+
+    A new brand is inserted in the caller's transaction and the cache is
+    dropped once that commits, so the cache never holds a brand that could
+    still be rolled back.
+    """
+    if not name or not name.strip():
+        return None, None
+    found = await _find_brand(db, name)
+    if found is not None:
+        return found
+    normalized = normalize_brand_name(name)
+    result = await db.execute(
+        insert(Brand)
+        .values(brand_name=" ".join(name.split()), normalized_name=normalized)
+        .on_conflict_do_nothing(index_elements=[Brand.normalized_name])
+        .returning(Brand.brand_id, Brand.brand_name)
+    )
+    row = result.one_or_none()
+    if row is None:
+        # Committed by another worker since the reload above
+        row = (await db.execute(
+            select(Brand.brand_id, Brand.brand_name).where(Brand.normalized_name == normalized)
+        )).one()
+    _invalidate_after_commit(db)
+    return row.brand_id, row.brand_name
+
+
+async def backfill_brands(db: AsyncSession) -> None:
+    """Link products that still only have a free-text brand to the brands table.
+
+    Spellings that normalize to the same name are merged; the most common
+    spelling becomes the canonical brand name. Cheap when nothing is pending.
+    """
+    result = await db.execute(
+        select(Product.brand, func.count())
+        .where(Product.brand_id.is_(None), Product.brand.is_not(None), func.trim(Product.brand) != "")
+        .group_by(Product.brand)
+    )
+    spellings: dict[str, Counter] = defaultdict(Counter)
+    for brand, count in result.all():
+        spellings[normalize_brand_name(brand)][brand] += count
+    if not spellings:
+        return
+
+    for normalized, counts in spellings.items():
+        canonical = " ".join(counts.most_common(1)[0][0].split())
+        await db.execute(
+            insert(Brand)
+            .values(brand_name=canonical, normalized_name=normalized)
+            .on_conflict_do_nothing(index_elements=[Brand.normalized_name])
+        )
+    _invalidate_after_commit(db)
+    brands = await _load_brands(db, refresh=True)
+
+    for normalized, counts in spellings.items():
+        brand_id = brands["by_normalized"][normalized]
+        await db.execute(
+            update(Product)
+            .where(Product.brand_id.is_(None), Product.brand.in_(list(counts)))
+            .values(brand_id=brand_id, brand=brands["by_id"][brand_id])
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
@@ -0,0 +1,233 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.database import normalize_name
+from app.models.category_attribute import CategoryAttribute
+from app.models.order_item import OrderItem
+from app.models.order_item_attribute_value import OrderItemAttributeValue
+from app.models.product import Product
+from app.models.product_attribute_value import ProductAttributeValue
+from app.models.product_category import ProductCategory
+from app.models.shipment import ShipmentStockItem
+from app.services.attribute_snapshot import refresh_item_snapshots, refresh_product_snapshots
+from app.services.product import invalidate_search_cache, product_match_key
+from app.services.product_category import invalidate_category_cache
+from app.services.product_stats import refresh_product_counters
+from app.services.shipment import refresh_totals_for_products
+
+
+def _duplicate_groups(rows) -> list[tuple[int, str, list[int]]]:
+    """Group (id, name, key) rows by key; the lowest id of each group is kept."""
+    groups: dict[str, list[tuple[int, str]]] = defaultdict(list)
+    for row_id, name, key in rows:
+        groups[key].append((row_id, name))
+    result = []
+    for members in groups.values():
+        if len(members) > 1:
+            members.sort()
+            result.append((members[0][0], members[0][1], [row_id for row_id, _ in members[1:]]))
+    return result
+
+
+async def _merge_attribute(db: AsyncSession, source_id: int, target_id: int) -> None:
+    """Repoint values of a duplicate attribute onto the kept one, then drop it."""
+    kept_value = aliased(ProductAttributeValue)
+    await db.execute(
+        delete(ProductAttributeValue).where(
+            ProductAttributeValue.attribute_id == source_id,
+            exists().where(
+                kept_value.product_id == ProductAttributeValue.product_id,
+                kept_value.attribute_id == target_id,
+            ),
+        )
+    )
+    await db.execute(
+        update(ProductAttributeValue)
+        .where(ProductAttributeValue.attribute_id == source_id)
+        .values(attribute_id=target_id)
+    )
+    await db.execute(
+        update(OrderItemAttributeValue)
+        .where(OrderItemAttributeValue.attribute_id == source_id)
+        .values(attribute_id=target_id)
+    )
+    await db.execute(delete(CategoryAttribute).where(CategoryAttribute.attribute_id == source_id))
+
+
+async def merge_duplicate_categories(db: AsyncSession, dry_run: bool = True) -> list[dict]:
+    """Collapse categories whose names only differ in case or whitespace.
+
+    Products move to the kept category; attributes are merged by name or
+    moved over, and the values and order item values follow them.
+    """
+    result = await db.execute(select(ProductCategory.category_id, ProductCategory.category_name))
+    groups = _duplicate_groups(
+        (row.category_id, row.category_name, normalize_name(row.category_name)) for row in result.all()
+    )
+    report = [{"kept_id": kept, "name": name, "merged_ids": merged} for kept, name, merged in groups]
+    if dry_run or not groups:
+        return report
+
+    touched_attributes: set[int] = set()
+    for kept, _, merged in groups:
+        attrs = await db.execute(
+            select(CategoryAttribute.attribute_id, CategoryAttribute.category_id, CategoryAttribute.attribute_name)
+            .where(CategoryAttribute.category_id.in_([kept, *merged]))
+            .order_by(CategoryAttribute.attribute_id)
+        )
+        attrs = attrs.all()
+        kept_by_name = {normalize_name(a.attribute_name): a.attribute_id for a in attrs if a.category_id == kept}
+        for attr in attrs:
+            if attr.category_id == kept:
+                continue
+            key = normalize_name(attr.attribute_name)
+            if key in kept_by_name:
+                await _merge_attribute(db, attr.attribute_id, kept_by_name[key])
+                touched_attributes.add(kept_by_name[key])
+            else:
+                await db.execute(
+                    update(CategoryAttribute)
+                    .where(CategoryAttribute.attribute_id == attr.attribute_id)
+                    .values(category_id=kept)
+                )
+                kept_by_name[key] = attr.attribute_id
+
+        await db.execute(update(Product).where(Product.category_id.in_(merged)).values(category_id=kept))
+        await db.execute(delete(ProductCategory).where(ProductCategory.category_id.in_(merged)))
+
+    if touched_attributes:
+        products = await db.execute(
+            select(ProductAttributeValue.product_id)
+            .where(ProductAttributeValue.attribute_id.in_(touched_attributes)).distinct()
+        )
+        items = await db.execute(
+            select(OrderItemAttributeValue.item_id)
+            .where(OrderItemAttributeValue.attribute_id.in_(touched_attributes)).distinct()
+        )
+        await refresh_product_snapshots(db, products.scalars().all())
+        await refresh_item_snapshots(db, items.scalars().all())
+    return report
+
+
+async def _product_keys(db: AsyncSession) -> tuple[list, dict[int, str]]:
+    """Every product with the match_key its current fields produce."""
+    products = (await db.execute(
+        select(
+            Product.product_id, Product.product_name, Product.brand_id, Product.category_id,
+            Product.match_key, Product.keep_separate,
+        )
+    )).all()
+    values = await db.execute(
+        select(ProductAttributeValue.product_id, ProductAttributeValue.attribute_id, ProductAttributeValue.value)
+    )
+    attrs_by_product: dict[int, list[tuple[int, str]]] = defaultdict(list)
+    for row in values.all():
+        attrs_by_product[row.product_id].append((row.attribute_id, row.value))
+    keys = {
+        p.product_id: product_match_key(p.product_name, p.brand_id, p.category_id, attrs_by_product[p.product_id])
+        for p in products
+    }
+    return products, keys
+
+
+async def _rewrite_match_keys(db: AsyncSession, products, keys: dict[int, str]) -> None:
+    """Give each key to the lowest product_id among ``products``; the rest get NULL."""
+    holders: dict[str, int] = {}
+    for p in sorted(products, key=lambda p: p.product_id):
+        holders.setdefault(keys[p.product_id], p.product_id)
+    new_keys = {product_id: key for key, product_id in holders.items()}
+
+    # Clear first so stale keys cannot collide mid-update
+    stale = [
+        {"product_id": p.product_id, "match_key": new_keys.get(p.product_id)}
+        for p in products
+        if p.match_key != new_keys.get(p.product_id)
+    ]
+    if stale:
+        await db.execute(
+            update(Product)
+            .where(Product.product_id.in_([row["product_id"] for row in stale]))
+            .values(match_key=None)
+        )
+        await db.execute(update(Product), stale)
+
+
+async def backfill_match_keys(db: AsyncSession) -> None:
+    """(Re)key every product not kept separate; duplicates stay NULL until merged."""
+    products, keys = await _product_keys(db)
+    await _rewrite_match_keys(db, [p for p in products if not p.keep_separate], keys)
+
+
+async def merge_duplicate_products(db: AsyncSession, dry_run: bool = True) -> tuple[list[dict], list[dict]]:
+    """Collapse products with the same category, name, brand and attribute values.
+
+    Order items and shipment stock items are repointed to the kept product,
+    stock quantities are added up, and match_keys are rewritten so inline
+    order items resolve to the survivors. Products marked keep_separate
+    were entered as duplicates on purpose: they are never merged, only
+    returned as a second list of the groups they would have joined.
+    """
+    products, keys = await _product_keys(db)
+    candidates = [p for p in products if not p.keep_separate]
+    groups = _duplicate_groups((p.product_id, p.product_name, keys[p.product_id]) for p in candidates)
+    report = [{"kept_id": kept, "name": name, "merged_ids": merged} for kept, name, merged in groups]
+    # Groups the separate products would join, headed by the candidate that would survive
+    skipped = []
+    names = {p.product_id: p.product_name for p in products}
+    separate_ids = {p.product_id for p in products if p.keep_separate}
+    for lowest, _, others in _duplicate_groups((p.product_id, p.product_name, keys[p.product_id]) for p in products):
+        members = [lowest, *others]
+        if not separate_ids.intersection(members):
+            continue
+        kept = next((pid for pid in members if pid not in separate_ids), lowest)
+        separate = [pid for pid in members if pid in separate_ids and pid != kept]
+        skipped.append({"kept_id": kept, "name": names[kept], "merged_ids": separate})
+    if dry_run:
+        return report, skipped
+
+    kept_ids = set()
+    merged_ids = set()
+    for kept, _, merged in groups:
+        kept_ids.add(kept)
+        merged_ids.update(merged)
+        stock = (
+            select(func.coalesce(func.sum(Product.stock_quantity), 0))
+            .where(Product.product_id.in_(merged))
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(Product)
+            .where(Product.product_id == kept)
+            .values(stock_quantity=Product.stock_quantity + stock)
+        )
+        await db.execute(update(OrderItem).where(OrderItem.product_id.in_(merged)).values(product_id=kept))
+        await db.execute(
+            update(ShipmentStockItem).where(ShipmentStockItem.product_id.in_(merged)).values(product_id=kept)
+        )
+        await db.execute(delete(Product).where(Product.product_id.in_(merged)))
+
+    await _rewrite_match_keys(db, [p for p in candidates if p.product_id not in merged_ids], keys)
+
+    if kept_ids:
+        await refresh_product_counters(db, kept_ids)
+        await refresh_totals_for_products(db, kept_ids)
+    invalidate_search_cache()
+    return report, skipped
+
+
+async def merge_duplicates(db: AsyncSession, dry_run: bool = True) -> dict:
+    """One-off cleanup of duplicate categories and products created inline."""
+    categories = await merge_duplicate_categories(db, dry_run)
+    products, separate_products = await merge_duplicate_products(db, dry_run)
+    if not dry_run:
+        await db.commit()
+        invalidate_category_cache()
+    return {
+        "dry_run": dry_run,
+        "categories": categories,
+        "products": products,
+        "separate_products": separate_products,
+    }
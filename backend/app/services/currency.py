@@ -2,6 +2,11 @@ import time
 from decimal import Decimal, ROUND_HALF_UP
 
 import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.models.product import Product
 
 _cache: dict = {}
 _cache_ttl = 3600  # 1 hour
@@ -13,12 +18,20 @@ EXCHANGE_RATE_URL = "https://open.er-api.com/v6/latest/USD"
 async def _fetch_rates() -> dict[str, float]:
     now = time.time()
     if _cache and now - _cache.get("ts", 0) < _cache_ttl:
+        metrics.rate_cache_requests.inc("hit")
         return _cache["rates"]
+    metrics.rate_cache_requests.inc("miss")
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(EXCHANGE_RATE_URL)
-        resp.raise_for_status()
-        data = resp.json()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            resp = await client.get(EXCHANGE_RATE_URL)
+            resp.raise_for_status()
+            data = resp.json()
+        outcome = "ok"
+    finally:
+        metrics.rate_fetch_seconds.observe(time.perf_counter() - started, outcome)
 
     rates = data["rates"]
     _cache["rates"] = rates
@@ -36,16 +49,88 @@ async def get_rates() -> dict:
     }
 
 
-async def calculate_prices(cost_price_krw: Decimal, markup: Decimal = MARKUP) -> dict:
-    r = await get_rates()
-    krw_to_usd = Decimal(str(r["krw_to_usd"]))
-    usd_to_uzs = Decimal(str(r["usd_to_uzs"]))
+CENT = Decimal("0.01")
 
+
+def compute_prices(
+    cost_price_krw: Decimal, krw_to_usd: Decimal, usd_to_uzs: Decimal, markup: Decimal = MARKUP,
+) -> dict:
+    """Price a KRW cost with an already-resolved rate snapshot."""
     cost_in_usd = cost_price_krw * krw_to_usd
-    selling_price = (cost_in_usd * markup).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    selling_price_uzs = (selling_price * usd_to_uzs).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    selling_price = (cost_in_usd * markup).quantize(CENT, rounding=ROUND_HALF_UP)
+    selling_price_uzs = (selling_price * usd_to_uzs).quantize(CENT, rounding=ROUND_HALF_UP)
 
     return {
         "selling_price": selling_price,
         "selling_price_uzs": selling_price_uzs,
     }
+
+
+async def get_rate_snapshot() -> tuple[Decimal, Decimal]:
+    """Current (krw_to_usd, usd_to_uzs) as Decimals."""
+    r = await get_rates()
+    return Decimal(str(r["krw_to_usd"])), Decimal(str(r["usd_to_uzs"]))
+
+
+async def calculate_prices(cost_price_krw: Decimal, markup: Decimal = MARKUP) -> dict:
+    krw_to_usd, usd_to_uzs = await get_rate_snapshot()
+    return compute_prices(cost_price_krw, krw_to_usd, usd_to_uzs, markup)
+
+
+def compute_price_batch(
+    costs_krw: list[Decimal], krw_to_usd: Decimal, usd_to_uzs: Decimal, markups: list[Decimal],
+) -> list[dict]:
+    """Price many KRW costs under each markup with one rate snapshot.
+
+    Uses the same arithmetic and rounding as compute_prices. Catalogue
+    costs repeat a lot, so the USD cost is computed once per distinct value.
+    Returns one entry per markup with per-cost prices and margin totals;
+    an empty cost list gives zero totals.
+    """
+    cost_usd_by_krw = {cost: cost * krw_to_usd for cost in set(costs_krw)}
+    total_cost_usd = sum((cost_usd_by_krw[cost] for cost in costs_krw), Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    results = []
+    for markup in markups:
+        priced: dict[Decimal, tuple[Decimal, Decimal]] = {}
+        for cost, cost_usd in cost_usd_by_krw.items():
+            usd = (cost_usd * markup).quantize(CENT, rounding=ROUND_HALF_UP)
+            priced[cost] = (usd, (usd * usd_to_uzs).quantize(CENT, rounding=ROUND_HALF_UP))
+        prices = [priced[cost] for cost in costs_krw]
+        total_usd = sum((usd for usd, _ in prices), Decimal(0))
+        margin_usd = total_usd - total_cost_usd
+        results.append({
+            "markup": markup,
+            "prices": [{"selling_price": usd, "selling_price_uzs": uzs} for usd, uzs in prices],
+            "total_cost_usd": total_cost_usd,
+            "total_selling_usd": total_usd,
+            "total_selling_uzs": sum((uzs for _, uzs in prices), Decimal(0)),
+            "total_margin_usd": margin_usd,
+            "margin_pct": (margin_usd / total_usd * 100).quantize(CENT, rounding=ROUND_HALF_UP) if total_usd else None,
+        })
+    return results
+
+
+async def price_batch(
+    db: AsyncSession,
+    costs_krw: list[Decimal] | None = None,
+    markups: list[Decimal] | None = None,
+    include_prices: bool = True,
+) -> dict:
+    """Batch price preview; without costs, simulates over the active catalogue."""
+    if costs_krw is None:
+        result = await db.execute(
+            select(Product.cost_price).where(Product.is_active == True, Product.cost_price > 0)
+        )
+        costs_krw = list(result.scalars().all())
+    krw_to_usd, usd_to_uzs = await get_rate_snapshot()
+    scenarios = compute_price_batch(costs_krw, krw_to_usd, usd_to_uzs, markups or [MARKUP])
+    if not include_prices:
+        for scenario in scenarios:
+            scenario["prices"] = None
+    return {
+        "krw_to_usd": krw_to_usd,
+        "usd_to_uzs": usd_to_uzs,
+        "count": len(costs_krw),
+        "scenarios": scenarios,
+    }
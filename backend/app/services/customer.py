@@ -1,28 +1,270 @@
-from sqlalchemy import func, select
+from collections.abc import AsyncIterator
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Numeric, case, cast, func, literal, or_, select, tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.customer import Customer
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
 from app.schemas.customer import CustomerCreate, CustomerUpdate
+from app.schemas.pagination import decode_cursor, encode_cursor
+from app.services import customer_budget
+from app.services.currency import get_rate_snapshot
+from app.services.product import like_pattern
+
+
+PAID_STATUSES = ("paid_card", "paid_cash")
+CUSTOMER_CARGO_USD_PER_KG = Decimal(13)
+
+STAT_COLUMNS = ("order_count", "revenue_usd", "outstanding_uzs", "last_order_date")
+SORT_KEYS = ("customer_name", "city", "budget", *STAT_COLUMNS)
+
+
+def _order_amounts(usd_to_uzs: Decimal | None, customer_id: int | None = None):
+    """Per-order totals as a subquery: total_usd, amount_uzs and outstanding_uzs.
+
+    Order totals mirror the order service: item selling prices plus the
+    service fee and customer cargo (13 USD/kg). UZS amounts use the locked
+    final_amount_uzs when set, else the total at the current rate.
+    """
+    items = (
+        select(
+            OrderItem.order_id,
+            func.sum(OrderItem.selling_price * OrderItem.quantity).label("selling_usd"),
+            func.sum(func.coalesce(Product.packaged_weight_grams, 0) * OrderItem.quantity).label("weight_grams"),
+        )
+        .outerjoin(Product, OrderItem.product_id == Product.product_id)
+        .group_by(OrderItem.order_id)
+    )
+    if customer_id is not None:
+        items = items.where(OrderItem.order_id.in_(select(Order.order_id).where(Order.customer_id == customer_id)))
+    items = items.subquery()
+
+    total_usd = case(
+        (
+            items.c.selling_usd > 0,
+            items.c.selling_usd
+            + func.coalesce(Order.service_fee, Decimal("3.00"))
+            + cast(items.c.weight_grams, Numeric) / 1000 * CUSTOMER_CARGO_USD_PER_KG,
+        ),
+        else_=0,
+    )
+    amount_uzs = func.round(
+        func.coalesce(Order.final_amount_uzs, total_usd * usd_to_uzs)
+        if usd_to_uzs is not None
+        else func.coalesce(Order.final_amount_uzs, 0),
+        2,
+    )
+    unpaid = func.greatest(amount_uzs - Order.paid_card - Order.paid_cash - Order.budget_applied_uzs, 0)
+    query = (
+        select(
+            Order.order_id,
+            Order.order_number,
+            Order.customer_id,
+            Order.order_date,
+            Order.payment_status,
+            Order.paid_card,
+            Order.paid_cash,
+            Order.budget_applied_uzs,
+            total_usd.label("total_usd"),
+            amount_uzs.label("amount_uzs"),
+            case((Order.payment_status.in_(PAID_STATUSES), 0), else_=unpaid).label("outstanding_uzs"),
+            unpaid.label("unpaid_uzs"),
+        )
+        .outerjoin(items, items.c.order_id == Order.order_id)
+    )
+    if customer_id is not None:
+        query = query.where(Order.customer_id == customer_id)
+    else:
+        query = query.where(Order.customer_id.is_not(None))
+    return query.subquery()
+
+
+def _customer_stats(usd_to_uzs: Decimal | None):
+    """Per-customer order aggregates as one grouped subquery."""
+    orders = _order_amounts(usd_to_uzs)
+    return (
+        select(
+            orders.c.customer_id,
+            func.count(orders.c.order_id).label("order_count"),
+            func.round(func.sum(orders.c.total_usd), 2, type_=Numeric).label("revenue_usd"),
+            func.round(func.sum(orders.c.outstanding_uzs), 2, type_=Numeric).label("outstanding_uzs"),
+            func.max(orders.c.order_date).label("last_order_date"),
+        )
+        .group_by(orders.c.customer_id)
+        .subquery()
+    )
+
+
+def _cursor_value(sort_by: str, value):
+    """The cursor's sort value parsed for its column; raises ValueError if it does not fit."""
+    try:
+        if sort_by == "last_order_date":
+            return datetime.fromisoformat(value)
+        if sort_by == "order_count":
+            return int(value)
+        if sort_by in ("revenue_usd", "outstanding_uzs", "budget"):
+            return Decimal(value)
+        return "" if value is None and sort_by == "city" else str(value)
+    except (TypeError, ValueError, ArithmeticError) as exc:
+        raise ValueError("Invalid cursor") from exc
 
 
 async def get_customers(
     db: AsyncSession,
     is_active: bool | None = None,
+    q: str | None = None,
+    include_stats: bool = False,
+    sort_by: str | None = None,
+    sort_dir: str = "asc",
+    cursor: str | None = None,
     page: int = 1,
     page_size: int = 20,
-) -> tuple[list[Customer], int]:
+) -> tuple[list[Customer], int, str | None]:
+    """Customers with optional order aggregates, search, sorting and paging.
+
+    Sorting by an aggregate implies include_stats. With a cursor (keyset on
+    the sort value and customer_id) ``page`` is ignored; the returned
+    next_cursor continues after the last row of this page either way.
+    """
+    sort_by = sort_by if sort_by in SORT_KEYS else "customer_name"
+    include_stats = include_stats or sort_by in STAT_COLUMNS
+
     query = select(Customer)
     if is_active is not None:
         query = query.where(Customer.is_active == is_active)
+    if q and q.strip():
+        pattern = like_pattern(" ".join(q.split()))
+        query = query.where(or_(
+            Customer.customer_name.ilike(pattern, escape="\\"),
+            Customer.contact_phone.ilike(pattern, escape="\\"),
+            Customer.telegram_id.ilike(pattern, escape="\\"),
+            Customer.city.ilike(pattern, escape="\\"),
+        ))
 
     count_q = select(func.count()).select_from(query.subquery())
     total = (await db.execute(count_q)).scalar() or 0
 
-    offset = (page - 1) * page_size
-    result = await db.execute(
-        query.order_by(Customer.customer_name).offset(offset).limit(page_size)
+    stats = None
+    if include_stats:
+        try:
+            _, usd_to_uzs = await get_rate_snapshot()
+        except Exception:
+            usd_to_uzs = None
+        stats = _customer_stats(usd_to_uzs)
+        query = query.outerjoin(stats, stats.c.customer_id == Customer.customer_id).add_columns(
+            func.coalesce(stats.c.order_count, 0).label("order_count"),
+            func.coalesce(stats.c.revenue_usd, 0).label("revenue_usd"),
+            func.coalesce(stats.c.outstanding_uzs, 0).label("outstanding_uzs"),
+            stats.c.last_order_date,
+        )
+
+    if sort_by in STAT_COLUMNS:
+        sort_col = stats.c[sort_by]
+        default = datetime(1970, 1, 1) if sort_by == "last_order_date" else 0
+        sort_expr = func.coalesce(sort_col, literal(default, sort_col.type))
+    elif sort_by == "city":
+        sort_expr = func.coalesce(Customer.city, "")
+    else:
+        sort_expr = getattr(Customer, sort_by)
+
+    descending = sort_dir == "desc"
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        key = tuple_(sort_expr, Customer.customer_id)
+        bound = tuple_(literal(_cursor_value(sort_by, value), sort_expr.type), last_id)
+        query = query.where(key < bound if descending else key > bound)
+        offset = 0
+    else:
+        offset = (page - 1) * page_size
+
+    query = query.add_columns(sort_expr.label("sort_value")).order_by(
+        sort_expr.desc() if descending else sort_expr.asc(),
+        Customer.customer_id.desc() if descending else Customer.customer_id.asc(),
     )
-    return list(result.scalars().all()), total
+    result = await db.execute(query.offset(offset).limit(page_size + 1))
+    rows = result.all()
+
+    customers = []
+    for row in rows[:page_size]:
+        customer = row[0]
+        customer.stats = (
+            {column: getattr(row, column) for column in STAT_COLUMNS} if include_stats else None
+        )
+        customers.append(customer)
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = encode_cursor(last.sort_value, last[0].customer_id)
+    return customers, total, next_cursor
+
+
+STATEMENT_COLUMNS = ("date", "order_id", "order_number", "entry", "debit_uzs", "credit_uzs", "balance_uzs")
+
+
+async def stream_statement(
+    db: AsyncSession,
+    customer_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> AsyncIterator[dict]:
+    """Chronological order charges and payments with a running balance.
+
+    Each order contributes its charge and its card, cash and budget credits,
+    all dated at the order date. Orders marked paid without the full amount
+    recorded get a settling credit, so the closing balance matches the
+    outstanding total of the customer list. The balance is a window sum over
+    the whole history, so a date range starts from the right opening balance.
+    Rows are streamed from a server-side cursor.
+    """
+    try:
+        _, usd_to_uzs = await get_rate_snapshot()
+    except Exception:
+        usd_to_uzs = None
+    orders = _order_amounts(usd_to_uzs, customer_id)
+    zero = literal(0, Numeric)
+
+    def _line(seq: int, entry: str, debit, credit):
+        return select(
+            orders.c.order_date.label("date"),
+            orders.c.order_id,
+            orders.c.order_number,
+            literal(seq).label("seq"),
+            literal(entry).label("entry"),
+            debit.label("debit_uzs"),
+            credit.label("credit_uzs"),
+        )
+
+    def settled_by(status: str):
+        return case((orders.c.payment_status == status, orders.c.unpaid_uzs), else_=0)
+
+    card = orders.c.paid_card + settled_by("paid_card")
+    cash = orders.c.paid_cash + settled_by("paid_cash")
+    lines = union_all(
+        _line(0, "order", orders.c.amount_uzs, zero),
+        _line(1, "payment_card", zero, card).where(card > 0),
+        _line(2, "payment_cash", zero, cash).where(cash > 0),
+        _line(3, "budget", zero, orders.c.budget_applied_uzs).where(orders.c.budget_applied_uzs > 0),
+    ).subquery()
+    running = select(
+        lines,
+        func.sum(lines.c.debit_uzs - lines.c.credit_uzs).over(
+            order_by=(lines.c.date, lines.c.order_id, lines.c.seq),
+            rows=(None, 0),
+        ).label("balance_uzs"),
+    ).subquery()
+
+    query = select(*(running.c[column] for column in STATEMENT_COLUMNS))
+    if date_from is not None:
+        query = query.where(running.c.date >= date_from)
+    if date_to is not None:
+        query = query.where(running.c.date <= date_to)
+    result = await db.stream(query.order_by(running.c.date, running.c.order_id, running.c.seq))
+    async for row in result:
+        yield row._asdict()
 
 
 async def get_customer(db: AsyncSession, customer_id: int) -> Customer | None:
@@ -30,8 +272,13 @@ async def get_customer(db: AsyncSession, customer_id: int) -> Customer | None:
 
 
 async def create_customer(db: AsyncSession, data: CustomerCreate) -> Customer:
-    customer = Customer(**data.model_dump())
+    fields = data.model_dump()
+    opening_budget = fields.pop("budget")
+    customer = Customer(**fields)
     db.add(customer)
+    await db.flush()
+    if opening_budget:
+        await customer_budget.post_entry(db, customer.customer_id, opening_budget, "top_up", note="Opening balance")
     await db.commit()
     await db.refresh(customer)
     return customer
@@ -41,8 +288,12 @@ async def update_customer(db: AsyncSession, customer_id: int, data: CustomerUpda
     customer = await db.get(Customer, customer_id)
     if not customer:
         return None
-    for key, value in data.model_dump(exclude_unset=True).items():
+    fields = data.model_dump(exclude_unset=True)
+    budget = fields.pop("budget", None)
+    for key, value in fields.items():
         setattr(customer, key, value)
+    if budget is not None:
+        await customer_budget.set_balance(db, customer_id, budget, note="Edited on customer")
     await db.commit()
     await db.refresh(customer)
     return customer
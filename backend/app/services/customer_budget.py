@@ -0,0 +1,126 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.customer import Customer
+from app.models.customer_budget_entry import CustomerBudgetEntry
+from app.models.order import Order
+
+CENT = Decimal("0.01")
+
+
+async def post_entry(
+    db: AsyncSession,
+    customer_id: int,
+    amount_uzs: Decimal,
+    entry_type: str,
+    order_id: int | None = None,
+    note: str | None = None,
+) -> CustomerBudgetEntry | None:
+    """Move a customer's balance by ``amount_uzs`` and record it in the ledger.
+
+    The balance is changed with a single UPDATE ... RETURNING, so concurrent
+    postings serialize on the customer row instead of overwriting each other.
+    Returns None when the customer does not exist.
+    """
+    amount_uzs = amount_uzs.quantize(CENT, rounding=ROUND_HALF_UP)
+    result = await db.execute(
+        update(Customer)
+        .where(Customer.customer_id == customer_id)
+        .values(budget=Customer.budget + amount_uzs)
+        .returning(Customer.budget)
+    )
+    balance = result.scalar_one_or_none()
+    if balance is None:
+        return None
+    entry = CustomerBudgetEntry(
+        customer_id=customer_id,
+        order_id=order_id,
+        entry_type=entry_type,
+        amount_uzs=amount_uzs,
+        balance_after_uzs=balance,
+        note=note,
+    )
+    db.add(entry)
+    return entry
+
+
+async def add_manual_entry(
+    db: AsyncSession, customer_id: int, amount_uzs: Decimal, entry_type: str, note: str | None = None,
+) -> CustomerBudgetEntry | None:
+    entry = await post_entry(db, customer_id, amount_uzs, entry_type, note=note)
+    if entry:
+        await db.commit()
+        await db.refresh(entry)
+    return entry
+
+
+async def _lock_balance(db: AsyncSession, customer_id: int) -> Decimal | None:
+    result = await db.execute(
+        select(Customer.budget).where(Customer.customer_id == customer_id).with_for_update()
+    )
+    return result.scalar_one_or_none()
+
+
+async def set_balance(db: AsyncSession, customer_id: int, balance: Decimal, note: str | None = None) -> None:
+    """Record a manual correction that brings the balance to ``balance``."""
+    current = await _lock_balance(db, customer_id)
+    if current is not None and current != balance:
+        await post_entry(db, customer_id, balance - current, "adjustment", note=note)
+
+
+async def settle_order(db: AsyncSession, order: Order, amount_due_uzs: Decimal) -> None:
+    """Apply the customer's budget to an order, posting only the difference.
+
+    ``order.budget_applied_uzs`` is what the order currently holds; it is
+    released (if the order moved to another customer or owes less) or topped
+    up from the balance as a single ledger delta. Nothing is written when the
+    applied amount does not change. Existing orders must be loaded FOR UPDATE,
+    so two concurrent settlements cannot both start from the same amount.
+    """
+    held = order.budget_applied_uzs or Decimal(0)
+    if held:
+        # The amount is held by whoever the last posting was against;
+        # orders settled before the ledger existed hold it for their customer
+        holder = (await db.execute(
+            select(CustomerBudgetEntry.customer_id)
+            .where(CustomerBudgetEntry.order_id == order.order_id)
+            .order_by(CustomerBudgetEntry.entry_id.desc())
+            .limit(1)
+        )).scalar_one_or_none() or order.customer_id
+        if holder != order.customer_id:
+            if holder is not None:
+                await post_entry(db, holder, held, "refund", order_id=order.order_id)
+            held = Decimal(0)
+
+    target = Decimal(0)
+    if order.customer_id and amount_due_uzs > 0:
+        balance = await _lock_balance(db, order.customer_id)
+        if balance is not None:
+            target = max(Decimal(0), min(balance + held, amount_due_uzs)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    delta = held - target
+    if delta and order.customer_id:
+        await post_entry(
+            db, order.customer_id, delta,
+            "refund" if delta > 0 else "application",
+            order_id=order.order_id,
+        )
+    order.budget_applied_uzs = target
+
+
+async def get_ledger(
+    db: AsyncSession,
+    customer_id: int,
+    page: int = 1,
+    page_size: int = 50,
+) -> tuple[list[CustomerBudgetEntry], int]:
+    base = select(CustomerBudgetEntry).where(CustomerBudgetEntry.customer_id == customer_id)
+    total = (await db.execute(select(func.count()).select_from(base.subquery()))).scalar() or 0
+    result = await db.execute(
+        base.order_by(CustomerBudgetEntry.entry_id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+    return list(result.scalars().all()), total
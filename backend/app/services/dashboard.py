@@ -21,6 +21,7 @@ from app.schemas.dashboard import (
     TopProduct,
     UnpaidOrder,
 )
+from app.services import brand as brand_service
 from app.services.currency import get_rates
 
 
@@ -132,23 +133,23 @@ async def get_top_products(db: AsyncSession, limit: int = 10) -> list[TopProduct
 async def get_top_brands(db: AsyncSession, limit: int = 10) -> list[TopBrand]:
     query = (
         select(
-            Product.brand,
+            Product.brand_id,
             func.sum(OrderItem.quantity).label("total_quantity"),
             func.coalesce(func.sum(OrderItem.selling_price * OrderItem.quantity), 0).label("total_revenue"),
         )
         .join(Product, OrderItem.product_id == Product.product_id)
         .join(Order, OrderItem.order_id == Order.order_id)
         .where(Order.status == "completed", Order.is_family_discount == False)
-        .where(Product.brand.isnot(None))
-        .where(Product.brand != "")
-        .group_by(Product.brand)
+        .where(Product.brand_id.isnot(None))
+        .group_by(Product.brand_id)
         .order_by(func.sum(OrderItem.selling_price * OrderItem.quantity).desc())
         .limit(limit)
     )
     result = await db.execute(query)
+    brand_names = await brand_service.get_brand_names(db)
     return [
         TopBrand(
-            brand=row.brand,
+            brand=brand_names.get(row.brand_id, ""),
             total_quantity=row.total_quantity,
             total_revenue=row.total_revenue,
         )
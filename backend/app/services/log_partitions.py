@@ -0,0 +1,303 @@
+"""Monthly partitions of activity_logs: creation, retention and archives.
+
+Partitions are named activity_logs_pYYYY_MM and cover one UTC month.
+Months older than LOG_RETENTION_MONTHS are dumped to
+LOG_ARCHIVE_DIR/activity_logs_YYYY-MM.ndjson.gz and then detached and
+dropped; ``restore`` brings an archived month back and marks it so
+retention leaves it alone until it is archived again explicitly.
+
+    python -m app.services.log_partitions ensure
+    python -m app.services.log_partitions convert
+    python -m app.services.log_partitions archive [--month 2025-01]
+    python -m app.services.log_partitions restore 2025-01
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.activity_log import ActivityLog
+
+TABLE = ActivityLog.__tablename__
+MONTHS_AHEAD = 2
+RESTORE_BATCH_SIZE = 1000
+MAINTENANCE_INTERVAL_SECONDS = 6 * 3600
+# pg_advisory_lock key serializing maintenance across workers
+LOCK_KEY = 0x4C4F4753
+
+RESTORED_MARK = "restored"
+
+_PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+_tasks: dict = {}
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_of(moment: datetime) -> date:
+    moment = moment.astimezone(timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def archive_path(month: date) -> str:
+    return os.path.join(settings.LOG_ARCHIVE_DIR, f"{TABLE}_{month.year:04d}-{month.month:02d}.ndjson.gz")
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :name"), {"name": TABLE})
+    return result.scalar() == "p"
+
+
+async def list_partitions(conn: AsyncConnection, restored: bool | None = None) -> list[date]:
+    """Months with an attached partition; ``restored`` filters on the restore mark."""
+    result = await conn.execute(
+        text(
+            "SELECT child.relname, obj_description(child.oid, 'pg_class') = :mark FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = :name"
+        ),
+        {"name": TABLE, "mark": RESTORED_MARK},
+    )
+    months = []
+    for name, is_restored in result.all():
+        match = _PARTITION_NAME.match(name)
+        if match and (restored is None or bool(is_restored) == restored):
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def upcoming_months(months_ahead: int = MONTHS_AHEAD) -> list[date]:
+    """This month and the next ``months_ahead``."""
+    current = _month_of(datetime.now(timezone.utc))
+    return [_add_months(current, offset) for offset in range(months_ahead + 1)]
+
+
+def partition_ddl(month: date) -> str:
+    # Bounds are DDL literals; both come from date objects, not user input
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+async def create_partition(conn: AsyncConnection, month: date) -> None:
+    await conn.execute(text(partition_ddl(month)))
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = MONTHS_AHEAD) -> None:
+    """Create this month's partition and the next ``months_ahead``."""
+    if not await is_partitioned(conn):
+        return
+    for month in upcoming_months(months_ahead):
+        await create_partition(conn, month)
+    await conn.commit()
+
+
+async def convert_legacy_table(conn: AsyncConnection) -> int:
+    """One-off move of an unpartitioned activity_logs into monthly partitions.
+
+    The old table is renamed, the partitioned one created from the model,
+    the rows copied and the id sequence carried over. Rows without a
+    created_at (the legacy column was nullable) are dated to the earliest
+    timestamp in the table, or now if there is none. The legacy table is
+    only dropped when every row arrived; otherwise nothing is committed.
+    Returns the number of rows moved.
+    """
+    if await is_partitioned(conn):
+        return 0
+    legacy = f"{TABLE}_legacy"
+    await conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    # Index names are global; the legacy ones must not block the new table's
+    for (index_name,) in (await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :name"), {"name": legacy},
+    )).all():
+        await conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"'))
+    await conn.run_sync(lambda sync_conn: ActivityLog.__table__.create(sync_conn))
+
+    total, earliest, latest = (await conn.execute(
+        text(f"SELECT count(*), min(created_at), max(created_at) FROM {legacy}")
+    )).one()
+    moved = 0
+    if total:
+        undated = earliest or datetime.now(timezone.utc)
+        month = _month_of(undated)
+        while month <= _month_of(latest or undated):
+            await create_partition(conn, month)
+            month = _add_months(month, 1)
+        columns = [column.name for column in ActivityLog.__table__.columns]
+        values = [
+            "coalesce(created_at, :undated)" if column == "created_at" else column for column in columns
+        ]
+        result = await conn.execute(
+            text(f"INSERT INTO {TABLE} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {legacy}"),
+            {"undated": undated},
+        )
+        moved = result.rowcount
+        if moved != total:
+            raise RuntimeError(f"moved {moved} of {total} rows from {legacy}; nothing was changed")
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'log_id'), "
+            f"(SELECT coalesce(max(log_id), 0) + 1 FROM {TABLE}), false)"
+        ))
+    await conn.execute(text(f"DROP TABLE {legacy}"))
+    await conn.commit()
+    await ensure_partitions(conn)
+    return moved
+
+
+def _row_to_json(row) -> str:
+    return json.dumps(
+        {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row._mapping.items()}
+    )
+
+
+async def archive_month(conn: AsyncConnection, month: date) -> int:
+    """Dump one month to gzip NDJSON, then detach and drop its partition.
+
+    The file is written under a temporary name and renamed once complete,
+    so the partition is only dropped after a full dump exists.
+    """
+    name = partition_name(month)
+    path = archive_path(month)
+    os.makedirs(settings.LOG_ARCHIVE_DIR, exist_ok=True)
+    rows = 0
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as out:
+        result = await conn.stream(text(f"SELECT * FROM {name} ORDER BY created_at, log_id"))
+        async for row in result:
+            out.write(_row_to_json(row) + "\n")
+            rows += 1
+    os.replace(path + ".tmp", path)
+    await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    await conn.execute(text(f"DROP TABLE {name}"))
+    await conn.commit()
+    return rows
+
+
+async def archive_expired(conn: AsyncConnection, retention_months: int | None = None) -> list[dict]:
+    """Archive every partition that ended more than ``retention_months`` ago."""
+    retention_months = settings.LOG_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0 or not await is_partitioned(conn):
+        return []
+    cutoff = _add_months(_month_of(datetime.now(timezone.utc)), -retention_months)
+    archived = []
+    for month in await list_partitions(conn, restored=False):
+        if month < cutoff:
+            rows = await archive_month(conn, month)
+            archived.append({"month": month.isoformat()[:7], "rows": rows, "path": archive_path(month)})
+    return archived
+
+
+async def restore_month(conn: AsyncConnection, month: date) -> int:
+    """Load an archived month back into its (re-created) partition."""
+    path = archive_path(month)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if month in await list_partitions(conn):
+        raise ValueError(f"Partition {partition_name(month)} already exists")
+    await create_partition(conn, month)
+    await conn.execute(text(f"COMMENT ON TABLE {partition_name(month)} IS '{RESTORED_MARK}'"))
+    table = ActivityLog.__table__
+    restored = 0
+    batch: list[dict] = []
+    with gzip.open(path, "rt", encoding="utf-8") as source:
+        for line in source:
+            row = json.loads(line)
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            batch.append(row)
+            if len(batch) >= RESTORE_BATCH_SIZE:
+                await conn.execute(insert(table), batch)
+                restored += len(batch)
+                batch = []
+    if batch:
+        await conn.execute(insert(table), batch)
+        restored += len(batch)
+    await conn.commit()
+    return restored
+
+
+async def run_maintenance() -> list[dict]:
+    """Create upcoming partitions and archive expired ones, once per cluster."""
+    async with engine.connect() as conn:
+        locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LOCK_KEY})).scalar()
+        await conn.commit()
+        if not locked:
+            return []
+        try:
+            await ensure_partitions(conn)
+            return await archive_expired(conn)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            await conn.commit()
+
+
+async def _maintenance_loop() -> None:
+    while True:
+        try:
+            await run_maintenance()
+        except Exception:
+            # Partitions are created months ahead; the next run retries
+            pass
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+
+def start_maintenance() -> None:
+    if "task" not in _tasks:
+        _tasks["task"] = asyncio.create_task(_maintenance_loop())
+
+
+async def stop_maintenance() -> None:
+    task = _tasks.pop("task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def _main(args) -> None:
+    async with engine.connect() as conn:
+        if args.command == "ensure":
+            await ensure_partitions(conn)
+            print(", ".join(partition_name(m) for m in await list_partitions(conn)) or "activity_logs is not partitioned")
+        elif args.command == "convert":
+            print(f"moved {await convert_legacy_table(conn)} rows")
+        elif args.command == "archive" and args.month:
+            month = datetime.strptime(args.month, "%Y-%m").date()
+            print(f"{args.month}: {await archive_month(conn, month)} rows -> {archive_path(month)}")
+        elif args.command == "archive":
+            for item in await archive_expired(conn, args.retention_months):
+                print(f"{item['month']}: {item['rows']} rows -> {item['path']}")
+        elif args.command == "restore":
+            month = datetime.strptime(args.month, "%Y-%m").date()
+            print(f"restored {await restore_month(conn, month)} rows into {partition_name(month)}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage activity_logs partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("ensure", help="create the current and upcoming monthly partitions")
+    sub.add_parser("convert", help="move an unpartitioned activity_logs table into partitions")
+    archive = sub.add_parser("archive", help="dump and drop partitions past the retention period")
+    archive.add_argument("--retention-months", type=int, default=None)
+    archive.add_argument("--month", help="archive this YYYY-MM partition regardless of retention")
+    restore = sub.add_parser("restore", help="load an archived month back")
+    restore.add_argument("month", help="YYYY-MM")
+    asyncio.run(_main(parser.parse_args()))
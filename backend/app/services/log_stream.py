@@ -0,0 +1,117 @@
+import asyncio
+import json
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import asyncpg
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.activity_log import ActivityLog
+from app.schemas.activity_log import ActivityLogResponse
+from app.services.activity_log import LOG_CHANNEL, get_unread_counts
+
+HEARTBEAT_SECONDS = 15
+RECONNECT_SECONDS = 5
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Open event streams of this worker: user_id -> one queue per connection
+_subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+_tasks: set[asyncio.Task] = set()
+_listener: dict = {}
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _publish(queue: asyncio.Queue, message: str) -> None:
+    # A slow client loses its oldest events rather than growing the queue
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+@asynccontextmanager
+async def subscribe(user_id: int) -> AsyncIterator[asyncio.Queue]:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers[user_id].add(queue)
+    try:
+        yield queue
+    finally:
+        _subscribers[user_id].discard(queue)
+        if not _subscribers[user_id]:
+            del _subscribers[user_id]
+
+
+async def _dispatch(message: dict) -> None:
+    """Fan one notification out to this worker's subscribers.
+
+    One query loads the announced logs and one the unread counts of
+    connected admins, however many streams are open.
+    """
+    if not _subscribers:
+        return
+    seen_by = message.get("seen_by")
+    user_ids = [seen_by] if seen_by is not None else list(_subscribers)
+    async with async_session() as db:
+        logs = []
+        if message.get("log_ids"):
+            result = await db.execute(
+                select(ActivityLog)
+                .where(ActivityLog.log_id.in_(message["log_ids"]))
+                .order_by(ActivityLog.created_at, ActivityLog.log_id)
+            )
+            logs = [ActivityLogResponse.model_validate(log).model_dump(mode="json") for log in result.scalars().all()]
+        counts = await get_unread_counts(db, user_ids)
+
+    for user_id in user_ids:
+        for queue in list(_subscribers.get(user_id, ())):
+            for log in logs:
+                _publish(queue, format_event("log", log))
+            if user_id in counts:
+                _publish(queue, format_event("count", {"count": counts[user_id]}))
+
+
+def _on_notify(connection, pid, channel, payload) -> None:
+    task = asyncio.create_task(_dispatch(json.loads(payload)))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _listen() -> None:
+    """Hold a LISTEN connection open, reconnecting when it drops."""
+    dsn = make_url(settings.async_database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        closed = asyncio.Event()
+        try:
+            conn = await asyncpg.connect(dsn)
+            conn.add_termination_listener(lambda _: closed.set())
+            await conn.add_listener(LOG_CHANNEL, _on_notify)
+            _listener["conn"] = conn
+            await closed.wait()
+        except (OSError, asyncpg.PostgresError):
+            pass
+        finally:
+            conn = _listener.pop("conn", None)
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(RECONNECT_SECONDS)
+
+
+def start_listener() -> None:
+    if "task" not in _listener:
+        _listener["task"] = asyncio.create_task(_listen())
+
+
+async def stop_listener() -> None:
+    task = _listener.pop("task", None)
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
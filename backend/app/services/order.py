@@ -2,6 +2,7 @@ from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 
 from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -13,9 +14,28 @@ from app.models.order_item_attribute_value import OrderItemAttributeValue
 from app.models.product import Product
 from app.models.product_attribute_value import ProductAttributeValue
 from app.models.product_category import ProductCategory
+from app.models.shipment import ShipmentOrder
 from app.models.shopping_list_override import ShoppingListOverride
+from app.models.user import User
 from app.schemas.order import OrderCreate, OrderUpdate
+from app.services import brand as brand_service
+from app.services import customer_budget
+from app.services.activity_log import order_log_state, record_activity, record_order_changes
+from app.services.attribute_snapshot import format_attributes, refresh_item_snapshots, refresh_product_snapshots
 from app.services.currency import calculate_prices, get_rates
+from app.services.product import (
+    find_product_by_key,
+    invalidate_search_cache_after_commit,
+    product_match_key,
+)
+from app.services.product_category import (
+    get_category_markup,
+    get_category_tree,
+    get_or_create_category,
+    invalidate_category_cache,
+)
+from app.services.product_stats import refresh_product_counters
+from app.services.shipment import refresh_shipment_totals, refresh_totals_for_orders, refresh_totals_for_products
 
 
 SORTABLE_COLUMNS = {
@@ -79,7 +99,6 @@ async def get_orders(
     offset = (page - 1) * page_size
     query = (
         base.options(
-            selectinload(Order.items).selectinload(OrderItem.attribute_values).selectinload(OrderItemAttributeValue.attribute),
             selectinload(Order.items).selectinload(OrderItem.product),
             selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.category),
             selectinload(Order.customer),
@@ -92,11 +111,86 @@ async def get_orders(
     return list(result.scalars().unique().all()), total
 
 
+async def get_unshipped_orders(
+    db: AsyncSession,
+    customer_id: int | None = None,
+    min_weight_kg: Decimal | None = None,
+    max_weight_kg: Decimal | None = None,
+    cursor: int | None = None,
+    page_size: int = 50,
+) -> tuple[list[dict], int | None]:
+    """Pending, non-archived orders that are not part of any shipment.
+
+    Uses an anti-join on shipment_orders and keyset paging on order_id, so the
+    cost depends on the page size rather than on total order volume. Returns
+    the page and the cursor for the next one (None on the last page).
+    """
+    weight_grams = (
+        select(func.coalesce(func.sum(Product.packaged_weight_grams * OrderItem.quantity), 0))
+        .select_from(OrderItem)
+        .join(Product, OrderItem.product_id == Product.product_id)
+        .where(OrderItem.order_id == Order.order_id)
+        .correlate(Order)
+        .scalar_subquery()
+    )
+    item_count = (
+        select(func.count(OrderItem.item_id))
+        .where(OrderItem.order_id == Order.order_id)
+        .correlate(Order)
+        .scalar_subquery()
+    )
+    in_shipment = select(ShipmentOrder.id).where(ShipmentOrder.order_id == Order.order_id).exists()
+
+    query = (
+        select(
+            Order.order_id,
+            Order.order_number,
+            Order.customer_id,
+            Customer.customer_name,
+            Order.order_date,
+            Order.total_amount,
+            Order.service_fee,
+            item_count.label("item_count"),
+            weight_grams.label("weight_grams"),
+        )
+        .outerjoin(Customer, Order.customer_id == Customer.customer_id)
+        .where(Order.status == "pending", Order.is_archived == False, ~in_shipment)
+    )
+    if customer_id is not None:
+        query = query.where(Order.customer_id == customer_id)
+    if min_weight_kg is not None:
+        query = query.where(weight_grams >= min_weight_kg * 1000)
+    if max_weight_kg is not None:
+        query = query.where(weight_grams <= max_weight_kg * 1000)
+    if cursor is not None:
+        query = query.where(Order.order_id > cursor)
+
+    result = await db.execute(query.order_by(Order.order_id).limit(page_size + 1))
+    rows = result.all()
+    next_cursor = rows[page_size - 1].order_id if len(rows) > page_size else None
+
+    return [
+        {
+            "order_id": row.order_id,
+            "order_number": row.order_number,
+            "customer_id": row.customer_id,
+            "customer_name": row.customer_name,
+            "order_date": row.order_date,
+            "total_amount": row.total_amount,
+            "service_fee": row.service_fee if row.service_fee is not None else Decimal("3.00"),
+            "item_count": row.item_count,
+            "total_weight_kg": (Decimal(row.weight_grams) / Decimal(1000)).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            ),
+        }
+        for row in rows[:page_size]
+    ], next_cursor
+
+
 async def get_order(db: AsyncSession, order_id: int) -> Order | None:
     query = (
         select(Order)
         .options(
-            selectinload(Order.items).selectinload(OrderItem.attribute_values).selectinload(OrderItemAttributeValue.attribute),
             selectinload(Order.items).selectinload(OrderItem.product),
             selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.category),
             selectinload(Order.customer),
@@ -136,8 +230,13 @@ ITEM_EXTRA_FIELDS = {"product_name", "brand", "category_id", "category_name", "p
 async def _resolve_product(db: AsyncSession, item_fields: dict) -> int | None:
     """Return an existing product_id or create a new product from inline fields.
 
-    The product's stored selling_price is always calculated at the standard 1.5x
-    markup regardless of the order's discount. The order item price (in item_fields)
+    Inline items are matched to an existing product by normalized name, brand
+    and attribute values (products.match_key), and inline category names to
+    an existing category by normalized name, so re-ordering the same item
+    does not add catalogue rows.
+
+    A new product's stored selling_price is always calculated at the category's
+    standard markup (1.5x by default) regardless of the order's discount. The order item price (in item_fields)
     is set by the caller and may differ.
     """
     if item_fields.get("product_id"):
@@ -147,10 +246,23 @@ async def _resolve_product(db: AsyncSession, item_fields: dict) -> int | None:
 
     category_id = item_fields.get("category_id")
     if not category_id and item_fields.get("category_name"):
-        cat = ProductCategory(category_name=item_fields["category_name"])
-        db.add(cat)
-        await db.flush()
-        category_id = cat.category_id
+        category_id = await get_or_create_category(db, item_fields["category_name"])
+
+    brand_id, brand = await brand_service.resolve_brand(db, item_fields.get("brand"))
+    attr_values = [
+        av_data for av_data in (
+            av if isinstance(av, dict) else av.model_dump()
+            for av in item_fields.get("attribute_values") or []
+        )
+        if av_data.get("attribute_id") and av_data.get("value")
+    ]
+    match_key = product_match_key(
+        item_fields["product_name"], brand_id, category_id,
+        ((av["attribute_id"], av["value"]) for av in attr_values),
+    )
+    existing_id = await find_product_by_key(db, match_key)
+    if existing_id is not None:
+        return existing_id
 
     cost_price = item_fields.get("cost_price") or 0
 
@@ -159,7 +271,7 @@ async def _resolve_product(db: AsyncSession, item_fields: dict) -> int | None:
     product_selling_price_uzs = None
     if cost_price:
         try:
-            prices = await calculate_prices(cost_price)  # default MARKUP = 1.5
+            prices = await calculate_prices(cost_price, await get_category_markup(db, category_id))
             product_selling_price = prices["selling_price"]
             product_selling_price_uzs = prices["selling_price_uzs"]
         except Exception:
@@ -169,35 +281,77 @@ async def _resolve_product(db: AsyncSession, item_fields: dict) -> int | None:
         product_selling_price = item_fields.get("selling_price")
         product_selling_price_uzs = item_fields.get("selling_price_uzs")
 
-    product = Product(
-        product_name=item_fields["product_name"],
-        brand=item_fields.get("brand") or None,
-        category_id=category_id,
-        cost_price=cost_price,
-        selling_price=product_selling_price,
-        selling_price_uzs=product_selling_price_uzs,
-        packaged_weight_grams=item_fields.get("packaged_weight_grams"),
-        stock_status="pre_order",
+    # ON CONFLICT covers a concurrent order creating the same product
+    result = await db.execute(
+        insert(Product)
+        .values(
+            product_name=item_fields["product_name"],
+            brand=brand,
+            brand_id=brand_id,
+            category_id=category_id,
+            cost_price=cost_price,
+            selling_price=product_selling_price,
+            selling_price_uzs=product_selling_price_uzs,
+            packaged_weight_grams=item_fields.get("packaged_weight_grams"),
+            stock_status="pre_order",
+            match_key=match_key,
+        )
+        .on_conflict_do_nothing()
+        .returning(Product.product_id)
     )
-    db.add(product)
-    await db.flush()
+    product_id = result.scalar_one_or_none()
+    if product_id is None:
+        return await find_product_by_key(db, match_key)
 
-    attr_values = item_fields.get("attribute_values")
     if attr_values:
         for av in attr_values:
-            av_data = av if isinstance(av, dict) else av.model_dump()
-            if av_data.get("attribute_id") and av_data.get("value"):
-                db.add(ProductAttributeValue(
-                    product_id=product.product_id,
-                    attribute_id=av_data["attribute_id"],
-                    value=av_data["value"],
-                ))
-        await db.flush()
+            db.add(ProductAttributeValue(
+                product_id=product_id,
+                attribute_id=av["attribute_id"],
+                value=av["value"],
+            ))
+        await refresh_product_snapshots(db, [product_id])
 
-    return product.product_id
+    invalidate_search_cache_after_commit(db)
+    return product_id
 
 
-async def _build_order_items(db: AsyncSession, items_data, markup: Decimal = Decimal("1.5")) -> list[OrderItem]:
+async def _validate_attribute_ids(db: AsyncSession, items_data) -> None:
+    """Reject unknown attribute_ids before anything is written.
+
+    Checked against the cached category tree, which is reloaded once
+    before rejecting an id, since another worker may have just created it.
+    An item that names its category must only use that category's attributes.
+    """
+    attribute_categories = (await get_category_tree(db))["attribute_categories"]
+    wanted = {av.attribute_id for item_data in items_data for av in item_data.attribute_values or [] if av.attribute_id}
+    if not wanted <= attribute_categories.keys():
+        invalidate_category_cache()
+        attribute_categories = (await get_category_tree(db))["attribute_categories"]
+    for item_data in items_data:
+        for av in item_data.attribute_values or []:
+            if not av.attribute_id:
+                continue
+            owner = attribute_categories.get(av.attribute_id)
+            if owner is None:
+                raise ValueError(f"Unknown attribute_id {av.attribute_id}")
+            if item_data.category_id and owner != item_data.category_id:
+                raise ValueError(f"Attribute {av.attribute_id} does not belong to category {item_data.category_id}")
+
+
+async def _build_order_items(
+    db: AsyncSession,
+    items_data,
+    markup: Decimal = Decimal("1.5"),
+    reweighed: set[int] | None = None,
+) -> list[OrderItem]:
+    """Build order items from the request payload.
+
+    Product ids whose packaged weight is changed along the way are added to
+    ``reweighed`` so the caller can refresh shipments that depend on them.
+    Raises ValueError for attribute_ids that do not exist.
+    """
+    await _validate_attribute_ids(db, items_data)
     result = []
     for item_data in items_data:
         item_fields = item_data.model_dump()
@@ -214,8 +368,12 @@ async def _build_order_items(db: AsyncSession, items_data, markup: Decimal = Dec
                 item_fields["selling_price"] = product.selling_price
             if item_fields.get("selling_price_uzs") is None:
                 item_fields["selling_price_uzs"] = product.selling_price_uzs
-            if item_fields.get("packaged_weight_grams") is not None:
-                product.packaged_weight_grams = item_fields["packaged_weight_grams"]
+            new_weight = item_fields.get("packaged_weight_grams")
+            if new_weight is not None and new_weight != product.packaged_weight_grams:
+                product.packaged_weight_grams = new_weight
+                invalidate_search_cache_after_commit(db)
+                if reweighed is not None:
+                    reweighed.add(product_id)
 
         # Build per-item attribute values (stored on the order item, not the product)
         raw_avs = item_fields.get("attribute_values") or []
@@ -261,36 +419,20 @@ _PAID_STATUSES = {"paid_card", "paid_cash"}
 
 
 async def _apply_customer_budget(order: Order, db: AsyncSession) -> None:
-    """Refund any previously applied budget, then re-apply as much as needed."""
-    if not order.customer_id:
-        order.budget_applied_uzs = Decimal(0)
-        return
-
-    customer = await db.get(Customer, order.customer_id)
-    if not customer:
-        order.budget_applied_uzs = Decimal(0)
-        return
-
-    # Refund the previously applied amount back to the customer balance
-    prev_applied = order.budget_applied_uzs or Decimal(0)
-    customer.budget = (customer.budget or Decimal(0)) + prev_applied
-
-    # Compute total price in UZS using live rate
-    total_uzs = await _compute_final_amount_uzs(order, db)
-    if not total_uzs or customer.budget <= 0:
-        order.budget_applied_uzs = Decimal(0)
-        return
-
-    # How much is still owed after card/cash payments
-    paid = (order.paid_card or Decimal(0)) + (order.paid_cash or Decimal(0))
-    remaining = max(Decimal(0), total_uzs - paid)
-    if remaining <= 0:
-        order.budget_applied_uzs = Decimal(0)
-        return
-
-    applied = min(customer.budget, remaining).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    customer.budget = (customer.budget - applied).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    order.budget_applied_uzs = applied
+    """Apply the customer's budget to whatever the order still owes.
+
+    The change is posted to the budget ledger as a delta against what the
+    order already holds; the balance is never read-modified-written here.
+    """
+    amount_due = Decimal(0)
+    if order.customer_id:
+        # Compute total price in UZS using live rate
+        total_uzs = await _compute_final_amount_uzs(order, db)
+        if total_uzs:
+            # How much is still owed after card/cash payments
+            paid = (order.paid_card or Decimal(0)) + (order.paid_cash or Decimal(0))
+            amount_due = max(Decimal(0), total_uzs - paid)
+    await customer_budget.settle_order(db, order, amount_due)
 
 
 async def _compute_final_amount_uzs(order: Order, db: AsyncSession) -> Decimal | None:
@@ -336,7 +478,7 @@ async def _compute_final_amount_uzs(order: Order, db: AsyncSession) -> Decimal |
     return (total_price_usd * usd_to_uzs).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-async def create_order(db: AsyncSession, data: OrderCreate) -> Order:
+async def create_order(db: AsyncSession, data: OrderCreate, user: User | None = None) -> Order:
     customer_id = await _resolve_customer(db, data)
 
     order_dict = data.model_dump(
@@ -348,30 +490,39 @@ async def create_order(db: AsyncSession, data: OrderCreate) -> Order:
         order_dict["order_number"] = await _next_order_number(db)
     order = Order(**order_dict)
     markup = Decimal("1.0") if data.is_family_discount else Decimal("1.5")
-    new_items = await _build_order_items(db, data.items, markup=markup)
+    reweighed: set[int] = set()
+    new_items = await _build_order_items(db, data.items, markup=markup, reweighed=reweighed)
     order.items.extend(new_items)
     db.add(order)
     await db.flush()
+    await refresh_item_snapshots(db, [it.item_id for it in new_items])
     await _deduct_stock(db, new_items)
     await _apply_customer_budget(order, db)
+    await refresh_totals_for_products(db, reweighed)
+    await refresh_product_counters(db, [it.product_id for it in new_items])
+    record_activity(
+        db, user, "order_created", "order", new_value=order.order_number,
+        order_id=order.order_id, order_number=order.order_number,
+    )
     await db.commit()
     return await get_order(db, order.order_id)
 
 
-async def update_order(db: AsyncSession, order_id: int, data: OrderUpdate) -> Order | None:
+async def update_order(
+    db: AsyncSession, order_id: int, data: OrderUpdate, user: User | None = None,
+) -> Order | None:
+    # Locked so concurrent edits settle the budget one after the other
     query = (
         select(Order)
-        .options(
-            selectinload(Order.items)
-            .selectinload(OrderItem.product)
-            .selectinload(Product.attribute_values)
-        )
+        .options(selectinload(Order.items).selectinload(OrderItem.product))
         .where(Order.order_id == order_id)
+        .with_for_update(of=Order)
     )
     result = await db.execute(query)
     order = result.scalar_one_or_none()
     if not order:
         return None
+    log_state = order_log_state(order)
 
     customer_id = await _resolve_customer(db, data)
     if customer_id is not None:
@@ -384,10 +535,13 @@ async def update_order(db: AsyncSession, order_id: int, data: OrderUpdate) -> Or
     for key, value in fields.items():
         setattr(order, key, value)
 
+    reweighed: set[int] = set()
+    touched_products: set[int] = set()
     if data.items is not None:
+        touched_products = {it.product_id for it in order.items if it.product_id}
         old_stock_items = [it for it in order.items if it.from_stock and it.product_id]
         markup = Decimal("1.0") if order.is_family_discount else Decimal("1.5")
-        new_items = await _build_order_items(db, data.items, markup=markup)
+        new_items = await _build_order_items(db, data.items, markup=markup, reweighed=reweighed)
         if new_items or not order.items:
             await _restore_stock(db, old_stock_items)
 
@@ -409,6 +563,7 @@ async def update_order(db: AsyncSession, order_id: int, data: OrderUpdate) -> Or
             order.items.clear()
             order.items.extend(new_items)
             await db.flush()  # assign new item_ids before restoring overrides
+            await refresh_item_snapshots(db, [it.item_id for it in new_items])
 
             for item in new_items:
                 if item.product_id and item.product_id in override_by_product:
@@ -420,6 +575,7 @@ async def update_order(db: AsyncSession, order_id: int, data: OrderUpdate) -> Or
                     ))
 
             await _deduct_stock(db, new_items)
+            touched_products |= {it.product_id for it in new_items if it.product_id}
 
     # Lock final UZS amount when order is completed and fully paid
     effective_status = order.status
@@ -430,6 +586,12 @@ async def update_order(db: AsyncSession, order_id: int, data: OrderUpdate) -> Or
         order.final_amount_uzs = None
 
     await _apply_customer_budget(order, db)
+    if reweighed:
+        await refresh_totals_for_products(db, reweighed)
+    if data.items is not None or "service_fee" in fields or customer_id is not None:
+        await refresh_totals_for_orders(db, [order_id])
+    await refresh_product_counters(db, touched_products)
+    record_order_changes(db, user, order, log_state)
     await db.commit()
     return await get_order(db, order_id)
 
@@ -441,7 +603,6 @@ async def get_shopping_list(db: AsyncSession) -> list[dict]:
         .where(Order.status == "pending", Order.is_archived == False)
         .options(
             selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.category),
-            selectinload(Order.items).selectinload(OrderItem.attribute_values).selectinload(OrderItemAttributeValue.attribute),
             selectinload(Order.customer),
         )
     )
@@ -477,20 +638,12 @@ async def get_shopping_list(db: AsyncSession) -> list[dict]:
             key = item.product_id if item.product_id else f"name:{item.product_name or '?'}"
             if key not in groups:
                 product = item.product
-                attrs = None
-                if item.attribute_values:
-                    parts = [
-                        f"{av.attribute.attribute_name}: {av.value}"
-                        for av in item.attribute_values
-                        if av.attribute
-                    ]
-                    attrs = ", ".join(parts) if parts else None
                 groups[key] = {
                     "product_id": item.product_id,
                     "product_name": product.product_name if product else (item.product_name or "—"),
                     "brand": product.brand if product else None,
                     "category_name": product.category.category_name if product and product.category else None,
-                    "product_attributes": attrs,
+                    "product_attributes": format_attributes(item.attribute_snapshot),
                     "orders": [],
                 }
             groups[key]["orders"].append({
@@ -527,13 +680,28 @@ async def upsert_shopping_override(
     await db.commit()
 
 
-async def delete_order(db: AsyncSession, order_id: int) -> bool:
-    query = select(Order).options(selectinload(Order.items)).where(Order.order_id == order_id)
+async def delete_order(db: AsyncSession, order_id: int, user: User | None = None) -> bool:
+    query = (
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.order_id == order_id)
+        .with_for_update(of=Order)
+    )
     result = await db.execute(query)
     order = result.scalar_one_or_none()
     if not order:
         return False
+    shipments_result = await db.execute(
+        select(ShipmentOrder.shipment_id).where(ShipmentOrder.order_id == order_id)
+    )
+    shipment_ids = shipments_result.scalars().all()
+    product_ids = [it.product_id for it in order.items]
     await _restore_stock(db, order.items)
+    await customer_budget.settle_order(db, order, Decimal(0))
     await db.delete(order)
+    await refresh_shipment_totals(db, shipment_ids)
+    await refresh_product_counters(db, product_ids)
+    # order_id stays empty: the row it would point at is gone
+    record_activity(db, user, "order_deleted", "order", old_value=order.order_number, order_number=order.order_number)
     await db.commit()
     return True
@@ -1,14 +1,22 @@
-from sqlalchemy import func, select
+import hashlib
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Select, case, delete, event, exists, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.models.order_item import OrderItem
+from app.core.database import normalize_name
+from app.models.category_attribute import CategoryAttribute
 from app.models.product import Product
-from app.models.shipment import Shipment, ShipmentStockItem
+from app.models.shipment import ShipmentStockItem
 from app.models.product_attribute_value import ProductAttributeValue
 from app.models.product_category import ProductCategory
 from app.schemas.product import ProductCreate, ProductUpdate
+from app.services import brand as brand_service
+from app.services.attribute_snapshot import refresh_product_snapshots
 from app.services.currency import calculate_prices
+from app.services.product_category import get_category_markup
+from app.services.shipment import refresh_shipment_totals, refresh_totals_for_products
 
 
 SORTABLE_COLUMNS = {
@@ -20,8 +28,140 @@ SORTABLE_COLUMNS = {
     "packaged_weight_grams": Product.packaged_weight_grams,
     "cost_price": Product.cost_price,
     "selling_price": Product.selling_price,
+    "times_ordered": Product.times_ordered,
+    "in_shipment_qty": Product.in_shipment_qty,
 }
 
+MAX_FACET_VALUES = 50
+
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = 60  # seconds
+
+# LRU of recent typeahead results keyed by (query, category_id, brand, limit)
+_search_cache: OrderedDict = OrderedDict()
+
+
+def invalidate_search_cache() -> None:
+    _search_cache.clear()
+
+
+def _clear_search_cache(session) -> None:
+    invalidate_search_cache()
+
+
+def invalidate_search_cache_after_commit(db: AsyncSession) -> None:
+    """Drop the cache whenever the caller's session commits.
+
+    Clearing it earlier lets a concurrent typeahead refill it without the
+    uncommitted change, and that result would then live for the full TTL.
+    """
+    if not event.contains(db.sync_session, "after_commit", _clear_search_cache):
+        event.listen(db.sync_session, "after_commit", _clear_search_cache)
+
+
+def product_match_key(product_name: str, brand_id: int | None, category_id: int | None, attribute_values) -> str:
+    """Identity of a product for deduplication: name, brand, category and attribute values.
+
+    attribute_values is an iterable of (attribute_id, value) pairs; names and
+    values are compared case- and whitespace-insensitively.
+    """
+    attrs = sorted((int(attribute_id), normalize_name(value)) for attribute_id, value in attribute_values)
+    raw = "\x1f".join([
+        normalize_name(product_name),
+        str(brand_id or ""),
+        str(category_id or ""),
+        *(f"{attribute_id}={value}" for attribute_id, value in attrs),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+async def find_product_by_key(db: AsyncSession, match_key: str, exclude_id: int | None = None) -> int | None:
+    query = select(Product.product_id).where(Product.match_key == match_key)
+    if exclude_id is not None:
+        query = query.where(Product.product_id != exclude_id)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def _free_match_key(db: AsyncSession, match_key: str, product_id: int | None = None) -> str | None:
+    # Deliberate duplicates entered by hand stay unkeyed (and keep_separate)
+    return None if await find_product_by_key(db, match_key, exclude_id=product_id) else match_key
+
+
+def like_pattern(text: str, prefix_only: bool = False) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+
+async def search_products(
+    db: AsyncSession,
+    q: str,
+    category_id: int | None = None,
+    brand: str | None = None,
+    limit: int = 20,
+) -> list[dict]:
+    """Typeahead search over product name, brand and attribute values.
+
+    Substring matches are served by the pg_trgm GIN indexes; rows are ranked
+    by prefix match first and trigram similarity second. Results for hot
+    queries are kept in a small in-process LRU.
+    """
+    q = " ".join(q.split())
+    if not q:
+        return []
+    key = (q.lower(), category_id, brand, limit)
+    cached = _search_cache.get(key)
+    if cached and time.time() - cached[0] < SEARCH_CACHE_TTL:
+        _search_cache.move_to_end(key)
+        return cached[1]
+
+    pattern = like_pattern(q)
+    # Uncorrelated so Postgres evaluates it once (hashed subplan) off the trigram index
+    attr_match = Product.product_id.in_(
+        select(ProductAttributeValue.product_id)
+        .where(ProductAttributeValue.value.ilike(pattern, escape="\\"))
+    )
+    score = (
+        case((Product.product_name.ilike(like_pattern(q, prefix_only=True), escape="\\"), 1.0), else_=0.0)
+        + func.greatest(
+            func.similarity(Product.product_name, q),
+            func.similarity(func.coalesce(Product.brand, ""), q),
+        )
+    )
+    query = (
+        select(
+            Product.product_id,
+            Product.product_name,
+            Product.brand,
+            Product.category_id,
+            Product.cost_price,
+            Product.selling_price,
+            Product.selling_price_uzs,
+            Product.packaged_weight_grams,
+            Product.stock_status,
+            Product.stock_quantity,
+            Product.attribute_snapshot.label("attribute_values"),
+        )
+        .where(
+            Product.is_active == True,
+            or_(
+                Product.product_name.ilike(pattern, escape="\\"),
+                Product.brand.ilike(pattern, escape="\\"),
+                attr_match,
+            ),
+        )
+    )
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if brand is not None:
+        query = query.where(await brand_service.brand_condition(db, brand))
+    result = await db.execute(query.order_by(score.desc(), Product.product_name).limit(limit))
+    data = [row._asdict() for row in result.all()]
+    _search_cache[key] = (time.time(), data)
+    _search_cache.move_to_end(key)
+    while len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+    return data
+
 
 async def get_products(
     db: AsyncSession,
@@ -29,20 +169,41 @@ async def get_products(
     brand: str | None = None,
     is_active: bool | None = None,
     stock_status: str | None = None,
+    min_times_ordered: int | None = None,
+    in_shipment: bool | None = None,
+    attr_filters: dict[int, list[str]] | None = None,
     sort_by: str | None = None,
     sort_dir: str = "asc",
     page: int = 1,
     page_size: int = 20,
-) -> tuple[list[Product], int]:
+) -> tuple[list[Product], int, Select]:
+    """Page of products plus the total and the unpaged filtered query.
+
+    Each attr_filters entry keeps products having any of the listed values
+    for that attribute; entries are ANDed together.
+    """
     query = select(Product)
     if category_id is not None:
         query = query.where(Product.category_id == category_id)
     if brand is not None:
-        query = query.where(Product.brand == brand)
+        query = query.where(await brand_service.brand_condition(db, brand))
     if is_active is not None:
         query = query.where(Product.is_active == is_active)
     if stock_status is not None:
         query = query.where(Product.stock_status == stock_status)
+    if min_times_ordered is not None:
+        query = query.where(Product.times_ordered >= min_times_ordered)
+    if in_shipment is not None:
+        query = query.where(Product.in_shipment_qty > 0 if in_shipment else Product.in_shipment_qty == 0)
+    for attribute_id, values in (attr_filters or {}).items():
+        query = query.where(
+            exists().where(
+                ProductAttributeValue.product_id == Product.product_id,
+                ProductAttributeValue.attribute_id == attribute_id,
+                ProductAttributeValue.value.in_(values),
+            )
+        )
+    filtered = query
 
     count_q = select(func.count()).select_from(query.subquery())
     total = (await db.execute(count_q)).scalar() or 0
@@ -54,75 +215,69 @@ async def get_products(
     order = col.desc() if sort_dir == "desc" else col.asc()
 
     offset = (page - 1) * page_size
-    result = await db.execute(
-        query.options(
-            selectinload(Product.attribute_values).selectinload(ProductAttributeValue.attribute)
-        ).order_by(order).offset(offset).limit(page_size)
-    )
-    products = list(result.scalars().all())
-
-    if products:
-        product_ids = [p.product_id for p in products]
-        counts_result = await db.execute(
-            select(OrderItem.product_id, func.coalesce(func.sum(OrderItem.quantity), 0))
-            .where(OrderItem.product_id.in_(product_ids))
-            .group_by(OrderItem.product_id)
-        )
-        counts_map = {row[0]: row[1] for row in counts_result.all()}
-
-        in_shipment_result = await db.execute(
-            select(ShipmentStockItem.product_id, func.coalesce(func.sum(ShipmentStockItem.quantity), 0))
-            .join(Shipment, ShipmentStockItem.shipment_id == Shipment.shipment_id)
-            .where(
-                ShipmentStockItem.product_id.in_(product_ids),
-                Shipment.status.in_(["pending", "shipped"]),
-            )
-            .group_by(ShipmentStockItem.product_id)
-        )
-        in_shipment_map = {row[0]: int(row[1]) for row in in_shipment_result.all()}
-
-        for p in products:
-            p.times_ordered = counts_map.get(p.product_id, 0)
-            p.in_shipment_qty = in_shipment_map.get(p.product_id, 0)
-            p.sent_qty = 0
+    result = await db.execute(query.order_by(order).offset(offset).limit(page_size))
+    return list(result.scalars().all()), total, filtered
 
-    return products, total
 
+async def get_attribute_facets(db: AsyncSession, filtered: Select) -> list[dict]:
+    """Value counts per attribute over the products matched by a filtered query.
 
-async def get_product(db: AsyncSession, product_id: int) -> Product | None:
+    Only the top MAX_FACET_VALUES values of each attribute are returned.
+    """
+    product_ids = filtered.with_only_columns(Product.product_id).order_by(None)
+    counts = (
+        select(
+            ProductAttributeValue.attribute_id,
+            ProductAttributeValue.value,
+            func.count().label("count"),
+        )
+        .where(ProductAttributeValue.product_id.in_(product_ids))
+        .group_by(ProductAttributeValue.attribute_id, ProductAttributeValue.value)
+        .subquery()
+    )
+    ranked = select(
+        counts,
+        func.row_number().over(
+            partition_by=counts.c.attribute_id,
+            order_by=(counts.c.count.desc(), counts.c.value),
+        ).label("rank"),
+    ).subquery()
     result = await db.execute(
-        select(Product)
-        .options(selectinload(Product.attribute_values).selectinload(ProductAttributeValue.attribute))
-        .where(Product.product_id == product_id)
+        select(ranked.c.attribute_id, CategoryAttribute.attribute_name, ranked.c.value, ranked.c.count)
+        .join(CategoryAttribute, CategoryAttribute.attribute_id == ranked.c.attribute_id)
+        .where(ranked.c.rank <= MAX_FACET_VALUES)
+        .order_by(CategoryAttribute.sort_order, CategoryAttribute.attribute_id, ranked.c.rank)
     )
-    product = result.scalar_one_or_none()
-    if product:
-        count_result = await db.execute(
-            select(func.coalesce(func.sum(OrderItem.quantity), 0))
-            .where(OrderItem.product_id == product_id)
-        )
-        product.times_ordered = count_result.scalar()
-
-        in_shipment_result = await db.execute(
-            select(func.coalesce(func.sum(ShipmentStockItem.quantity), 0))
-            .join(Shipment, ShipmentStockItem.shipment_id == Shipment.shipment_id)
-            .where(
-                ShipmentStockItem.product_id == product_id,
-                Shipment.status.in_(["pending", "shipped"]),
-            )
-        )
-        product.in_shipment_qty = int(in_shipment_result.scalar() or 0)
-        product.sent_qty = 0
-    return product
+    facets: dict[int, dict] = {}
+    for row in result.all():
+        facet = facets.setdefault(row.attribute_id, {
+            "attribute_id": row.attribute_id,
+            "attribute_name": row.attribute_name,
+            "values": [],
+        })
+        facet["values"].append({"value": row.value, "count": row.count})
+    return list(facets.values())
+
+
+async def get_product(db: AsyncSession, product_id: int) -> Product | None:
+    result = await db.execute(select(Product).where(Product.product_id == product_id))
+    return result.scalar_one_or_none()
 
 
 async def create_product(db: AsyncSession, data: ProductCreate) -> Product:
     fields = data.model_dump()
     attr_values_data = fields.pop("attribute_values", None)
     if fields.get("cost_price") is not None:
-        prices = await calculate_prices(fields["cost_price"])
+        markup = await get_category_markup(db, fields.get("category_id"))
+        prices = await calculate_prices(fields["cost_price"], markup)
         fields["selling_price"] = prices["selling_price"]
         fields["selling_price_uzs"] = prices["selling_price_uzs"]
+    fields["brand_id"], fields["brand"] = await brand_service.resolve_brand(db, fields.get("brand"))
+    fields["match_key"] = await _free_match_key(db, product_match_key(
+        fields["product_name"], fields["brand_id"], fields.get("category_id"),
+        ((av["attribute_id"], av["value"]) for av in attr_values_data or []),
+    ))
+    fields["keep_separate"] = fields["match_key"] is None
     product = Product(**fields)
     db.add(product)
     await db.flush()
@@ -133,7 +288,9 @@ async def create_product(db: AsyncSession, data: ProductCreate) -> Product:
                 attribute_id=av["attribute_id"],
                 value=av["value"],
             ))
+        await refresh_product_snapshots(db, [product.product_id])
     await db.commit()
+    invalidate_search_cache()
     return await get_product(db, product.product_id)
 
 
@@ -144,22 +301,45 @@ async def update_product(db: AsyncSession, product_id: int, data: ProductUpdate)
     fields = data.model_dump(exclude_unset=True)
     attr_values_data = fields.pop("attribute_values", None)
     if "cost_price" in fields and fields["cost_price"] is not None:
-        prices = await calculate_prices(fields["cost_price"])
+        markup = await get_category_markup(db, fields.get("category_id", product.category_id))
+        prices = await calculate_prices(fields["cost_price"], markup)
         fields["selling_price"] = prices["selling_price"]
         fields["selling_price_uzs"] = prices["selling_price_uzs"]
+    if "brand" in fields:
+        fields["brand_id"], fields["brand"] = await brand_service.resolve_brand(db, fields["brand"])
+    if attr_values_data is not None:
+        attribute_pairs = [(av["attribute_id"], av["value"]) for av in attr_values_data]
+    else:
+        current = await db.execute(
+            select(ProductAttributeValue.attribute_id, ProductAttributeValue.value)
+            .where(ProductAttributeValue.product_id == product_id)
+        )
+        attribute_pairs = current.tuples().all()
+    fields["match_key"] = await _free_match_key(db, product_match_key(
+        fields.get("product_name", product.product_name),
+        fields.get("brand_id", product.brand_id),
+        fields.get("category_id", product.category_id),
+        attribute_pairs,
+    ), product_id)
+    # A legacy duplicate waiting for the merge tool stays a merge candidate
+    if product.match_key is not None or product.keep_separate:
+        fields["keep_separate"] = fields["match_key"] is None
+    reweighed = "packaged_weight_grams" in fields and fields["packaged_weight_grams"] != product.packaged_weight_grams
     for key, value in fields.items():
         setattr(product, key, value)
+    if reweighed:
+        await refresh_totals_for_products(db, [product_id])
     if attr_values_data is not None:
-        for av in product.attribute_values:
-            await db.delete(av)
-        await db.flush()
+        await db.execute(delete(ProductAttributeValue).where(ProductAttributeValue.product_id == product_id))
         for av in attr_values_data:
             db.add(ProductAttributeValue(
                 product_id=product_id,
                 attribute_id=av["attribute_id"],
                 value=av["value"],
             ))
+        await refresh_product_snapshots(db, [product_id])
     await db.commit()
+    invalidate_search_cache()
     return await get_product(db, product_id)
 
 
@@ -167,8 +347,14 @@ async def delete_product(db: AsyncSession, product_id: int) -> bool:
     product = await db.get(Product, product_id)
     if not product:
         return False
+    shipments_result = await db.execute(
+        select(ShipmentStockItem.shipment_id).where(ShipmentStockItem.product_id == product_id).distinct()
+    )
+    shipment_ids = shipments_result.scalars().all()
     await db.delete(product)
+    await refresh_shipment_totals(db, shipment_ids)
     await db.commit()
+    invalidate_search_cache()
     return True
 
 
@@ -176,19 +362,22 @@ async def get_brands(
     db: AsyncSession,
     category_id: int | None = None,
 ) -> list[str]:
-    query = select(Product.brand).where(Product.brand.is_not(None)).distinct()
-    if category_id is not None:
-        query = query.where(Product.category_id == category_id)
-    result = await db.execute(query.order_by(Product.brand))
-    return [row[0] for row in result.all()]
+    brands = await brand_service.list_brands(db)
+    if category_id is None:
+        return [name for _, name in brands]
+    result = await db.execute(
+        select(Product.brand_id)
+        .where(Product.category_id == category_id, Product.brand_id.is_not(None))
+        .distinct()
+    )
+    used = set(result.scalars().all())
+    return [name for brand_id, name in brands if brand_id in used]
 
 
 async def get_low_stock_products(db: AsyncSession) -> list[Product]:
     query = select(Product).where(
         Product.stock_quantity <= Product.reorder_level,
         Product.is_active == True,
-    ).options(
-        selectinload(Product.attribute_values).selectinload(ProductAttributeValue.attribute)
     )
     result = await db.execute(query.order_by(Product.stock_quantity))
     return list(result.scalars().all())
@@ -1,42 +1,142 @@
-from sqlalchemy import func, select
+import hashlib
+import time
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.database import normalize_name, normalized_name, primary_session
 from app.models.category_attribute import CategoryAttribute
 from app.models.product_category import ProductCategory
 from app.schemas.category_attribute import CategoryAttributeCreate, CategoryAttributeUpdate
-from app.schemas.product_category import ProductCategoryCreate, ProductCategoryUpdate
+from app.schemas.product_category import ProductCategoryCreate, ProductCategoryResponse, ProductCategoryUpdate
+from app.services.attribute_snapshot import (
+    get_attribute_owners,
+    refresh_item_snapshots,
+    refresh_product_snapshots,
+)
+from app.services.currency import MARKUP
+
+CATEGORY_CACHE_TTL = 60  # seconds
+
+# In-memory copy of the category/attribute tree, invalidated on category writes
+# in this worker; the TTL bounds staleness in other workers. The version
+# guards against storing a tree that was loaded while a write landed.
+_cache: dict = {}
+_cache_version = 0
+
+_category_list = TypeAdapter(list[ProductCategoryResponse])
+
+
+def invalidate_category_cache() -> None:
+    global _cache_version
+    _cache_version += 1
+    _cache.clear()
+
+
+def _invalidate_after_commit(db: AsyncSession) -> None:
+    """Drop the cache once the caller's transaction commits."""
+    event.listen(db.sync_session, "after_commit", lambda session: invalidate_category_cache(), once=True)
+
+
+async def get_category_tree(db: AsyncSession) -> dict:
+    """Categories with their attributes, plus lookups derived from them.
+
+    Keys: ``categories`` (sorted by name), ``by_id``, ``markups`` (effective
+    markup per category), ``attribute_categories`` (owning category per
+    attribute_id) and ``etag`` (hash of the serialized tree, so it is stable
+    across restarts and workers).
+    """
+    if _cache and time.monotonic() - _cache["loaded_at"] < CATEGORY_CACHE_TTL:
+        return _cache
+    version = _cache_version
+    loaded_at = time.monotonic()
+    async with primary_session(db) as source:
+        result = await source.execute(
+            select(ProductCategory)
+            .options(selectinload(ProductCategory.attributes))
+            .order_by(ProductCategory.category_name)
+        )
+        categories = [ProductCategoryResponse.model_validate(c) for c in result.scalars().all()]
+    tree = {
+        "categories": categories,
+        "by_id": {c.category_id: c for c in categories},
+        "markups": {c.category_id: c.markup or MARKUP for c in categories},
+        "attribute_categories": {a.attribute_id: c.category_id for c in categories for a in c.attributes},
+        "etag": '"%s"' % hashlib.sha1(_category_list.dump_json(categories)).hexdigest(),
+        "loaded_at": loaded_at,
+    }
+    if version == _cache_version:
+        _cache.clear()
+        _cache.update(tree)
+    return tree
 
 
 async def get_categories(
     db: AsyncSession, *, page: int = 1, page_size: int = 20,
-) -> tuple[list[ProductCategory], int]:
-    total_result = await db.execute(select(func.count(ProductCategory.category_id)))
-    total = total_result.scalar_one()
+) -> tuple[list[ProductCategoryResponse], int, str]:
+    """One page of the cached tree, its total and the tree's ETag."""
+    tree = await get_category_tree(db)
+    start = (page - 1) * page_size
+    return tree["categories"][start:start + page_size], len(tree["categories"]), tree["etag"]
+
 
+async def get_category(db: AsyncSession, category_id: int) -> ProductCategory | None:
     result = await db.execute(
         select(ProductCategory)
         .options(selectinload(ProductCategory.attributes))
-        .order_by(ProductCategory.category_name)
-        .offset((page - 1) * page_size)
-        .limit(page_size)
+        .where(ProductCategory.category_id == category_id)
     )
-    return list(result.scalars().all()), total
+    return result.scalar_one_or_none()
 
 
-async def get_category(db: AsyncSession, category_id: int) -> ProductCategory | None:
+async def get_category_markup(db: AsyncSession, category_id: int | None) -> Decimal:
+    """Markup used to price products of a category (falls back to the default)."""
+    if category_id is None:
+        return MARKUP
+    return (await get_category_tree(db))["markups"].get(category_id, MARKUP)
+
+
+async def find_category_id(db: AsyncSession, name: str) -> int | None:
+    """Category with the same normalized name, served by its unique index."""
     result = await db.execute(
-        select(ProductCategory)
-        .options(selectinload(ProductCategory.attributes))
-        .where(ProductCategory.category_id == category_id)
+        select(ProductCategory.category_id)
+        .where(normalized_name(ProductCategory.category_name) == normalize_name(name))
     )
     return result.scalar_one_or_none()
 
 
+async def get_or_create_category(db: AsyncSession, name: str) -> int:
+    """Reuse the category with this normalized name or insert it.
+
+    ON CONFLICT covers a concurrent insert of the same name; the row it
+    collided with is then looked up again. The caller commits, so the
+    cache is dropped once that happens.
+    """
+    category_id = await find_category_id(db, name)
+    if category_id is not None:
+        return category_id
+    result = await db.execute(
+        insert(ProductCategory)
+        .values(category_name=" ".join(name.split()))
+        .on_conflict_do_nothing()
+        .returning(ProductCategory.category_id)
+    )
+    category_id = result.scalar_one_or_none()
+    if category_id is None:
+        return await find_category_id(db, name)
+    _invalidate_after_commit(db)
+    return category_id
+
+
 async def create_category(db: AsyncSession, data: ProductCategoryCreate) -> ProductCategory:
     category = ProductCategory(**data.model_dump())
     db.add(category)
     await db.commit()
+    invalidate_category_cache()
     await db.refresh(category, attribute_names=["attributes"])
     return category
 
@@ -48,6 +148,7 @@ async def update_category(db: AsyncSession, category_id: int, data: ProductCateg
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(category, key, value)
     await db.commit()
+    invalidate_category_cache()
     await db.refresh(category, attribute_names=["attributes"])
     return category
 
@@ -58,6 +159,7 @@ async def delete_category(db: AsyncSession, category_id: int) -> bool:
         return False
     await db.delete(category)
     await db.commit()
+    invalidate_category_cache()
     return True
 
 
@@ -68,6 +170,7 @@ async def add_attribute(db: AsyncSession, category_id: int, data: CategoryAttrib
     attr = CategoryAttribute(category_id=category_id, **data.model_dump())
     db.add(attr)
     await db.commit()
+    invalidate_category_cache()
     await db.refresh(attr)
     return attr
 
@@ -78,9 +181,16 @@ async def update_attribute(
     attr = await db.get(CategoryAttribute, attribute_id)
     if not attr or attr.category_id != category_id:
         return None
-    for key, value in data.model_dump(exclude_unset=True).items():
+    fields = data.model_dump(exclude_unset=True)
+    for key, value in fields.items():
         setattr(attr, key, value)
+    # Name and order are baked into the attribute snapshots
+    if fields:
+        product_ids, item_ids = await get_attribute_owners(db, attribute_id)
+        await refresh_product_snapshots(db, product_ids)
+        await refresh_item_snapshots(db, item_ids)
     await db.commit()
+    invalidate_category_cache()
     await db.refresh(attr)
     return attr
 
@@ -89,6 +199,10 @@ async def delete_attribute(db: AsyncSession, category_id: int, attribute_id: int
     attr = await db.get(CategoryAttribute, attribute_id)
     if not attr or attr.category_id != category_id:
         return False
+    product_ids, item_ids = await get_attribute_owners(db, attribute_id)
     await db.delete(attr)
+    await refresh_product_snapshots(db, product_ids)
+    await refresh_item_snapshots(db, item_ids)
     await db.commit()
+    invalidate_category_cache()
     return True
@@ -0,0 +1,269 @@
+import codecs
+import csv
+import json
+import time
+from collections.abc import AsyncIterator, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product
+from app.models.product_attribute_value import ProductAttributeValue
+from app.schemas.product import ProductCreate
+from app.services import brand as brand_service
+from app.services.attribute_snapshot import refresh_product_snapshots
+from app.services.currency import MARKUP, compute_prices, get_rate_snapshot
+from app.services.product import invalidate_search_cache, product_match_key
+from app.services.product_category import get_category_tree, invalidate_category_cache
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# CSV columns named "attr:<attribute_id>" carry category attribute values
+ATTR_COLUMN_PREFIX = "attr:"
+
+_PRODUCT_COLUMNS = [
+    "product_name", "brand", "brand_id", "category_id", "description", "cost_price",
+    "selling_price", "selling_price_uzs", "packaged_weight_grams", "volume_ml",
+    "stock_quantity", "reorder_level", "stock_status", "is_active", "match_key", "keep_separate",
+]
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decoded lines, each keeping its line ending (csv.reader needs them)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer
+
+
+def _pop_records(pending: list[str], final: bool) -> Iterator[list[str] | csv.Error]:
+    """Parse and remove the complete CSV records at the front of ``pending``.
+
+    Stops at a record that may continue past the buffered lines, unless
+    ``final``. Malformed records are yielded as their csv.Error.
+    """
+    while pending:
+        used = 0
+
+        def feed():
+            nonlocal used
+            for line in pending:
+                used += 1
+                yield line
+
+        try:
+            record = next(csv.reader(feed(), strict=True))
+        except csv.Error as exc:
+            # Ran out of lines inside a quoted field: wait for more
+            if used == len(pending) and not final:
+                return
+            record = exc
+        del pending[:used]
+        yield record
+
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[list[str] | csv.Error]:
+    """csv.reader over an incremental buffer of complete lines.
+
+    Quoted fields may span lines and request chunks; only the lines of the
+    record being read are buffered.
+    """
+    pending: list[str] = []
+    async for line in lines:
+        pending.append(line)
+        for record in _pop_records(pending, final=False):
+            yield record
+    for record in _pop_records(pending, final=True):
+        yield record
+
+
+async def _iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """Yield CSV records as dicts keyed by the header row."""
+    header: list[str] | None = None
+    async for record in _iter_csv_records(lines):
+        if isinstance(record, csv.Error):
+            yield {"__error__": f"Invalid CSV: {record}"}
+            continue
+        if not any(field.strip() for field in record):
+            continue
+        if header is None:
+            header = [field.strip() for field in record]
+            continue
+        row: dict = {"attribute_values": []}
+        for key, value in zip(header, record):
+            value = value.strip()
+            if key.startswith(ATTR_COLUMN_PREFIX):
+                if value:
+                    row["attribute_values"].append(
+                        {"attribute_id": key[len(ATTR_COLUMN_PREFIX):], "value": value}
+                    )
+            elif value != "":
+                row[key] = value
+        yield row
+
+
+async def _iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    async for line in lines:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield {"__error__": f"Invalid JSON: {exc.msg}"}
+
+
+def _db_error(exc: DBAPIError) -> str:
+    # The driver's own exception carries the server message without SQL or parameters
+    cause = exc.orig.__cause__ or exc.orig
+    return str(cause).splitlines()[0]
+
+
+async def import_products(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    fmt: str = "csv",
+) -> dict:
+    """Stream CSV or NDJSON rows into the catalogue.
+
+    Rows are validated in chunks, priced with a single rate snapshot and
+    written with multi-row INSERTs; each chunk commits on its own. A chunk
+    the database rejects is retried row by row in savepoints, so the rest
+    still go in. Invalid rows are skipped and reported by their 1-based
+    data row number.
+    """
+    started = time.perf_counter()
+    lines = _iter_lines(chunks)
+    rows = _iter_ndjson_rows(lines) if fmt == "ndjson" else _iter_csv_rows(lines)
+
+    krw_to_usd, usd_to_uzs = await get_rate_snapshot()
+    # Fresh tree: categories may have been added in another worker
+    invalidate_category_cache()
+    tree = await get_category_tree(db)
+    category_markups, attribute_categories = tree["markups"], tree["attribute_categories"]
+
+    imported = 0
+    failed = 0
+    errors: list[dict] = []
+
+    def _fail(row_number: int, message: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    async def _insert(entries: list[tuple[ProductCreate, dict]]) -> None:
+        result = await db.execute(
+            insert(Product).returning(Product.product_id, sort_by_parameter_order=True),
+            [row for _, row in entries],
+        )
+        product_ids = result.scalars().all()
+        value_rows = [
+            {"product_id": product_id, "attribute_id": attribute_id, "value": value}
+            for product_id, (item, _) in zip(product_ids, entries)
+            for attribute_id, value in {av.attribute_id: av.value for av in item.attribute_values or []}.items()
+        ]
+        if value_rows:
+            await db.execute(insert(ProductAttributeValue), value_rows)
+            await refresh_product_snapshots(db, {row["product_id"] for row in value_rows})
+
+    async def _flush(batch: list[tuple[int, ProductCreate]]) -> None:
+        nonlocal imported
+        if not batch:
+            return
+        brands = {}
+        for name in {item.brand for _, item in batch if item.brand}:
+            brands[name] = await brand_service.resolve_brand(db, name)
+
+        product_rows = []
+        for _, item in batch:
+            fields = item.model_dump(exclude={"attribute_values"})
+            markup = category_markups.get(item.category_id, MARKUP)
+            fields.update(compute_prices(item.cost_price, krw_to_usd, usd_to_uzs, markup))
+            fields["brand_id"], fields["brand"] = brands.get(item.brand, (None, None))
+            fields["match_key"] = product_match_key(
+                item.product_name, fields["brand_id"], item.category_id,
+                ((av.attribute_id, av.value) for av in item.attribute_values or []),
+            )
+            product_rows.append({key: fields.get(key) for key in _PRODUCT_COLUMNS})
+
+        # Duplicates of existing (or earlier) rows are imported unkeyed, as with manual creates
+        taken = await db.execute(
+            select(Product.match_key).where(Product.match_key.in_({row["match_key"] for row in product_rows}))
+        )
+        seen = set(taken.scalars().all())
+        for row in product_rows:
+            row["keep_separate"] = row["match_key"] in seen
+            if row["keep_separate"]:
+                row["match_key"] = None
+            else:
+                seen.add(row["match_key"])
+
+        entries = [(item, row) for (_, item), row in zip(batch, product_rows)]
+        try:
+            async with db.begin_nested():
+                await _insert(entries)
+            inserted = len(entries)
+        except DBAPIError:
+            # Retry row by row so only the rows the database rejects are reported
+            inserted = 0
+            for (row_number, item), row in zip(batch, product_rows):
+                try:
+                    async with db.begin_nested():
+                        await _insert([(item, row)])
+                except DBAPIError as exc:
+                    _fail(row_number, f"Insert failed: {_db_error(exc)}")
+                else:
+                    inserted += 1
+        await db.commit()
+        imported += inserted
+
+    batch: list[tuple[int, ProductCreate]] = []
+    row_number = 0
+    async for raw in rows:
+        row_number += 1
+        if "__error__" in raw:
+            _fail(row_number, raw["__error__"])
+            continue
+        try:
+            item = ProductCreate.model_validate(raw)
+        except ValidationError as exc:
+            first = exc.errors()[0]
+            _fail(row_number, f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+            continue
+        if item.category_id is not None and item.category_id not in category_markups:
+            _fail(row_number, f"category_id: unknown category {item.category_id}")
+            continue
+        bad_attr = next(
+            (
+                av.attribute_id for av in item.attribute_values or []
+                if attribute_categories.get(av.attribute_id) != item.category_id
+            ),
+            None,
+        )
+        if bad_attr is not None:
+            _fail(row_number, f"attribute_values: attribute {bad_attr} does not belong to the product's category")
+            continue
+        batch.append((row_number, item))
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await _flush(batch)
+            batch = []
+    await _flush(batch)
+
+    if imported:
+        invalidate_search_cache()
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,40 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order_item import OrderItem
+from app.models.product import Product
+from app.models.shipment import Shipment, ShipmentStockItem
+
+IN_TRANSIT_STATUSES = ("pending", "shipped")
+
+
+async def refresh_product_counters(db: AsyncSession, product_ids=None) -> None:
+    """Recompute the stored times_ordered / in_shipment_qty counters.
+
+    Called by the order and shipment services for the products they touch.
+    Passing ``None`` refreshes the whole catalogue (used for backfills).
+    """
+    if product_ids is not None:
+        product_ids = {pid for pid in product_ids if pid}
+        if not product_ids:
+            return
+    await db.flush()
+
+    times_ordered = (
+        select(func.coalesce(func.sum(OrderItem.quantity), 0))
+        .where(OrderItem.product_id == Product.product_id)
+        .scalar_subquery()
+    )
+    in_shipment_qty = (
+        select(func.coalesce(func.sum(ShipmentStockItem.quantity), 0))
+        .join(Shipment, ShipmentStockItem.shipment_id == Shipment.shipment_id)
+        .where(
+            ShipmentStockItem.product_id == Product.product_id,
+            Shipment.status.in_(IN_TRANSIT_STATUSES),
+        )
+        .scalar_subquery()
+    )
+    stmt = update(Product).values(times_ordered=times_ordered, in_shipment_qty=in_shipment_qty)
+    if product_ids is not None:
+        stmt = stmt.where(Product.product_id.in_(product_ids))
+    await db.execute(stmt)
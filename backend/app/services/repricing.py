@@ -0,0 +1,210 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import Numeric, and_, case, func, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import async_session
+from app.models.product import Product
+from app.models.product_category import ProductCategory
+from app.models.reprice_job import RepriceJob
+from app.services import brand as brand_service
+from app.services.currency import MARKUP, get_rate_snapshot
+from app.services.product import invalidate_search_cache
+
+REPRICE_BATCH_SIZE = 5000
+MAX_DIFF_ROWS = 200
+
+# Without a batch commit for this long, a queued or running job is reported as failed
+STALE_JOB_AFTER = timedelta(minutes=10)
+JOB_FIELDS = (
+    "job_id", "status", "total", "processed", "updated",
+    "krw_to_usd", "usd_to_uzs", "started_at", "finished_at", "error",
+)
+
+# Keeps running jobs referenced; progress lives in reprice_jobs
+_tasks: set[asyncio.Task] = set()
+
+
+def _price_expressions(
+    krw_to_usd: Decimal,
+    usd_to_uzs: Decimal,
+    markup: Decimal | None,
+    category_markups: dict[int, Decimal],
+):
+    """New (selling_price, selling_price_uzs) as SQL expressions.
+
+    Markup precedence: per-request category override, then the request-wide
+    markup, then the category's stored markup, then the default. Postgres
+    round() rounds halves away from zero, matching ROUND_HALF_UP on the
+    non-negative prices used here.
+    """
+    stored_markup = (
+        select(ProductCategory.markup)
+        .where(ProductCategory.category_id == Product.category_id)
+        .scalar_subquery()
+    )
+    base = literal(markup, Numeric) if markup is not None else func.coalesce(stored_markup, literal(MARKUP, Numeric))
+    if category_markups:
+        markup_expr = case(
+            {cid: literal(m, Numeric) for cid, m in category_markups.items()},
+            value=Product.category_id,
+            else_=base,
+        )
+    else:
+        markup_expr = base
+    selling_price = func.round(Product.cost_price * literal(krw_to_usd, Numeric) * markup_expr, 2)
+    selling_price_uzs = func.round(selling_price * literal(usd_to_uzs, Numeric), 2)
+    return selling_price, selling_price_uzs
+
+
+async def _filters(db: AsyncSession, category_id: int | None, brand: str | None, is_active: bool | None) -> list:
+    # Products without a KRW cost keep their manually entered prices
+    conditions = [Product.cost_price > 0]
+    if category_id is not None:
+        conditions.append(Product.category_id == category_id)
+    if brand is not None:
+        conditions.append(await brand_service.brand_condition(db, brand))
+    if is_active is not None:
+        conditions.append(Product.is_active == is_active)
+    return conditions
+
+
+def _changed(new_usd, new_uzs):
+    return or_(
+        Product.selling_price.is_distinct_from(new_usd),
+        Product.selling_price_uzs.is_distinct_from(new_uzs),
+    )
+
+
+async def preview_repricing(
+    db: AsyncSession,
+    markup: Decimal | None = None,
+    category_markups: dict[int, Decimal] | None = None,
+    category_id: int | None = None,
+    brand: str | None = None,
+    is_active: bool | None = None,
+) -> dict:
+    """Dry run: report which prices would change without writing anything."""
+    krw_to_usd, usd_to_uzs = await get_rate_snapshot()
+    new_usd, new_uzs = _price_expressions(krw_to_usd, usd_to_uzs, markup, category_markups or {})
+    conditions = await _filters(db, category_id, brand, is_active)
+
+    counts = await db.execute(
+        select(
+            func.count(),
+            func.count().filter(_changed(new_usd, new_uzs)),
+            func.coalesce(func.sum(new_usd - func.coalesce(Product.selling_price, 0)).filter(_changed(new_usd, new_uzs)), 0),
+        ).where(*conditions)
+    )
+    total, changed, delta_usd = counts.one()
+
+    rows = await db.execute(
+        select(
+            Product.product_id,
+            Product.product_name,
+            Product.category_id,
+            Product.cost_price,
+            Product.selling_price,
+            Product.selling_price_uzs,
+            new_usd.label("new_selling_price"),
+            new_uzs.label("new_selling_price_uzs"),
+        )
+        .where(*conditions, _changed(new_usd, new_uzs))
+        .order_by(func.abs(new_usd - func.coalesce(Product.selling_price, 0)).desc(), Product.product_id)
+        .limit(MAX_DIFF_ROWS)
+    )
+    return {
+        "krw_to_usd": krw_to_usd,
+        "usd_to_uzs": usd_to_uzs,
+        "total_products": total,
+        "changed_products": changed,
+        "selling_price_delta_usd": delta_usd,
+        "changes": [row._asdict() for row in rows.all()],
+    }
+
+
+def _job_record(job: RepriceJob) -> dict:
+    record = {column: getattr(job, column) for column in JOB_FIELDS}
+    # A job whose worker exited mid-run never reaches a final status
+    if job.status in ("queued", "running") and datetime.now(timezone.utc) - job.updated_at > STALE_JOB_AFTER:
+        record["status"] = "failed"
+        record["error"] = "Interrupted; start it again to finish the remaining products"
+    return record
+
+
+async def _run_job(
+    job_id: str,
+    markup: Decimal | None,
+    category_markups: dict[int, Decimal],
+    category_id: int | None,
+    brand: str | None,
+    is_active: bool | None,
+) -> None:
+    async with async_session() as db:
+        job = await db.get(RepriceJob, job_id)
+        try:
+            krw_to_usd, usd_to_uzs = await get_rate_snapshot()
+            new_usd, new_uzs = _price_expressions(krw_to_usd, usd_to_uzs, markup, category_markups)
+            conditions = await _filters(db, category_id, brand, is_active)
+
+            ids_result = await db.execute(select(Product.product_id).where(*conditions).order_by(Product.product_id))
+            product_ids = ids_result.scalars().all()
+            job.status = "running"
+            job.krw_to_usd, job.usd_to_uzs = krw_to_usd, usd_to_uzs
+            job.total = len(product_ids)
+            await db.commit()
+
+            # One set-based UPDATE per product_id range, committed per batch
+            # together with the job's progress
+            for start in range(0, len(product_ids), REPRICE_BATCH_SIZE):
+                chunk = product_ids[start:start + REPRICE_BATCH_SIZE]
+                result = await db.execute(
+                    update(Product)
+                    .where(
+                        *conditions,
+                        and_(Product.product_id >= chunk[0], Product.product_id <= chunk[-1]),
+                        _changed(new_usd, new_uzs),
+                    )
+                    .values(selling_price=new_usd, selling_price_uzs=new_uzs)
+                    .execution_options(synchronize_session=False)
+                )
+                job.processed += len(chunk)
+                job.updated += result.rowcount
+                await db.commit()
+            invalidate_search_cache()
+            job.status = "completed"
+        except Exception as exc:
+            await db.rollback()
+            job.status = "failed"
+            job.error = str(exc)
+        job.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+
+
+async def start_repricing(
+    db: AsyncSession,
+    markup: Decimal | None = None,
+    category_markups: dict[int, Decimal] | None = None,
+    category_id: int | None = None,
+    brand: str | None = None,
+    is_active: bool | None = None,
+) -> dict:
+    """Record a repricing job, start it in the background and return its progress."""
+    job = RepriceJob(job_id=uuid.uuid4().hex, status="queued", processed=0, updated=0)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    task = asyncio.create_task(
+        _run_job(job.job_id, markup, category_markups or {}, category_id, brand, is_active)
+    )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return _job_record(job)
+
+
+async def get_job(db: AsyncSession, job_id: str) -> dict | None:
+    job = await db.get(RepriceJob, job_id)
+    return _job_record(job) if job else None
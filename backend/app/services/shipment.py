@@ -4,59 +4,148 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.customer import Customer
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.product import Product
 from app.models.shipment import Shipment, ShipmentHistory, ShipmentOrder, ShipmentStockItem
+from app.models.user import User
 from app.schemas.shipment import ShipmentCreate, ShipmentUpdate
+from app.services.activity_log import record_activity
 from app.services.currency import get_rates
+from app.services.product_stats import refresh_product_counters
 
 
-def _compute_order_weight(order: Order) -> Decimal:
-    total_grams = 0
-    for item in order.items:
-        if item.product and item.product.packaged_weight_grams:
-            total_grams += item.product.packaged_weight_grams * item.quantity
-    return Decimal(total_grams) / Decimal(1000)
-
-
-def _items_summary(order: Order) -> str | None:
-    if not order.items:
+def _items_summary(names: list[str]) -> str | None:
+    if not names:
         return None
-    names = [item.product.product_name for item in order.items if item.product]
     if len(names) <= 2:
         return ", ".join(names)
     return f"{names[0]} +{len(names) - 1} more"
 
 
-def _compute_order_selling_usd(order: Order) -> Decimal:
-    total = Decimal(0)
-    for item in order.items:
-        if item.selling_price:
-            total += item.selling_price * item.quantity
-    return total
+async def refresh_shipment_totals(db: AsyncSession, shipment_ids) -> None:
+    """Recompute the stored per-order snapshots and totals of the given shipments.
 
+    Called whenever shipment membership, stock items, or the items of a
+    member order change, so reads never have to walk items and products.
+    """
+    shipment_ids = set(shipment_ids)
+    if not shipment_ids:
+        return
+    await db.flush()
 
-def _build_response(shipment: Shipment, usd_to_uzs: Decimal = Decimal(0)) -> dict:
-    orders_data = []
-    total_weight = Decimal(0)
-    total_selling_usd = Decimal(0)
-    total_service_fee = Decimal(0)
-    customer_ids = set()
+    per_order_result = await db.execute(
+        select(
+            ShipmentOrder.id,
+            func.coalesce(func.sum(OrderItem.selling_price * OrderItem.quantity), 0).label("selling_usd"),
+            func.coalesce(func.sum(Product.packaged_weight_grams * OrderItem.quantity), 0).label("weight_grams"),
+        )
+        .join(Order, ShipmentOrder.order_id == Order.order_id)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.order_id)
+        .outerjoin(Product, OrderItem.product_id == Product.product_id)
+        .where(ShipmentOrder.shipment_id.in_(shipment_ids))
+        .group_by(ShipmentOrder.id)
+    )
+    per_order = {row.id: row for row in per_order_result.all()}
 
-    for so in shipment.shipment_orders:
+    result = await db.execute(
+        select(ShipmentOrder)
+        .options(selectinload(ShipmentOrder.order))
+        .where(ShipmentOrder.shipment_id.in_(shipment_ids))
+    )
+    shipment_orders = list(result.scalars().all())
+
+    order_ids = {so.order_id for so in shipment_orders}
+    names_by_order: dict[int, list[str]] = {}
+    if order_ids:
+        names_result = await db.execute(
+            select(OrderItem.order_id, Product.product_name)
+            .join(Product, OrderItem.product_id == Product.product_id)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.order_id, OrderItem.item_id)
+        )
+        for row in names_result.all():
+            names_by_order.setdefault(row.order_id, []).append(row.product_name)
+
+    stock_result = await db.execute(
+        select(
+            ShipmentStockItem.shipment_id,
+            func.coalesce(func.sum(Product.packaged_weight_grams * ShipmentStockItem.quantity), 0).label("weight_grams"),
+        )
+        .join(Product, ShipmentStockItem.product_id == Product.product_id)
+        .where(ShipmentStockItem.shipment_id.in_(shipment_ids))
+        .group_by(ShipmentStockItem.shipment_id)
+    )
+    stock_weight = {row.shipment_id: Decimal(row.weight_grams) / Decimal(1000) for row in stock_result.all()}
+
+    totals = {
+        sid: {
+            "order_count": 0,
+            "customer_ids": set(),
+            "weight": stock_weight.get(sid, Decimal(0)),
+            "selling": Decimal(0),
+            "service_fee": Decimal(0),
+        }
+        for sid in shipment_ids
+    }
+    for so in shipment_orders:
+        row = per_order.get(so.id)
         order = so.order
-        weight = _compute_order_weight(order)
-        total_weight += weight
-        selling_usd = _compute_order_selling_usd(order)
-        total_selling_usd += selling_usd
+        so.weight_kg = Decimal(row.weight_grams) / Decimal(1000) if row else Decimal(0)
+        so.selling_usd = Decimal(row.selling_usd) if row else Decimal(0)
+        so.service_fee_usd = order.service_fee if order.service_fee is not None else Decimal("3.00")
+        so.items_summary = _items_summary(names_by_order.get(so.order_id, []))
+
+        t = totals[so.shipment_id]
+        t["order_count"] += 1
         if order.customer_id:
-            customer_ids.add(order.customer_id)
+            t["customer_ids"].add(order.customer_id)
+        t["weight"] += so.weight_kg
+        t["selling"] += so.selling_usd
+        t["service_fee"] += so.service_fee_usd
+
+    shipments_result = await db.execute(select(Shipment).where(Shipment.shipment_id.in_(shipment_ids)))
+    for shipment in shipments_result.scalars().all():
+        t = totals[shipment.shipment_id]
+        shipment.order_count = t["order_count"]
+        shipment.customer_count = len(t["customer_ids"])
+        shipment.total_weight_kg = t["weight"]
+        shipment.total_selling_usd = t["selling"]
+        shipment.total_service_fee_usd = t["service_fee"]
+
+
+async def refresh_totals_for_orders(db: AsyncSession, order_ids) -> None:
+    """Refresh every shipment that contains one of the given orders."""
+    order_ids = set(order_ids)
+    if not order_ids:
+        return
+    result = await db.execute(
+        select(ShipmentOrder.shipment_id).where(ShipmentOrder.order_id.in_(order_ids)).distinct()
+    )
+    await refresh_shipment_totals(db, result.scalars().all())
+
+
+async def refresh_totals_for_products(db: AsyncSession, product_ids) -> None:
+    """Refresh every shipment whose orders or stock items reference the given products."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    via_orders = (
+        select(ShipmentOrder.shipment_id)
+        .join(OrderItem, OrderItem.order_id == ShipmentOrder.order_id)
+        .where(OrderItem.product_id.in_(product_ids))
+    )
+    via_stock = select(ShipmentStockItem.shipment_id).where(ShipmentStockItem.product_id.in_(product_ids))
+    result = await db.execute(via_orders.union(via_stock))
+    await refresh_shipment_totals(db, result.scalars().all())
+
 
-        service_fee = order.service_fee if order.service_fee is not None else Decimal("3.00")
-        total_service_fee += service_fee
-        selling_usd += service_fee
+def _build_response(shipment: Shipment, usd_to_uzs: Decimal = Decimal(0)) -> dict:
+    orders_data = []
+    for so in shipment.shipment_orders:
+        order = so.order
+        weight = so.weight_kg or Decimal(0)
+        selling_usd = (so.selling_usd or Decimal(0)) + (so.service_fee_usd or Decimal(0))
         customer_cargo_usd = weight * Decimal(13)
         order_total_usd = selling_usd + customer_cargo_usd
         order_total_uzs = (order_total_usd * usd_to_uzs).quantize(
@@ -81,26 +170,24 @@ def _build_response(shipment: Shipment, usd_to_uzs: Decimal = Decimal(0)) -> dic
             "shipping_fee_usd": order_shipping_fee_usd,
             "shipping_fee_uzs": order_shipping_fee_uzs,
             "status": order.status,
-            "items_summary": _items_summary(order),
+            "items_summary": so.items_summary,
         })
 
-    # Stock items — add their weight to the shipment total
     stock_items_data = []
     for si in shipment.stock_items:
         product = si.product
         if not product:
             continue
-        weight_kg = Decimal(product.packaged_weight_grams or 0) / Decimal(1000) * si.quantity
-        total_weight += weight_kg
         stock_items_data.append({
             "product_id": product.product_id,
             "product_name": product.product_name,
             "quantity": si.quantity,
-            "weight_kg": weight_kg,
+            "weight_kg": Decimal(product.packaged_weight_grams or 0) / Decimal(1000) * si.quantity,
             "cost_price_krw": product.cost_price,
             "selling_price_usd": product.selling_price,
         })
 
+    total_weight = shipment.total_weight_kg or Decimal(0)
     shipment_fee = total_weight * Decimal(12)
     shipment_fee_uzs = (shipment_fee * usd_to_uzs).quantize(
         Decimal("0.01"), rounding=ROUND_HALF_UP
@@ -119,10 +206,10 @@ def _build_response(shipment: Shipment, usd_to_uzs: Decimal = Decimal(0)) -> dic
         "status": shipment.status,
         "notes": shipment.notes,
         "created_at": shipment.created_at,
-        "order_count": len(orders_data),
-        "customer_count": len(customer_ids),
+        "order_count": shipment.order_count,
+        "customer_count": shipment.customer_count,
         "total_weight_kg": total_weight,
-        "total_service_fee_usd": total_service_fee,
+        "total_service_fee_usd": shipment.total_service_fee_usd or Decimal(0),
         "shipment_fee": shipment_fee,
         "shipment_fee_uzs": shipment_fee_uzs,
         "total_orders_uzs": total_orders_uzs,
@@ -134,10 +221,6 @@ def _build_response(shipment: Shipment, usd_to_uzs: Decimal = Decimal(0)) -> dic
 
 
 _shipment_load_options = [
-    selectinload(Shipment.shipment_orders)
-    .selectinload(ShipmentOrder.order)
-    .selectinload(Order.items)
-    .selectinload(OrderItem.product),
     selectinload(Shipment.shipment_orders)
     .selectinload(ShipmentOrder.order)
     .selectinload(Order.customer),
@@ -201,7 +284,7 @@ async def _next_shipment_number(db: AsyncSession) -> str:
     return f"SH-{count:04d}"
 
 
-async def create_shipment(db: AsyncSession, data: ShipmentCreate) -> dict:
+async def create_shipment(db: AsyncSession, data: ShipmentCreate, user: User | None = None) -> dict:
     shipment = Shipment(
         shipment_number=await _next_shipment_number(db),
         notes=data.notes,
@@ -222,6 +305,10 @@ async def create_shipment(db: AsyncSession, data: ShipmentCreate) -> dict:
         shipment_id=shipment.shipment_id,
         action=f"Shipment created with {', '.join(action_parts) or 'no items'}",
     ))
+    record_activity(
+        db, user, "shipment_created", "shipment", new_value=shipment.shipment_number,
+        shipment_number=shipment.shipment_number,
+    )
 
     # Stamp shipping_number on all orders in this shipment
     if data.order_ids:
@@ -230,13 +317,19 @@ async def create_shipment(db: AsyncSession, data: ShipmentCreate) -> dict:
         )
         for order in orders_result.scalars().all():
             order.shipping_number = shipment.shipment_number
+            record_activity(
+                db, user, "shipment_order_added", "shipping_number", new_value=shipment.shipment_number,
+                order_id=order.order_id, order_number=order.order_number, shipment_number=shipment.shipment_number,
+            )
 
+    await refresh_shipment_totals(db, [shipment.shipment_id])
+    await refresh_product_counters(db, [si.product_id for si in data.stock_items])
     await db.commit()
     return await get_shipment(db, shipment.shipment_id)
 
 
 async def update_shipment(
-    db: AsyncSession, shipment_id: int, data: ShipmentUpdate
+    db: AsyncSession, shipment_id: int, data: ShipmentUpdate, user: User | None = None,
 ) -> dict | None:
     query = (
         select(Shipment)
@@ -254,11 +347,20 @@ async def update_shipment(
     old_status = shipment.status
     old_notes = shipment.notes
     old_order_ids = {so.order_id for so in shipment.shipment_orders}
+    counter_product_ids = {si.product_id for si in shipment.stock_items}
 
     fields = data.model_dump(exclude_unset=True, exclude={"order_ids", "stock_items"})
     for key, value in fields.items():
         setattr(shipment, key, value)
 
+    def log(action: str, field: str, old_value=None, new_value=None, order: Order | None = None) -> None:
+        record_activity(
+            db, user, action, field, old_value, new_value,
+            order_id=order.order_id if order else None,
+            order_number=order.order_number if order else None,
+            shipment_number=shipment.shipment_number,
+        )
+
     # Track changes for history
     history_actions: list[str] = []
 
@@ -266,9 +368,11 @@ async def update_shipment(
         history_actions.append(
             f"Status changed from {old_status} to {fields['status']}"
         )
+        log("shipment_status_changed", "status", old_status, fields["status"])
 
     if "notes" in fields and fields["notes"] != old_notes:
         history_actions.append("Notes updated")
+        log("shipment_updated", "notes", old_notes, fields["notes"])
 
     # Cascade status to all orders in this shipment
     if "status" in fields:
@@ -278,6 +382,8 @@ async def update_shipment(
                 select(Order).where(Order.order_id.in_(order_ids))
             )
             for order in orders_result.scalars().all():
+                if order.status != fields["status"]:
+                    log("status_changed", "status", order.status, fields["status"], order=order)
                 order.status = fields["status"]
 
         # When shipment arrives, mark all stock items' products as in_stock
@@ -304,6 +410,10 @@ async def update_shipment(
             )
             for o in changed_result.scalars().all():
                 order_number_map[o.order_id] = o.order_number
+                if o.order_id in added_ids:
+                    log("shipment_order_added", "shipping_number", o.shipping_number, shipment.shipment_number, order=o)
+                else:
+                    log("shipment_order_removed", "shipping_number", shipment.shipment_number, None, order=o)
 
         if added_ids:
             added_nums = [order_number_map.get(oid, str(oid)) for oid in added_ids]
@@ -344,6 +454,7 @@ async def update_shipment(
             history_actions.append(
                 f"In-stock items updated: {old_stock_count} → {new_stock_count} item(s)"
             )
+            log("shipment_updated", "stock_items", str(old_stock_count), str(new_stock_count))
 
     # Record history
     if not history_actions:
@@ -351,14 +462,29 @@ async def update_shipment(
     for action in history_actions:
         db.add(ShipmentHistory(shipment_id=shipment_id, action=action))
 
+    if data.order_ids is not None or data.stock_items is not None:
+        await refresh_shipment_totals(db, [shipment_id])
+    if data.stock_items is not None:
+        counter_product_ids |= {si.product_id for si in data.stock_items}
+    if data.stock_items is not None or "status" in fields:
+        await refresh_product_counters(db, counter_product_ids)
     await db.commit()
     return await get_shipment(db, shipment_id)
 
 
-async def delete_shipment(db: AsyncSession, shipment_id: int) -> bool:
+async def delete_shipment(db: AsyncSession, shipment_id: int, user: User | None = None) -> bool:
     shipment = await db.get(Shipment, shipment_id)
     if not shipment:
         return False
+    stock_result = await db.execute(
+        select(ShipmentStockItem.product_id).where(ShipmentStockItem.shipment_id == shipment_id)
+    )
+    product_ids = stock_result.scalars().all()
     await db.delete(shipment)
+    await refresh_product_counters(db, product_ids)
+    record_activity(
+        db, user, "shipment_deleted", "shipment", old_value=shipment.shipment_number,
+        shipment_number=shipment.shipment_number,
+    )
     await db.commit()
     return True
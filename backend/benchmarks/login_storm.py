@@ -0,0 +1,91 @@
+"""Login storm benchmark.
+
+Measures login throughput while probing /api/health, and compares the probe
+latency with a quiet baseline. With bcrypt on the event loop the probe's
+tail latency grows with every concurrent login; off-loop it should stay
+close to the baseline.
+
+Run against a started server with an existing user:
+
+    python benchmarks/login_storm.py --url http://localhost:8000 \\
+        --user admin --password secret --concurrency 20 --seconds 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def _percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return (
+        f"n={len(ordered)} p50={pick(0.50):.1f}ms p95={pick(0.95):.1f}ms "
+        f"p99={pick(0.99):.1f}ms max={ordered[-1] * 1000:.1f}ms mean={statistics.fmean(ordered) * 1000:.1f}ms"
+    )
+
+
+async def _probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/health")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def _login_worker(client: httpx.AsyncClient, stop: asyncio.Event, body: dict, counts: dict) -> None:
+    while not stop.is_set():
+        response = await client.post("/api/auth/login", json=body)
+        counts["ok" if response.status_code == 200 else "failed"] += 1
+
+
+async def _phase(client: httpx.AsyncClient, seconds: float, interval: float, body: dict | None, concurrency: int):
+    stop = asyncio.Event()
+    counts = {"ok": 0, "failed": 0}
+    probe = asyncio.create_task(_probe(client, stop, interval))
+    workers = [
+        asyncio.create_task(_login_worker(client, stop, body, counts))
+        for _ in range(concurrency if body else 0)
+    ]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*workers)
+    return await probe, counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=20, help="parallel login loops")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each phase")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        baseline, _ = await _phase(client, args.seconds, args.probe_interval, None, 0)
+        body = {"user_name": args.user, "password": args.password}
+        storm, counts = await _phase(client, args.seconds, args.probe_interval, body, args.concurrency)
+
+    print(f"health (quiet):       {_percentiles(baseline)}")
+    print(f"health (login storm): {_percentiles(storm)}")
+    print(
+        f"logins: {counts['ok']} ok, {counts['failed']} failed, "
+        f"{counts['ok'] / args.seconds:.1f}/s with {args.concurrency} concurrent clients"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,40 @@
+import hmac
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import auth, currency, customers, dashboard, logs, orders, product_categories, products, shipments, users
-from app.core.database import Base, engine
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import (
+    READ_PRIMARY_FOR_HEADER,
+    engine,
+    ping,
+    pool_status,
+    read_engine,
+    warm_pool,
+)
+from app.services import log_partitions, log_stream
 import app.models
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # The schema is managed by Alembic (`alembic upgrade head` before starting)
+    await warm_pool()
+    if read_engine is not engine:
+        await warm_pool(read_engine)
+    log_stream.start_listener()
+    # Creates upcoming log partitions now and every few hours, once per cluster
+    log_partitions.start_maintenance()
     yield
+    await log_partitions.stop_maintenance()
+    await log_stream.stop_listener()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
 app = FastAPI(title="Glori82 Admin Inventory API", lifespan=lifespan)
@@ -23,8 +45,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[READ_PRIMARY_FOR_HEADER],
 )
 
+
+@app.middleware("http")
+async def pin_reads_after_writes(request: Request, call_next):
+    """Tell a client that just wrote to read from the primary for a while.
+
+    Its reads carry X-Read-Primary for the returned number of seconds, so
+    it sees its own change even if the replica has not replayed it yet.
+    """
+    response = await call_next(request)
+    if read_engine is not engine and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.headers[READ_PRIMARY_FOR_HEADER] = str(settings.READ_PRIMARY_PIN_SECONDS)
+    return response
+
+
+# Outermost, so latency covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware, prefix="/api")
+
 app.include_router(auth.router, prefix="/api")
 app.include_router(customers.router, prefix="/api")
 app.include_router(product_categories.router, prefix="/api")
@@ -40,3 +80,34 @@ app.include_router(logs.router, prefix="/api")
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """DB round trip and connection pool statistics; 503 when the DB is unreachable.
+
+    A configured read replica is reported under ``replica``; it being down
+    does not fail the check, since reads can be pinned to the primary.
+    """
+    try:
+        latency = await ping()
+    except Exception as exc:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": str(exc), "pool": pool_status()},
+        )
+    status = {"status": "ok", "db_ping_ms": round(latency * 1000, 2), "pool": pool_status()}
+    if read_engine is not engine:
+        try:
+            status["replica"] = {"db_ping_ms": round(await ping(read_engine) * 1000, 2), "pool": pool_status(read_engine)}
+        except Exception as exc:
+            status["replica"] = {"status": "unavailable", "error": str(exc)}
+    return status
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: str | None = Header(None)):
+    """Prometheus text format; needs ``Bearer METRICS_TOKEN`` when that is set."""
+    if settings.METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,27 @@
+"""Shared code for data migrations that reuse the app's async services."""
+from collections.abc import Awaitable, Callable
+
+from alembic import context, op
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.util import await_only
+
+
+def run_with_session(fn: Callable[[AsyncSession], Awaitable[None]]) -> None:
+    """Await ``fn(db)`` with a session on the migration's connection.
+
+    env.py runs migrations inside AsyncConnection.run_sync, so this code is
+    already in SQLAlchemy's greenlet and can await the coroutine directly.
+    The session joins the migration's transaction: its commits do not end
+    it, and a failure rolls the whole upgrade back. Offline ``--sql`` runs
+    cannot execute Python, so they only note the skipped step.
+    """
+    if context.is_offline_mode():
+        op.get_context().impl.static_output(f"-- skipped data migration step: {fn.__name__}")
+        return
+
+    async def run() -> None:
+        async with AsyncSession(bind=context.config.attributes["connection"], expire_on_commit=False) as db:
+            await fn(db)
+            await db.flush()
+
+    await_only(run())
@@ -0,0 +1,312 @@
+"""Baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+The schema as main.py's create_all used to leave it. On an empty database
+this creates everything. On a database that create_all has been managing,
+existing tables are kept and only what create_all never added to them is
+filled in: missing columns (with their unique and foreign key
+constraints) and the indexes of new tables. Indexes on tables that may
+already hold rows are left to 0002, which builds them concurrently.
+After 0002 both kinds of database have the same schema; the columns
+added here start out empty or zero, and the data migrations from 0003
+on fill them for rows that already exist.
+
+activity_logs is created partitioned. An existing unpartitioned table
+keeps its layout until ``python -m app.services.log_partitions convert``
+is run. Revision 0006 creates the first monthly partitions; the app's
+maintenance task keeps creating them ahead of time.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(name: str, *elements, **kw) -> None:
+    """Create ``name``, or add whatever an existing ``name`` is missing."""
+    if context.is_offline_mode():
+        op.create_table(name, *elements, **kw)
+        return
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(name):
+        op.create_table(name, *elements, **kw)
+        return
+
+    existing = {column["name"] for column in inspector.get_columns(name)}
+    table = sa.Table(name, sa.MetaData(), *elements, **kw)
+    added = set()
+    for column in table.columns:
+        if column.name not in existing:
+            op.add_column(name, column._copy())
+            added.add(column.name)
+    for constraint in table.constraints:
+        columns = [column.name for column in constraint.columns]
+        if not added.intersection(columns):
+            continue
+        if isinstance(constraint, sa.UniqueConstraint):
+            op.create_unique_constraint(constraint.name, name, columns)
+        elif isinstance(constraint, sa.ForeignKeyConstraint):
+            referent, _ = constraint.elements[0].target_fullname.split(".")
+            op.create_foreign_key(
+                constraint.name, name, referent, columns,
+                [element.target_fullname.split(".")[1] for element in constraint.elements],
+                ondelete=constraint.ondelete,
+            )
+
+
+def _create_index(name: str, table: str, columns: list, **kw) -> None:
+    op.create_index(name, table, columns, if_not_exists=True, **kw)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    _create_table('app_settings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('logs_last_seen_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('brands',
+        sa.Column('brand_id', sa.Integer(), nullable=False),
+        sa.Column('brand_name', sa.String(length=255), nullable=False),
+        sa.Column('normalized_name', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('brand_id'),
+        sa.UniqueConstraint('normalized_name')
+    )
+    _create_table('customers',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('customer_name', sa.String(length=255), nullable=False),
+        sa.Column('contact_phone', sa.String(length=50), nullable=True),
+        sa.Column('telegram_id', sa.String(length=100), nullable=True),
+        sa.Column('address', sa.String(length=255), nullable=True),
+        sa.Column('city', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('budget', sa.Numeric(precision=15, scale=2), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('customer_id')
+    )
+    _create_table('product_categories',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('category_name', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('markup', sa.Numeric(precision=6, scale=3), nullable=True),
+        sa.PrimaryKeyConstraint('category_id')
+    )
+    _create_table('shipments',
+        sa.Column('shipment_id', sa.Integer(), nullable=False),
+        sa.Column('shipment_number', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('order_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('customer_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total_weight_kg', sa.Numeric(precision=12, scale=3), server_default='0', nullable=False),
+        sa.Column('total_selling_usd', sa.Numeric(precision=14, scale=2), server_default='0', nullable=False),
+        sa.Column('total_service_fee_usd', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('shipment_id'),
+        sa.UniqueConstraint('shipment_number')
+    )
+    _create_table('users',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('user_name', sa.String(length=100), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('role', sa.String(length=20), server_default='moderator', nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.UniqueConstraint('user_name')
+    )
+    _create_table('category_attributes',
+        sa.Column('attribute_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('attribute_name', sa.String(length=100), nullable=False),
+        sa.Column('sort_order', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['product_categories.category_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('attribute_id')
+    )
+    _create_table('log_read_states',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    _create_table('orders',
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=True),
+        sa.Column('order_date', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('service_fee', sa.Numeric(precision=12, scale=2), server_default='3.00', nullable=False),
+        sa.Column('shipping_number', sa.String(length=100), nullable=True),
+        sa.Column('payment_status', sa.String(length=20), server_default='unpaid', nullable=False),
+        sa.Column('paid_card', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.Column('paid_cash', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.Column('final_amount_uzs', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('budget_applied_uzs', sa.Numeric(precision=15, scale=2), server_default='0', nullable=False),
+        sa.Column('is_archived', sa.Boolean(), server_default='false', nullable=False),
+        sa.Column('is_family_discount', sa.Boolean(), server_default='false', nullable=False),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ),
+        sa.PrimaryKeyConstraint('order_id'),
+        sa.UniqueConstraint('order_number')
+    )
+    _create_table('products',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('product_name', sa.String(length=255), nullable=False),
+        sa.Column('brand', sa.String(length=255), nullable=True),
+        sa.Column('brand_id', sa.Integer(), nullable=True),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('cost_price', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.Column('selling_price', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('selling_price_uzs', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('packaged_weight_grams', sa.Integer(), nullable=True),
+        sa.Column('volume_ml', sa.Integer(), nullable=True),
+        sa.Column('stock_quantity', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('reorder_level', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('stock_status', sa.String(length=20), server_default='purchased', nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('times_ordered', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('in_shipment_qty', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('match_key', sa.String(length=40), nullable=True),
+        sa.Column('attribute_snapshot', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False),
+        sa.ForeignKeyConstraint(['brand_id'], ['brands.brand_id'], ),
+        sa.ForeignKeyConstraint(['category_id'], ['product_categories.category_id'], ),
+        sa.PrimaryKeyConstraint('product_id'),
+        sa.UniqueConstraint('match_key')
+    )
+    _create_table('shipment_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('shipment_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['shipment_id'], ['shipments.shipment_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('activity_logs',
+        sa.Column('log_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user_name', sa.String(), nullable=False),
+        sa.Column('user_role', sa.String(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('order_number', sa.String(), nullable=True),
+        sa.Column('shipment_number', sa.String(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('field', sa.String(), nullable=False),
+        sa.Column('old_value', sa.String(), nullable=True),
+        sa.Column('new_value', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('log_id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    _create_index('ix_activity_logs_action_created_log', 'activity_logs', ['action', 'created_at', 'log_id'], unique=False)
+    _create_index('ix_activity_logs_created_log', 'activity_logs', ['created_at', 'log_id'], unique=False)
+    _create_index('ix_activity_logs_order_created_log', 'activity_logs', ['order_id', 'created_at', 'log_id'], unique=False)
+    _create_index('ix_activity_logs_user_created_log', 'activity_logs', ['user_id', 'created_at', 'log_id'], unique=False)
+    _create_table('customer_budget_ledger',
+        sa.Column('entry_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('entry_type', sa.String(length=20), nullable=False),
+        sa.Column('amount_uzs', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('balance_after_uzs', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('note', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('entry_id')
+    )
+    _create_index('ix_customer_budget_ledger_customer_entry', 'customer_budget_ledger', ['customer_id', 'entry_id'], unique=False)
+    _create_index('ix_customer_budget_ledger_order_id', 'customer_budget_ledger', ['order_id'], unique=False)
+    _create_table('order_items',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('selling_price', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('selling_price_uzs', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('cost_price', sa.Numeric(precision=12, scale=2), nullable=True),
+        sa.Column('from_stock', sa.Boolean(), server_default='false', nullable=False),
+        sa.Column('attribute_snapshot', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('item_id')
+    )
+    _create_table('product_attribute_values',
+        sa.Column('value_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('attribute_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['attribute_id'], ['category_attributes.attribute_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('value_id'),
+        sa.UniqueConstraint('product_id', 'attribute_id', name='uq_product_attribute')
+    )
+    _create_table('shipment_orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('shipment_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('weight_kg', sa.Numeric(precision=12, scale=3), server_default='0', nullable=False),
+        sa.Column('selling_usd', sa.Numeric(precision=14, scale=2), server_default='0', nullable=False),
+        sa.Column('service_fee_usd', sa.Numeric(precision=12, scale=2), server_default='3.00', nullable=False),
+        sa.Column('items_summary', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['shipment_id'], ['shipments.shipment_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('shipment_stock_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('shipment_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), server_default='1', nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['shipment_id'], ['shipments.shipment_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('order_item_attribute_values',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('attribute_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['attribute_id'], ['category_attributes.attribute_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['item_id'], ['order_items.item_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('shopping_list_overrides',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_override', sa.Integer(), nullable=True),
+        sa.Column('is_removed', sa.Boolean(), server_default='false', nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['order_items.item_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('item_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("shopping_list_overrides")
+    op.drop_table("order_item_attribute_values")
+    op.drop_table("shipment_stock_items")
+    op.drop_table("shipment_orders")
+    op.drop_table("product_attribute_values")
+    op.drop_table("order_items")
+    op.drop_table("customer_budget_ledger")
+    op.drop_table("activity_logs")
+    op.drop_table("shipment_history")
+    op.drop_table("products")
+    op.drop_table("orders")
+    op.drop_table("log_read_states")
+    op.drop_table("category_attributes")
+    op.drop_table("users")
+    op.drop_table("shipments")
+    op.drop_table("product_categories")
+    op.drop_table("customers")
+    op.drop_table("brands")
+    op.drop_table("app_settings")
@@ -0,0 +1,118 @@
+"""Indexes for the order list, dashboard, search, shipment and attribute joins
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Built with CREATE INDEX CONCURRENTLY so orders keep being written while
+they build; each index is its own transaction, and one that already
+exists is skipped, so a failed run can simply be repeated. This includes
+every index of the baseline schema on tables that create_all-managed
+databases already fill. activity_logs needs nothing here: (created_at,
+log_id) and the per-filter keyset indexes come with the baseline, since
+a partitioned table cannot be indexed concurrently.
+
+The unique index on normalized category names also lands here, because
+it cannot be built while categories that differ only in case or spacing
+remain. On a database that has them, run ``alembic upgrade 0001``, merge
+them with ``POST /api/products/merge-duplicates?dry_run=false`` and then
+``alembic upgrade head``.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+NORMALIZED_CATEGORY_NAME = r"lower(btrim(regexp_replace(category_name, '\s+', ' ', 'g')))"
+
+# (name, table, columns, options)
+INDEXES = [
+    # Order list: archive tab, then the optional status / payment filter,
+    # then the date range and default sort
+    ("ix_orders_archived_date", "orders", ["is_archived", "order_date"], {}),
+    ("ix_orders_archived_status_date", "orders", ["is_archived", "status", "order_date"], {}),
+    ("ix_orders_archived_payment_date", "orders", ["is_archived", "payment_status", "order_date"], {}),
+    # Dashboard revenue, sales count and unpaid orders
+    ("ix_orders_completed_date", "orders", ["order_date"], {
+        "postgresql_include": ["total_amount"],
+        "postgresql_where": sa.text("status = 'completed' AND is_family_discount = false"),
+    }),
+    ("ix_orders_received_unpaid_date", "orders", ["order_date"], {
+        "postgresql_where": sa.text(
+            "status = 'received' AND is_family_discount = false "
+            "AND payment_status NOT IN ('paid_card', 'paid_cash')"
+        ),
+    }),
+    # Foreign keys that are joined or filtered on from the referenced side
+    ("ix_order_items_product_id", "order_items", ["product_id"], {}),
+    ("ix_order_item_attribute_values_item_id", "order_item_attribute_values", ["item_id"], {}),
+    ("ix_shipment_orders_shipment_id", "shipment_orders", ["shipment_id"], {}),
+    ("ix_shipment_stock_items_shipment_id", "shipment_stock_items", ["shipment_id"], {}),
+    ("ix_shipment_stock_items_product_id", "shipment_stock_items", ["product_id"], {}),
+    ("ix_shipment_history_shipment_id", "shipment_history", ["shipment_id"], {}),
+    ("ix_orders_customer_id", "orders", ["customer_id"], {}),
+    ("ix_orders_pending_open", "orders", ["order_id"], {
+        "postgresql_where": sa.text("status = 'pending' AND is_archived = false"),
+    }),
+    ("ix_orders_status_shipping_number", "orders", ["status", "shipping_number"], {}),
+    ("ix_order_items_order_id", "order_items", ["order_id"], {}),
+    ("ix_shipment_orders_order_id", "shipment_orders", ["order_id"], {}),
+    ("ix_products_brand_id", "products", ["brand_id"], {}),
+    ("ix_products_in_shipment_qty", "products", ["in_shipment_qty"], {}),
+    ("ix_products_times_ordered", "products", ["times_ordered"], {}),
+    ("ix_product_attribute_values_attr_value_product", "product_attribute_values",
+     ["attribute_id", "value", "product_id"], {}),
+    # Trigram search (pg_trgm comes with the baseline)
+    ("ix_customers_customer_name_trgm", "customers", ["customer_name"], {
+        "postgresql_using": "gin", "postgresql_ops": {"customer_name": "gin_trgm_ops"},
+    }),
+    ("ix_products_brand_trgm", "products", ["brand"], {
+        "postgresql_using": "gin", "postgresql_ops": {"brand": "gin_trgm_ops"},
+    }),
+    ("ix_products_product_name_trgm", "products", ["product_name"], {
+        "postgresql_using": "gin", "postgresql_ops": {"product_name": "gin_trgm_ops"},
+    }),
+    ("ix_product_attribute_values_value_trgm", "product_attribute_values", ["value"], {
+        "postgresql_using": "gin", "postgresql_ops": {"value": "gin_trgm_ops"},
+    }),
+]
+
+
+def _count_duplicate_categories() -> int:
+    if context.is_offline_mode():
+        return 0
+    return op.get_bind().execute(sa.text(
+        f"SELECT count(*) FROM (SELECT 1 FROM product_categories "
+        f"GROUP BY {NORMALIZED_CATEGORY_NAME} HAVING count(*) > 1) AS groups"
+    )).scalar()
+
+
+def upgrade() -> None:
+    duplicates = _count_duplicate_categories()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} sets of product categories differ only in case or spacing; merge them with "
+            "POST /api/products/merge-duplicates?dry_run=false (at revision 0001), then upgrade again"
+        )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+        op.create_index(
+            "ux_product_categories_normalized_name", "product_categories",
+            [sa.text(NORMALIZED_CATEGORY_NAME)],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ux_product_categories_normalized_name", table_name="product_categories",
+            postgresql_concurrently=True, if_exists=True,
+        )
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
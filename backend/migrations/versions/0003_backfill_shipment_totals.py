@@ -0,0 +1,39 @@
+"""Backfill stored shipment totals
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+The per-order snapshots on shipment_orders and the totals on shipments
+were added with zero defaults. Recompute them for every existing shipment
+with the same code that keeps them current.
+"""
+from sqlalchemy import select
+
+from app.models.shipment import Shipment
+from app.services.shipment import refresh_shipment_totals
+from migrations.helpers import run_with_session
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 200
+
+
+async def _refresh_all(db) -> None:
+    shipment_ids = (await db.execute(select(Shipment.shipment_id).order_by(Shipment.shipment_id))).scalars().all()
+    for start in range(0, len(shipment_ids), BATCH_SIZE):
+        await refresh_shipment_totals(db, shipment_ids[start:start + BATCH_SIZE])
+        # Snapshots are written; drop the loaded rows before the next batch
+        await db.flush()
+        db.expunge_all()
+
+
+def upgrade() -> None:
+    run_with_session(_refresh_all)
+
+
+def downgrade() -> None:
+    pass
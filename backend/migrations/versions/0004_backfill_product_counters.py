@@ -0,0 +1,28 @@
+"""Backfill product order counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+times_ordered and in_shipment_qty on products were added with zero
+defaults; compute them once for every product.
+"""
+from app.services.product_stats import refresh_product_counters
+from migrations.helpers import run_with_session
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+async def _refresh_all(db) -> None:
+    await refresh_product_counters(db, None)
+
+
+def upgrade() -> None:
+    run_with_session(_refresh_all)
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,29 @@
+"""Backfill attribute snapshots
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+The denormalized attribute snapshots on products and order items start
+out empty; build them from the attribute value tables.
+"""
+from app.services.attribute_snapshot import refresh_item_snapshots, refresh_product_snapshots
+from migrations.helpers import run_with_session
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+async def _refresh_all(db) -> None:
+    await refresh_product_snapshots(db, None)
+    await refresh_item_snapshots(db, None)
+
+
+def upgrade() -> None:
+    run_with_session(_refresh_all)
+
+
+def downgrade() -> None:
+    pass
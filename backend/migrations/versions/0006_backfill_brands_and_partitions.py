@@ -0,0 +1,42 @@
+"""Link product brands and create the first log partitions
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Products from before the brands table only have free-text brands; link
+them (merging spellings that normalize alike). A partitioned
+activity_logs gets this month's partition and the next two, so logging
+works before the app's maintenance task first runs. Both steps used to
+run on every app start.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.services.brand import backfill_brands
+from app.services.log_partitions import TABLE, partition_ddl, upcoming_months
+from migrations.helpers import run_with_session
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def _is_partitioned() -> bool:
+    if context.is_offline_mode():
+        return True
+    return op.get_bind().execute(
+        sa.text("SELECT relkind FROM pg_class WHERE relname = :name"), {"name": TABLE}
+    ).scalar() == "p"
+
+
+def upgrade() -> None:
+    if _is_partitioned():
+        for month in upcoming_months():
+            op.execute(partition_ddl(month))
+    run_with_session(backfill_brands)
+
+
+def downgrade() -> None:
+    pass
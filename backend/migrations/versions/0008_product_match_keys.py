@@ -0,0 +1,36 @@
+"""Key existing products for deduplication
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+match_key now covers the category, and products from before match_key
+existed have none, so inline order items could not find them. Every
+product gets its key, held by the lowest product_id among those sharing
+it; the others stay NULL as candidates for the merge tool.
+keep_separate marks duplicates entered on purpose from now on. Rows made
+unkeyed that way before this revision cannot be told apart and are
+treated as merge candidates too.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.catalogue_merge import backfill_match_keys
+from migrations.helpers import run_with_session
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "products",
+        sa.Column("keep_separate", sa.Boolean(), server_default="false", nullable=False),
+    )
+    run_with_session(backfill_match_keys)
+
+
+def downgrade() -> None:
+    op.drop_column("products", "keep_separate")
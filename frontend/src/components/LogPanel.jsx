@@ -15,6 +15,31 @@ function formatLog(log) {
     const fieldLabel = log.field === 'paid_card' ? 'card payment' : 'cash payment'
     return `${actor} changed ${fieldLabel}: ${log.old_value} → ${log.new_value} UZS`
   }
+  if (log.action === 'order_created') {
+    return `${actor} created an order`
+  }
+  if (log.action === 'order_deleted') {
+    return `${actor} deleted an order`
+  }
+  if (log.action === 'shipment_created') {
+    return `${actor} created shipment ${log.shipment_number}`
+  }
+  if (log.action === 'shipment_deleted') {
+    return `${actor} deleted shipment ${log.shipment_number}`
+  }
+  if (log.action === 'shipment_status_changed') {
+    return `${actor} changed shipment ${log.shipment_number} status: "${log.old_value}" → "${log.new_value}"`
+  }
+  if (log.action === 'shipment_order_added') {
+    return `${actor} added the order to shipment ${log.shipment_number}`
+  }
+  if (log.action === 'shipment_order_removed') {
+    return `${actor} removed the order from shipment ${log.shipment_number}`
+  }
+  if (log.action === 'shipment_updated') {
+    const fieldLabel = log.field === 'notes' ? 'notes' : 'in-stock items'
+    return `${actor} updated shipment ${log.shipment_number} ${fieldLabel}`
+  }
   return `${actor} made a change`
 }
 
@@ -50,9 +75,14 @@ export default function LogPanel() {
 
   useEffect(() => {
     if (user?.role !== 'admin') return
-    logsApi.getUnreadCount()
-      .then((res) => setUnreadCount(res.data.count))
-      .catch(() => {})
+    // The stream sends the current count first, then new logs and count changes
+    const source = new EventSource(logsApi.streamUrl())
+    source.addEventListener('count', (event) => setUnreadCount(JSON.parse(event.data).count))
+    source.addEventListener('log', (event) => {
+      const log = JSON.parse(event.data)
+      setLogs((prev) => [log, ...prev.filter((l) => l.log_id !== log.log_id)].slice(0, 30))
+    })
+    return () => source.close()
   }, [user])
 
   const handleToggle = async () => {
@@ -67,7 +97,7 @@ export default function LogPanel() {
         logsApi.getLogs(),
         logsApi.markSeen(),
       ])
-      setLogs(logsRes.data)
+      setLogs(logsRes.data.data)
       setUnreadCount(0)
     } catch {
       // silently fail — panel still opens
@@ -6,18 +6,31 @@ const api = axios.create({
     : '/api',
 })
 
+// After a write the API may ask for reads from the primary database for a
+// few seconds, so lists and details show the change despite replica lag
+let readPrimaryUntil = 0
+
 // Attach token to every request
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token') || sessionStorage.getItem('token')
   if (token) {
     config.headers.Authorization = `Bearer ${token}`
   }
+  if (Date.now() < readPrimaryUntil) {
+    config.headers['X-Read-Primary'] = '1'
+  }
   return config
 })
 
 // Redirect to /login on 401
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const pinSeconds = Number(response.headers['x-read-primary-for'])
+    if (pinSeconds > 0) {
+      readPrimaryUntil = Math.max(readPrimaryUntil, Date.now() + pinSeconds * 1000)
+    }
+    return response
+  },
   (error) => {
     if (error.response?.status === 401 && !error.config.url?.includes('/auth/')) {
       localStorage.removeItem('token')
@@ -36,8 +49,16 @@ export const authApi = {
 
 export const productsApi = {
   getAll: (params) => api.get('/products', { params }),
+  search: (params) => api.get('/products/search', { params }),
   getById: (id) => api.get(`/products/${id}`),
   create: (data) => api.post('/products', data),
+  import: (file, format) => api.post('/products/import', file, {
+    params: format ? { format } : undefined,
+    headers: { 'Content-Type': format === 'ndjson' ? 'application/x-ndjson' : 'text/csv' },
+  }),
+  reprice: (data) => api.post('/products/reprice', data),
+  getRepriceJob: (jobId) => api.get(`/products/reprice/${jobId}`),
+  mergeDuplicates: (dryRun = true) => api.post('/products/merge-duplicates', null, { params: { dry_run: dryRun } }),
   update: (id, data) => api.put(`/products/${id}`, data),
   delete: (id) => api.delete(`/products/${id}`),
   getLowStock: () => api.get('/products/low-stock'),
@@ -61,10 +82,17 @@ export const customersApi = {
   create: (data) => api.post('/customers', data),
   update: (id, data) => api.put(`/customers/${id}`, data),
   delete: (id) => api.delete(`/customers/${id}`),
+  getBudgetLedger: (id, params) => api.get(`/customers/${id}/budget/ledger`, { params }),
+  addBudgetEntry: (id, data) => api.post(`/customers/${id}/budget`, data),
+  getStatement: (id, params) => api.get(`/customers/${id}/statement`, {
+    params,
+    responseType: params?.format === 'csv' ? 'blob' : 'json',
+  }),
 }
 
 export const ordersApi = {
   getAll: (params) => api.get('/orders', { params }),
+  getUnshipped: (params) => api.get('/orders/unshipped', { params }),
   getShoppingList: () => api.get('/orders/shopping-list'),
   saveOverride: (data) => api.patch('/orders/shopping-list/override', data),
   resetOverrides: () => api.delete('/orders/shopping-list/overrides'),
@@ -76,6 +104,7 @@ export const ordersApi = {
 
 export const currencyApi = {
   getRates: (params) => api.get('/currency/rates', { params }),
+  priceBatch: (data) => api.post('/currency/prices/batch', data),
 }
 
 export const dashboardApi = {
@@ -99,9 +128,15 @@ export const usersApi = {
 }
 
 export const logsApi = {
-  getLogs: () => api.get('/logs'),
+  getLogs: (params) => api.get('/logs', { params }),
+  getOrderTimeline: (orderId) => api.get(`/logs/orders/${orderId}`),
   getUnreadCount: () => api.get('/logs/unread-count'),
   markSeen: () => api.post('/logs/mark-seen'),
+  // EventSource cannot set headers, so the token goes in the query string
+  streamUrl: () => {
+    const token = localStorage.getItem('token') || sessionStorage.getItem('token') || ''
+    return `${api.defaults.baseURL}/logs/stream?token=${encodeURIComponent(token)}`
+  },
 }
 
 export const shipmentsApi = {
@@ -385,6 +385,8 @@ export default function OrderModal({
   }
 
   /* ── Item: Product handlers ── */
+  const searchTimersRef = useRef({})
+
   const handleProductType = (index, text) => {
     setForm((prev) => {
       const items = prev.items.map((it, i) =>
@@ -394,6 +396,26 @@ export default function OrderModal({
       )
       return { ...prev, items }
     })
+
+    // Server-side typeahead so products beyond the first page can be found
+    const item = form.items[index] || {}
+    clearTimeout(searchTimersRef.current[index])
+    const q = text.trim()
+    if (!q) return
+    searchTimersRef.current[index] = setTimeout(async () => {
+      try {
+        const params = { q, limit: 20 }
+        if (item.category_id) params.category_id = item.category_id
+        if (item.brand) params.brand = item.brand
+        const res = await productsApi.search(params)
+        setRowOptions((prev) => ({
+          ...prev,
+          [index]: { ...prev[index], products: res.data },
+        }))
+      } catch {
+        // keep the current options on failure
+      }
+    }, 200)
   }
 
   const handleProductPick = (index, option) => {